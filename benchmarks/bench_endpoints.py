@@ -0,0 +1,260 @@
+"""Benchmark de los endpoints contra el sitio local de pruebas (fakesite).
+
+Levanta ``fakesite`` con la latencia indicada y la aplicación (uvicorn)
+apuntando a él, lanza ``--requests`` solicitudes por endpoint con
+``--concurrency`` clientes a la vez y reporta throughput, latencias
+p50/p95/p99 y el pico de RSS de la aplicación, incluidos los navegadores.
+
+    python benchmarks/bench_endpoints.py --latency-ms 100 --requests 20 --concurrency 4
+    python benchmarks/bench_endpoints.py --endpoints scrape_direccion --no-http --set DRIVER_POOL_SIZE=4
+
+Por defecto cada solicitud lleva ``Cache-Control: no-cache`` para medir el
+scraping y no la caché (``--cache`` la deja actuar). Las rutas Selenium
+requieren Chrome y chromedriver, resueltos igual que en la aplicación.
+"""
+import argparse
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from driver_pool import process_tree_rss_mb  # noqa: E402
+from fakesite import build_site, site_env  # noqa: E402
+from fakesite import mapgis, registraduria  # noqa: E402
+
+
+PRODUCTOS = [
+    "Kirkland Signature Paper Towels 12 Rolls",
+    "Instant Pot Duo 7-in-1 Pressure Cooker 6 Qt",
+    "Apple AirPods Pro 2nd Generation",
+    "Samsung 55 in Crystal UHD 4K Smart TV",
+    "Ninja Professional Blender 1000W",
+]
+TIENDAS = ["Costco", "Amazon", "Target"]
+
+
+def _direccion(i: int) -> dict:
+    conocidas = list(mapgis.DATA["direcciones"])
+    if i < len(conocidas):
+        return {"direccion": conocidas[i]}
+    return {"direccion": f"calle {10 + i % 90} # {20 + i % 50}-{i % 99:02d}"}
+
+
+def _municipio(i: int) -> dict:
+    municipios = registraduria.DATA["municipios"]
+    return {"municipio": municipios[i % len(municipios)]["nombre"].title()}
+
+
+def _verificacion(i: int) -> dict:
+    producto = PRODUCTOS[i % len(PRODUCTOS)]
+    return {"search_query": f"{producto} {TIENDAS[i % len(TIENDAS)]}", "verification_word": producto.split()[0]}
+
+
+def _imagenes(i: int, items: int = 3) -> dict:
+    # Las imágenes se cachean por ítem: el índice en la descripción evita aciertos entre solicitudes
+    return {
+        "store": TIENDAS[i % len(TIENDAS)],
+        "data": [{"Item_Description": f"{PRODUCTOS[(i + j) % len(PRODUCTOS)]} #{i}-{j}"} for j in range(items)],
+    }
+
+
+SCENARIOS = {
+    "scrape_direccion": ("/scrape_direccion", _direccion),
+    "scrape_resultados": ("/scrape_resultados", _municipio),
+    "verify_product": ("/verify_product", _verificacion),
+    "product_images": ("/product_images", _imagenes),
+}
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class RssSampler(threading.Thread):
+    """Muestrea el RSS del árbol de procesos de la aplicación y guarda el pico."""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self.peak = max(self.peak, process_tree_rss_mb(self.pid))
+            self._stopped.wait(self.interval)
+
+    def reset(self) -> float:
+        peak, self.peak = self.peak, process_tree_rss_mb(self.pid)
+        return peak
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_app(env: dict, port: int, log) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"La aplicación terminó al arrancar (código {process.returncode})")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/openapi.json", timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("La aplicación no respondió en 120 s")
+
+
+def run_scenario(base_url: str, endpoint: str, count: int, concurrency: int, use_cache: bool, offset: int = 0):
+    path, payload = SCENARIOS[endpoint]
+    headers = {} if use_cache else {"Cache-Control": "no-cache"}
+    local = threading.local()
+
+    def call(i: int):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            response = local.session.post(f"{base_url}{path}", json=payload(offset + i), headers=headers, timeout=600)
+            ok = response.status_code == 200
+            status = response.status_code
+        except requests.RequestException as e:
+            ok, status = False, type(e).__name__
+        return time.perf_counter() - started, ok, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(count)))
+    wall = time.perf_counter() - started
+
+    latencies = [latency for latency, ok, _ in results if ok]
+    errors = {}
+    for _, ok, status in results:
+        if not ok:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    return {
+        "endpoint": endpoint,
+        "requests": count,
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": errors,
+        "wall_s": wall,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+    }
+
+
+def print_table(results):
+    print(f"{'endpoint':<20}{'ok/total':>10}{'req/s':>9}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'RSS MB':>9}  errores")
+    for r in results:
+        errors = ", ".join(f"{status}×{n}" for status, n in r["errors"].items()) or "-"
+        print(
+            f"{r['endpoint']:<20}{r['ok']:>5}/{r['requests']:<4}{r['throughput_rps']:>9.2f}"
+            f"{r['p50_s']:>9.2f}{r['p95_s']:>9.2f}{r['p99_s']:>9.2f}{r['peak_rss_mb']:>9.0f}  {errors}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", default=",".join(SCENARIOS),
+                        help="Endpoints a medir, separados por comas")
+    parser.add_argument("--requests", type=int, default=10, help="Solicitudes medidas por endpoint")
+    parser.add_argument("--concurrency", type=int, default=2, help="Clientes simultáneos")
+    parser.add_argument("--warmup", type=int, default=1, help="Solicitudes previas no medidas por endpoint")
+    parser.add_argument("--latency-ms", type=int, default=50, help="Latencia del sitio local")
+    parser.add_argument("--jitter-ms", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="No enviar Cache-Control: no-cache")
+    parser.add_argument("--no-http", action="store_true", help="Desactiva las rutas HTTP: mide solo Selenium")
+    parser.add_argument("--set", action="append", default=[], metavar="VAR=VALOR",
+                        help="Variable de entorno extra para la aplicación (repetible)")
+    parser.add_argument("--app-log", help="Archivo donde guardar la salida de la aplicación")
+    parser.add_argument("--json", help="Archivo donde guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+    unknown = [endpoint for endpoint in endpoints if endpoint not in SCENARIOS]
+    if unknown:
+        parser.error(f"Endpoints desconocidos: {', '.join(unknown)}")
+
+    site = build_site(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    base_url = site.start()
+    workdir = tempfile.mkdtemp(prefix="bench-endpoints-")
+    env = dict(os.environ)
+    env.update(site_env(base_url))
+    # Índices en memoria: cada corrida empieza sin fichas resueltas
+    env.update({"JOBS_DB_PATH": os.path.join(workdir, "jobs.sqlite3"), "CACHE_DB_PATH": "",
+                "PRODUCT_URL_INDEX_PATH": "", "IMAGE_INDEX_PATH": ""})
+    if args.no_http:
+        env.update({"MAPGIS_HTTP_ENABLED": "false", "REGISTRADURIA_HTTP_ENABLED": "false",
+                    "RETAILER_HTTP_ENABLED": "false", "VERIFY_PRODUCT_HTTP_ENABLED": "false"})
+    for assignment in args.set:
+        name, _, value = assignment.partition("=")
+        env[name] = value
+
+    port = free_port()
+    log = open(args.app_log, "w") if args.app_log else subprocess.DEVNULL
+    print(f"Sitio local en {base_url}; aplicación en el puerto {port} (latencia {args.latency_ms} ms)")
+    app = start_app(env, port, log)
+    sampler = RssSampler(app.pid)
+    sampler.start()
+    app_url = f"http://127.0.0.1:{port}"
+
+    results = []
+    try:
+        for endpoint in endpoints:
+            if args.warmup:
+                run_scenario(app_url, endpoint, args.warmup, 1, args.cache, offset=10_000)
+            sampler.reset()
+            result = run_scenario(app_url, endpoint, args.requests, args.concurrency, args.cache)
+            result["peak_rss_mb"] = sampler.reset()
+            results.append(result)
+            print(f"{endpoint}: {result['ok']}/{result['requests']} en {result['wall_s']:.1f} s")
+    finally:
+        sampler.stop()
+        app.terminate()
+        try:
+            app.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            app.kill()
+        site.stop()
+        if log is not subprocess.DEVNULL:
+            log.close()
+
+    print()
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"latency_ms": args.latency_ms, "no_http": args.no_http, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Compara los time.sleep fijos anteriores con las esperas de waits.py.
+
+Levanta un servidor local con páginas sintéticas que imitan la señal que da
+cada sitio (tabla reemplazada, sugerencias de downshift, XHR de resultados,
+navegación a la tienda) con una latencia configurable, y mide cuánto tarda
+cada espera frente al sleep que reemplaza.
+
+    python benchmarks/bench_waits.py --latency-ms 150 --repeat 5
+
+Requiere Chrome y chromedriver (se resuelven igual que en la aplicación).
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium import webdriver  # noqa: E402
+from selenium.webdriver.chrome.service import Service  # noqa: E402
+from selenium.webdriver.common.by import By  # noqa: E402
+from selenium.webdriver.support import expected_conditions as EC  # noqa: E402
+from selenium.webdriver.support.ui import WebDriverWait  # noqa: E402
+
+import config  # noqa: E402
+from driver_pool import build_chrome_options, resolve_chromedriver_path  # noqa: E402
+from waits import (  # noqa: E402
+    click_and_wait_for_navigation,
+    wait_for_dom_quiet,
+    wait_for_gone,
+    wait_for_network_idle,
+    wait_for_staleness,
+)
+
+
+PAGE = """<!doctype html>
+<html><body>
+<div id="app"></div>
+<button id="layer">capa</button>
+<table id="res0"><tbody><tr><td>inicial</td></tr></tbody></table>
+<input id="downshift-0-input">
+<ul id="menu"></ul>
+<button id="results">resultados</button>
+<div id="lista" style="display:block">candidatos</div>
+<button id="collapse">cerrar</button>
+<a id="nav" href="/slow?delay_ms={delay}">tienda</a>
+<script>
+var delay = {delay};
+// Hidratación: el DOM cambia durante `delay` ms tras cargar
+var t0 = Date.now();
+(function hydrate() {{
+    document.getElementById('app').textContent = Date.now();
+    if (Date.now() - t0 < delay) setTimeout(hydrate, 20);
+}})();
+document.getElementById('layer').onclick = function () {{
+    setTimeout(function () {{
+        var old = document.getElementById('res0');
+        var table = document.createElement('table');
+        table.id = 'res0';
+        table.innerHTML = '<tbody><tr><td>capa</td></tr></tbody>';
+        old.replaceWith(table);
+    }}, delay);
+}};
+document.getElementById('downshift-0-input').oninput = function () {{
+    setTimeout(function () {{
+        document.getElementById('menu').innerHTML = '<li id="downshift-0-item-0">Medellín</li>';
+    }}, delay);
+}};
+document.getElementById('results').onclick = function () {{
+    fetch('/slow?delay_ms=' + delay).then(function (r) {{ return r.text(); }}).then(function (t) {{
+        document.getElementById('app').innerHTML = '<p>' + t.length + '</p>';
+    }});
+}};
+document.getElementById('collapse').onclick = function () {{
+    setTimeout(function () {{ document.getElementById('lista').style.display = 'none'; }}, delay);
+}};
+</script>
+</body></html>
+"""
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        delay = int(parse_qs(parsed.query).get("delay_ms", ["0"])[0])
+        if parsed.path == "/slow":
+            time.sleep(delay / 1000)
+            body = "<html><body><p>producto</p></body></html>"
+        else:
+            body = PAGE.format(delay=delay)
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def measure(driver, url, scenario):
+    driver.get(url)
+    start = time.perf_counter()
+    if scenario == "hydrate":
+        wait_for_dom_quiet(driver, quiet_ms=500, timeout=10)
+    elif scenario == "layer":
+        old_table = driver.execute_script("return document.querySelector('table#res0');")
+        driver.find_element(By.ID, "layer").click()
+        wait_for_staleness(driver, old_table, timeout=5)
+        wait_for_dom_quiet(driver, quiet_ms=200, timeout=10)
+    elif scenario == "suggestions":
+        driver.find_element(By.ID, "downshift-0-input").send_keys("med")
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "[id^='downshift-0-item-']"))
+        )
+    elif scenario == "results":
+        driver.find_element(By.ID, "results").click()
+        wait_for_network_idle(driver, idle_ms=500, timeout=15)
+        wait_for_dom_quiet(driver, quiet_ms=300, timeout=10)
+    elif scenario == "collapse":
+        driver.find_element(By.ID, "collapse").click()
+        wait_for_gone(driver, driver.find_element(By.ID, "lista"), timeout=5)
+    elif scenario == "navigation":
+        click_and_wait_for_navigation(driver, driver.find_element(By.ID, "nav"))
+    return time.perf_counter() - start
+
+
+# Sleep fijo que reemplaza cada escenario y cuántas veces ocurre por solicitud
+SCENARIOS = {
+    "hydrate": 3.0,
+    "suggestions": 2.0,
+    "results": 5.0,
+    "collapse": 1.5,
+    "layer": 0.5,
+    "navigation": 1.0,
+}
+ENDPOINTS = {
+    "/scrape_direccion": {"layer": 15},
+    "/scrape_resultados (10 partidos)": {"hydrate": 1, "suggestions": 1, "results": 1, "collapse": 10},
+    "/product_images (por ítem)": {"navigation": 1},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=int, default=150, help="latencia simulada de cada señal")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/?delay_ms={args.latency_ms}"
+
+    driver_path = resolve_chromedriver_path(config.CHROMEDRIVER_PATH, config.CHROMEDRIVER_OFFLINE)
+    driver = webdriver.Chrome(service=Service(driver_path), options=build_chrome_options())
+    try:
+        medians = {}
+        print(f"{'escenario':<14}{'sleep (s)':>10}{'espera p50 (s)':>16}")
+        for scenario, sleep_s in SCENARIOS.items():
+            samples = [measure(driver, url, scenario) for _ in range(args.repeat)]
+            medians[scenario] = statistics.median(samples)
+            print(f"{scenario:<14}{sleep_s:>10.2f}{medians[scenario]:>16.3f}")
+
+        print()
+        print(f"{'endpoint':<36}{'sleep (s)':>10}{'esperas (s)':>13}{'ahorro (s)':>12}")
+        for endpoint, counts in ENDPOINTS.items():
+            before = sum(SCENARIOS[name] * n for name, n in counts.items())
+            after = sum(medians[name] * n for name, n in counts.items())
+            print(f"{endpoint:<36}{before:>10.2f}{after:>13.2f}{before - after:>12.2f}")
+    finally:
+        driver.quit()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def normalize(value: Any) -> Any:
+    # Claves insensibles a mayúsculas y espacios repetidos: "Calle 10 " == "calle  10"
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip().lower()
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    return value
+
+
+def make_key(namespace: str, params: Dict[str, Any]) -> str:
+    raw = json.dumps(normalize(params), sort_keys=True, ensure_ascii=False)
+    return f"{namespace}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+class ResultCache:
+    """Caché de resultados con TTL: nivel en memoria (LRU) + nivel SQLite opcional.
+
+    ``get_or_run`` agrupa las solicitudes idénticas concurrentes (single-flight)
+    para que compartan un único scrape. Con ``shared`` (ver ``shared_state.py``)
+    el segundo nivel es común a todas las réplicas y el agrupamiento también:
+    mientras una réplica hace el scrape (y renueva su candado cada
+    ``lock_ttl / 3`` segundos), las demás esperan su resultado. Si la réplica
+    cae, el candado vence a los ``lock_ttl`` segundos y otra toma el relevo.
+    Un fallo del nivel compartido no tumba la solicitud: se sigue con la memoria.
+    """
+
+    def __init__(self, max_entries: int, db_path: Optional[str] = None, disk_max_entries: int = 100000,
+                 shared=None, lock_ttl: float = 120.0, lock_poll: float = 0.5):
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self.shared = shared
+        self.lock_ttl = lock_ttl
+        self.lock_poll = lock_poll
+        self._owner = uuid.uuid4().hex
+        self._memory: "OrderedDict[str, Tuple[float, float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._writes = 0
+        self._conn = None
+        # El nivel compartido reemplaza al SQLite local
+        if db_path and shared is None:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS cache (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        stored_at REAL NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                    """
+                )
+
+    def _count(self, key: str, stat: str):
+        namespace = key.split(":", 1)[0]
+        counters = self._stats.setdefault(
+            namespace, {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+        )
+        counters[stat] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk": self._conn is not None,
+                "shared": self.shared.kind if self.shared is not None else None,
+                "namespaces": {name: dict(counters) for name, counters in self._stats.items()},
+            }
+
+    def get(self, key: str, max_age: Optional[float] = None, count: bool = True):
+        """Devuelve ``(True, valor)`` si hay entrada vigente, ``(False, None)`` si no."""
+        with self._lock:
+            entry = self._local_entry(key)
+        if entry is None and self.shared is not None:
+            entry = self._shared_get(key)
+        return self._settle(key, entry, max_age, count)
+
+    async def aget(self, key: str, max_age: Optional[float] = None, count: bool = True):
+        """Como ``get``, pero la consulta al nivel compartido no bloquea el event loop."""
+        with self._lock:
+            entry = self._local_entry(key)
+        if entry is None and self.shared is not None:
+            entry = await asyncio.to_thread(self._shared_get, key)
+        return self._settle(key, entry, max_age, count)
+
+    def _local_entry(self, key: str):
+        entry = self._memory.get(key)
+        if entry is None and self._conn is not None:
+            row = self._conn.execute(
+                "SELECT stored_at, expires_at, value FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                entry = (row[0], row[1], json.loads(row[2]))
+                self._remember(key, entry)
+        return entry
+
+    def _shared_get(self, key: str):
+        try:
+            return self.shared.cache_get(key)
+        except Exception as e:
+            logger.warning("Nivel compartido no disponible, se sigue con la memoria: %s", e)
+            return None
+
+    def _settle(self, key: str, entry, max_age: Optional[float], count: bool):
+        now = time.time()
+        with self._lock:
+            if entry is not None and key not in self._memory:
+                self._remember(key, entry)
+            found = (
+                entry is not None
+                and entry[1] > now
+                and (max_age is None or now - entry[0] <= max_age)
+            )
+            if found:
+                self._memory.move_to_end(key)
+            elif entry is not None and entry[1] <= now:
+                self._memory.pop(key, None)
+            if count:
+                self._count(key, "hits" if found else "misses")
+            return (True, entry[2]) if found else (False, None)
+
+    def set(self, key: str, value: Any, ttl: float):
+        entry = self._store(key, value, ttl)
+        if entry is not None and self.shared is not None:
+            self._shared_set(key, entry)
+
+    async def aset(self, key: str, value: Any, ttl: float):
+        entry = self._store(key, value, ttl)
+        if entry is not None and self.shared is not None:
+            await asyncio.to_thread(self._shared_set, key, entry)
+
+    def _store(self, key: str, value: Any, ttl: float):
+        if ttl <= 0:
+            return None
+        now = time.time()
+        entry = (now, now + ttl, value)
+        with self._lock:
+            self._remember(key, entry)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                        (key, json.dumps(value, ensure_ascii=False), entry[0], entry[1]),
+                    )
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    self._trim_disk(now)
+        return entry
+
+    def _shared_set(self, key: str, entry):
+        try:
+            self.shared.cache_set(key, entry)
+        except Exception as e:
+            logger.warning("No se pudo guardar en el nivel compartido: %s", e)
+
+    def _remember(self, key: str, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            evicted, _ = self._memory.popitem(last=False)
+            self._count(evicted, "evictions")
+
+    def _trim_disk(self, now: float):
+        with self._conn:
+            self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_entries,),
+            )
+
+    async def get_or_run(self, namespace: str, params: Dict[str, Any], ttl: float,
+                         run: Callable[[], Awaitable[Any]], read: bool = True, write: bool = True,
+                         max_age: Optional[float] = None):
+        """Devuelve ``(valor, estado)`` con estado HIT, COALESCED, MISS o BYPASS."""
+        key = make_key(namespace, params)
+        if read:
+            found, value = await self.aget(key, max_age)
+            if found:
+                return value, "HIT"
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                with self._lock:
+                    self._count(key, "coalesced")
+                return await asyncio.shield(inflight), "COALESCED"
+
+        future = asyncio.get_running_loop().create_future()
+        # Evita el aviso "exception was never retrieved" si nadie más espera
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if read:
+            self._inflight[key] = future
+        renewal = None
+        try:
+            if read and self.shared is not None:
+                locked, found, value = await self._wait_shared(key, max_age)
+                if found:
+                    with self._lock:
+                        self._count(key, "coalesced")
+                    future.set_result(value)
+                    return value, "COALESCED"
+                if locked:
+                    renewal = asyncio.create_task(self._renew_lock(key))
+            value = await run()
+            if write:
+                await self.aset(key, value, ttl)
+            future.set_result(value)
+            return value, "MISS" if read else "BYPASS"
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if renewal is not None:
+                renewal.cancel()
+                await self._shared_call(self.shared.release_lock, key, self._owner)
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _shared_call(self, method, *args):
+        """Llama al nivel compartido en un hilo; ante un fallo lo registra y devuelve ``None``."""
+        try:
+            return await asyncio.to_thread(method, *args)
+        except Exception as e:
+            logger.warning("Nivel compartido no disponible, se sigue con la memoria: %s", e)
+            return None
+
+    async def _renew_lock(self, key: str):
+        # Un scrape largo (MapGIS) puede durar más que lock_ttl: se extiende mientras corre
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            await self._shared_call(self.shared.acquire_lock, key, self._owner, self.lock_ttl)
+
+    async def _wait_shared(self, key: str, max_age: Optional[float]):
+        """Turno entre réplicas para calcular ``key``: ``(con candado, encontrado, valor)``.
+
+        Si otra réplica tiene el candado se espera a que deje el valor en el
+        nivel compartido o a que su candado venza. Si el nivel compartido
+        falla, se calcula sin candado.
+        """
+        while True:
+            acquired = await self._shared_call(self.shared.acquire_lock, key, self._owner, self.lock_ttl)
+            if acquired is None:
+                return False, False, None
+            if acquired:
+                break
+            await asyncio.sleep(self.lock_poll)
+            found, value = await self.aget(key, max_age, count=False)
+            if found:
+                return False, True, value
+        # El valor pudo llegar entre la primera consulta y el candado
+        found, value = await self.aget(key, max_age, count=False)
+        if found:
+            await self._shared_call(self.shared.release_lock, key, self._owner)
+            return False, True, value
+        return True, False, None
+
+
+def parse_cache_control(header: Optional[str]) -> Dict[str, Any]:
+    """Interpreta ``Cache-Control`` de la solicitud: no-cache, no-store y max-age."""
+    policy = {"read": True, "write": True, "max_age": None}
+    for directive in (header or "").lower().split(","):
+        directive = directive.strip()
+        if directive == "no-cache":
+            policy["read"] = False
+        elif directive == "no-store":
+            policy["read"] = False
+            policy["write"] = False
+        elif directive.startswith("max-age="):
+            try:
+                policy["max_age"] = float(directive.split("=", 1)[1])
+            except ValueError:
+                pass
+    return policy
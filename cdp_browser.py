@@ -0,0 +1,895 @@
+"""Backend de navegador por CDP directo, sin chromedriver.
+
+Un solo Chrome (idealmente ``chrome-headless-shell``) se controla por su
+websocket de DevTools: todas las pestañas comparten esa conexión, que
+multiplexa las respuestas por ``id`` y los eventos por ``sessionId``. Cada
+comando es un mensaje en el websocket en vez de una petición HTTP a
+chromedriver, y cada préstamo es una pestaña del mismo proceso en lugar de un
+Chrome completo.
+
+``CdpDriver`` y ``CdpElement`` imitan la parte de la API de Selenium que usan
+los scrapers (``get``, ``find_element``, ``execute_script``, ``click``,
+``send_keys``…), así que ``WebDriverWait``, ``expected_conditions`` y las
+esperas de ``waits`` funcionan igual.
+"""
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+import websocket
+from selenium.common.exceptions import (
+    JavascriptException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+
+import metrics
+from driver_pool import USER_AGENTS, PoolTimeout, process_tree_rss_mb
+
+logger = logging.getLogger(__name__)
+
+# Binarios que se prueban, en orden, si no se fija CDP_BROWSER_PATH
+BROWSER_BINARIES = ("chrome-headless-shell", "chromium", "chromium-browser", "google-chrome", "google-chrome-stable")
+
+# Evento que da por cargada la página según la estrategia de carga
+_LOAD_EVENTS = {"normal": "Page.loadEventFired", "eager": "Page.domContentEventFired"}
+
+# Teclas especiales de Selenium: (key, code, código virtual, texto)
+_KEYS = {
+    Keys.RETURN: ("Enter", "Enter", 13, "\r"),
+    Keys.ENTER: ("Enter", "Enter", 13, "\r"),
+    Keys.TAB: ("Tab", "Tab", 9, None),
+    Keys.BACKSPACE: ("Backspace", "Backspace", 8, None),
+    Keys.ESCAPE: ("Escape", "Escape", 27, None),
+    Keys.ARROW_LEFT: ("ArrowLeft", "ArrowLeft", 37, None),
+    Keys.ARROW_UP: ("ArrowUp", "ArrowUp", 38, None),
+    Keys.ARROW_RIGHT: ("ArrowRight", "ArrowRight", 39, None),
+    Keys.ARROW_DOWN: ("ArrowDown", "ArrowDown", 40, None),
+}
+
+# Envoltorio de execute_script. Los nodos viajan como {__cdpNode, __cdpDoc}: un índice en un
+# registro del documento, que desaparece al navegar (y así el elemento queda "stale").
+_SCRIPT_HEAD = """
+(function (args, isAsync) {
+    var registry = window.__cdpNodes;
+    if (!registry) {
+        registry = {doc: Math.random().toString(36).slice(2), nodes: [], ids: new WeakMap()};
+        Object.defineProperty(window, '__cdpNodes', {value: registry, enumerable: false});
+    }
+    function unwrap(value) {
+        if (Array.isArray(value)) return value.map(unwrap);
+        if (value && typeof value === 'object' && '__cdpNode' in value) {
+            var node = value.__cdpDoc === registry.doc ? registry.nodes[value.__cdpNode] : null;
+            if (!node || !node.isConnected) throw new Error('stale element reference');
+            return node;
+        }
+        return value;
+    }
+    function wrap(value, depth) {
+        if (value === undefined || value === null || typeof value === 'function') return null;
+        if (value instanceof Node) {
+            var id = registry.ids.get(value);
+            if (id === undefined) {
+                id = registry.nodes.push(value) - 1;
+                registry.ids.set(value, id);
+            }
+            return {__cdpNode: id, __cdpDoc: registry.doc};
+        }
+        if (typeof value !== 'object') return value;
+        if (depth > 10) return null;
+        if (Array.isArray(value) || value instanceof NodeList || value instanceof HTMLCollection) {
+            return Array.prototype.map.call(value, function (v) { return wrap(v, depth + 1); });
+        }
+        var out = {};
+        Object.keys(value).forEach(function (key) { out[key] = wrap(value[key], depth + 1); });
+        return out;
+    }
+    var fn = function () {
+"""
+_SCRIPT_TAIL = """
+    };
+    args = unwrap(args);
+    if (!isAsync) return wrap(fn.apply(null, args), 0);
+    return new Promise(function (resolve, reject) {
+        args.push(function (value) { resolve(wrap(value, 0)); });
+        try { fn.apply(null, args); } catch (e) { reject(e); }
+    });
+})(%s, %s)
+"""
+
+_FIND = """
+var by = arguments[0], value = arguments[1], root = arguments[2] || document, all = arguments[3];
+if (by === 'xpath') {
+    var snapshot = document.evaluate(value, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var nodes = [];
+    for (var i = 0; i < snapshot.snapshotLength && (all || i < 1); i++) nodes.push(snapshot.snapshotItem(i));
+    return nodes;
+}
+return all ? Array.from(root.querySelectorAll(value)) : [root.querySelector(value)].filter(Boolean);
+"""
+
+_GET_ATTRIBUTE = """
+var el = arguments[0], name = arguments[1];
+if (name === 'class' || name === 'className') return el.getAttribute('class');
+var value = el[name];
+if (typeof value === 'boolean') return value ? 'true' : null;
+if (value !== undefined && value !== null && typeof value !== 'object' && typeof value !== 'function') {
+    return String(value);
+}
+return el.getAttribute(name);
+"""
+
+_IS_DISPLAYED = """
+var el = arguments[0], style = window.getComputedStyle(el);
+return el.getClientRects().length > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+"""
+
+# Centro del elemento tras desplazarlo a la vista; null si no ocupa espacio
+_CLICK_POINT = """
+var el = arguments[0];
+el.scrollIntoView({block: 'center', inline: 'center'});
+var rect = el.getBoundingClientRect();
+if (!rect.width || !rect.height) return null;
+return [rect.left + rect.width / 2, rect.top + rect.height / 2];
+"""
+
+# Con el setter nativo para que React y similares vean el cambio
+_CLEAR = """
+var el = arguments[0];
+el.focus();
+var descriptor = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(el), 'value');
+if (descriptor && descriptor.set) descriptor.set.call(el, ''); else el.value = '';
+el.dispatchEvent(new Event('input', {bubbles: true}));
+el.dispatchEvent(new Event('change', {bubbles: true}));
+"""
+
+
+class CdpError(WebDriverException):
+    """Chrome respondió un error a un comando de DevTools o se cerró la conexión."""
+
+
+def resolve_browser_path(pinned_path: Optional[str] = None) -> str:
+    if pinned_path:
+        if not (os.path.isfile(pinned_path) and os.access(pinned_path, os.X_OK)):
+            raise FileNotFoundError(f"Navegador no encontrado o no ejecutable en {pinned_path}")
+        return pinned_path
+    for name in BROWSER_BINARIES:
+        path = shutil.which(name)
+        if path:
+            return path
+    raise FileNotFoundError("Define CDP_BROWSER_PATH o instala chrome-headless-shell en el PATH")
+
+
+def _xpath_literal(value: str) -> str:
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    return "concat(" + ", '\"', ".join(f'"{part}"' for part in value.split('"')) + ")"
+
+
+def _locator(by: str, value: str) -> Tuple[str, str]:
+    """Localizador de Selenium como ``('css' | 'xpath', expresión)``."""
+    if by == By.CSS_SELECTOR:
+        return "css", value
+    if by == By.XPATH:
+        return "xpath", value
+    if by == By.ID:
+        return "css", f"[id={json.dumps(value)}]"
+    if by == By.NAME:
+        return "css", f"[name={json.dumps(value)}]"
+    if by == By.CLASS_NAME:
+        return "css", f"[class~={json.dumps(value)}]"
+    if by == By.TAG_NAME:
+        return "css", value
+    if by == By.LINK_TEXT:
+        return "xpath", f".//a[normalize-space(.)={_xpath_literal(value)}]"
+    if by == By.PARTIAL_LINK_TEXT:
+        return "xpath", f".//a[contains(., {_xpath_literal(value)})]"
+    raise WebDriverException(f"Localizador no soportado: {by}")
+
+
+class CdpConnection:
+    """Websocket de DevTools compartido: respuestas por ``id`` y eventos por sesión."""
+
+    def __init__(self, ws_url: str, timeout: float = 30.0):
+        self.timeout = timeout
+        self._ws = websocket.create_connection(ws_url, timeout=timeout, suppress_origin=True,
+                                               enable_multithread=True)
+        self._ws.settimeout(None)
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._listeners: Dict[Tuple[Optional[str], str], List[Callable[[dict], None]]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._reader = threading.Thread(target=self._read, name="cdp-reader", daemon=True)
+        self._reader.start()
+
+    @property
+    def alive(self) -> bool:
+        return not self._closed
+
+    def _read(self):
+        try:
+            while True:
+                message = json.loads(self._ws.recv())
+                if "id" in message:
+                    with self._lock:
+                        future = self._pending.pop(message["id"], None)
+                    if future is None or future.done():
+                        continue
+                    if "error" in message:
+                        future.set_exception(CdpError(message["error"].get("message", str(message["error"]))))
+                    else:
+                        future.set_result(message.get("result", {}))
+                elif "method" in message:
+                    with self._lock:
+                        listeners = list(self._listeners.get((message.get("sessionId"), message["method"]), ()))
+                    for listener in listeners:
+                        try:
+                            listener(message.get("params", {}))
+                        except Exception as e:
+                            logger.warning("Error en el manejador de %s: %s", message["method"], e)
+        except Exception as e:
+            if not self._closed:
+                logger.warning("Conexión CDP cerrada: %s", e)
+        finally:
+            self._closed = True
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(CdpError("La conexión con el navegador se cerró"))
+
+    def send_future(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None) -> Future:
+        future: Future = Future()
+        if self._closed:
+            future.set_exception(CdpError("La conexión con el navegador se cerró"))
+            return future
+        message = {"id": next(self._ids), "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        with self._lock:
+            self._pending[message["id"]] = future
+        try:
+            self._ws.send(json.dumps(message))
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(message["id"], None)
+            future.set_exception(CdpError(f"No se pudo enviar {method}: {e}"))
+        return future
+
+    def send(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None,
+             timeout: Optional[float] = None) -> dict:
+        timeout = self.timeout if timeout is None else timeout
+        future = self.send_future(method, params, session_id)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutException(f"{method} sin respuesta en {timeout} s")
+
+    def on(self, session_id: Optional[str], method: str, listener: Callable[[dict], None]) -> Callable[[], None]:
+        """Suscribe ``listener`` a un evento; devuelve la función que lo desuscribe."""
+        key = (session_id, method)
+        with self._lock:
+            self._listeners.setdefault(key, []).append(listener)
+
+        def remove():
+            with self._lock:
+                listeners = self._listeners.get(key, [])
+                if listener in listeners:
+                    listeners.remove(listener)
+                if not listeners:
+                    self._listeners.pop(key, None)
+        return remove
+
+    def expect(self, session_id: Optional[str], method: str) -> Future:
+        """Future que se resuelve con el próximo evento ``method``; cancelarlo lo desuscribe."""
+        future: Future = Future()
+
+        def fire(params):
+            if not future.done():
+                try:
+                    future.set_result(params)
+                except Exception:
+                    pass
+        remove = self.on(session_id, method, fire)
+        future.add_done_callback(lambda _: remove())
+        return future
+
+    def close(self):
+        self._closed = True
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+
+
+class CdpBrowser:
+    """Un proceso de Chrome controlado por su websocket de DevTools (o uno remoto ya abierto)."""
+
+    def __init__(self, ws_url: str, process: Optional[subprocess.Popen] = None,
+                 user_data_dir: Optional[str] = None, command_timeout: float = 30.0):
+        self.connection = CdpConnection(ws_url, timeout=command_timeout)
+        self.process = process
+        self.user_data_dir = user_data_dir
+
+    @classmethod
+    def launch(cls, binary: Optional[str] = None, window_size: str = "1280,800",
+               startup_timeout: float = 30.0, command_timeout: float = 30.0) -> "CdpBrowser":
+        path = resolve_browser_path(binary)
+        user_data_dir = tempfile.mkdtemp(prefix="cdp-browser-")
+        args = [
+            path,
+            "--headless",
+            "--remote-debugging-port=0",
+            f"--user-data-dir={user_data_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "--disable-gpu",
+            "--disable-extensions",
+            "--disable-notifications",
+            "--mute-audio",
+            "--ignore-certificate-errors",
+            f"--window-size={window_size}",
+            f"--user-agent={random.choice(USER_AGENTS)}",
+            "about:blank",
+        ]
+        process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # Con el puerto 0 Chrome elige uno libre y lo escribe en DevToolsActivePort
+        port_file = os.path.join(user_data_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + startup_timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                shutil.rmtree(user_data_dir, ignore_errors=True)
+                raise CdpError(f"El navegador terminó al arrancar (código {process.returncode})")
+            try:
+                with open(port_file) as f:
+                    port, ws_path = f.read().split("\n")[:2]
+                if port and ws_path:
+                    return cls(f"ws://127.0.0.1:{port.strip()}{ws_path.strip()}", process, user_data_dir,
+                               command_timeout)
+            except (OSError, ValueError):
+                pass
+            time.sleep(0.05)
+        process.kill()
+        shutil.rmtree(user_data_dir, ignore_errors=True)
+        raise TimeoutException(f"El navegador no abrió DevTools en {startup_timeout} s")
+
+    @classmethod
+    def connect(cls, url: str, command_timeout: float = 30.0) -> "CdpBrowser":
+        """``ws://…`` directo o ``http://host:puerto`` (se consulta ``/json/version``)."""
+        if url.startswith(("http://", "https://")):
+            url = requests.get(url.rstrip("/") + "/json/version", timeout=command_timeout).json()[
+                "webSocketDebuggerUrl"
+            ]
+        return cls(url, command_timeout=command_timeout)
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    @property
+    def alive(self) -> bool:
+        return self.connection.alive and (self.process is None or self.process.poll() is None)
+
+    def new_page(self, page_load_strategy: str = "normal", isolated: bool = False) -> "CdpDriver":
+        """Pestaña nueva; con ``isolated``, dentro de un contexto de incógnito propio.
+
+        Un contexto tiene sus propias cookies, almacenamiento y caché, como un
+        perfil aparte, pero vive dentro del mismo proceso de Chrome: crearlo y
+        descartarlo toma milisegundos.
+        """
+        context_id = None
+        if isolated:
+            context_id = self.connection.send(
+                "Target.createBrowserContext", {"disposeOnDetach": True}
+            )["browserContextId"]
+        target_id = None
+        try:
+            params = {"url": "about:blank"}
+            if context_id:
+                params["browserContextId"] = context_id
+            target_id = self.connection.send("Target.createTarget", params)["targetId"]
+            session_id = self.connection.send(
+                "Target.attachToTarget", {"targetId": target_id, "flatten": True}
+            )["sessionId"]
+            driver = CdpDriver(self, target_id, session_id, page_load_strategy, context_id)
+            driver.execute_cdp_cmd("Page.enable", {})
+            return driver
+        except Exception:
+            self.close_page(target_id, context_id)
+            raise
+
+    def close_page(self, target_id: Optional[str], browser_context_id: Optional[str] = None):
+        # Descartar el contexto cierra también sus pestañas
+        try:
+            if browser_context_id:
+                self.connection.send("Target.disposeBrowserContext", {"browserContextId": browser_context_id})
+            elif target_id:
+                self.connection.send("Target.closeTarget", {"targetId": target_id})
+        except Exception as e:
+            logger.debug("No se pudo cerrar la pestaña %s: %s", target_id, e)
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.connection.send("Browser.close", timeout=5)
+            except Exception:
+                pass
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.connection.close()
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+class CdpDriver:
+    """Una pestaña con la API de Selenium que usan los scrapers."""
+
+    def __init__(self, browser: CdpBrowser, target_id: str, session_id: str, page_load_strategy: str = "normal",
+                 browser_context_id: Optional[str] = None):
+        self.browser = browser
+        self.connection = browser.connection
+        self.target_id = target_id
+        self.session_id = session_id
+        self.browser_context_id = browser_context_id
+        self.closed = False
+        self._loading: Optional[Future] = None
+        self.page_load_strategy = page_load_strategy
+        # Mismos valores por defecto que WebDriver
+        self.page_load_timeout = 300.0
+        self.script_timeout = 30.0
+
+    @property
+    def capabilities(self) -> Dict[str, Any]:
+        return {"browserName": "chrome", "pageLoadStrategy": self.page_load_strategy}
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: Optional[dict] = None, timeout: Optional[float] = None) -> dict:
+        return self.connection.send(cmd, cmd_args, self.session_id, timeout)
+
+    def set_page_load_timeout(self, seconds: float):
+        self.page_load_timeout = seconds
+
+    def set_script_timeout(self, seconds: float):
+        self.script_timeout = seconds
+
+    def implicitly_wait(self, seconds: float):
+        # Los scrapers esperan siempre con WebDriverWait; no hay espera implícita
+        pass
+
+    def get(self, url: str):
+        event = _LOAD_EVENTS.get(self.page_load_strategy)
+        loaded = self.connection.expect(self.session_id, event) if event else None
+        self._loading = loaded
+        try:
+            result = self.execute_cdp_cmd("Page.navigate", {"url": url}, timeout=self.page_load_timeout)
+            if result.get("errorText"):
+                raise WebDriverException(f"unknown error: {result['errorText']} ({url})")
+            # Sin loaderId la navegación fue dentro del mismo documento (un #ancla)
+            if loaded is not None and result.get("loaderId"):
+                try:
+                    loaded.result(self.page_load_timeout)
+                except FutureTimeout:
+                    raise TimeoutException(f"La página no cargó en {self.page_load_timeout} s: {url}")
+        finally:
+            self._loading = None
+            if loaded is not None:
+                loaded.cancel()
+
+    def stop_loading(self):
+        """Corta la carga en curso desde otro hilo; el ``get`` que la esperaba vuelve enseguida."""
+        loading = self._loading
+        if loading is not None and not loading.done():
+            try:
+                loading.set_result(None)
+            except Exception:
+                pass
+        try:
+            self.execute_cdp_cmd("Page.stopLoading", {}, timeout=5)
+        except Exception as e:
+            logger.debug("No se pudo detener la carga: %s", e)
+
+    def back(self):
+        history = self.execute_cdp_cmd("Page.getNavigationHistory", {})
+        index = history["currentIndex"]
+        if index <= 0:
+            return
+        entry = history["entries"][index - 1]
+        self.execute_cdp_cmd("Page.navigateToHistoryEntry", {"entryId": entry["id"]})
+        # Una página restaurada desde la caché de ida y vuelta no emite load: se sondea
+        deadline = time.monotonic() + self.page_load_timeout
+        while time.monotonic() < deadline:
+            try:
+                href, state = self.execute_script("return [location.href, document.readyState];")
+                if href == entry["url"] and state != "loading":
+                    return
+            except (CdpError, JavascriptException):
+                pass
+            time.sleep(0.05)
+        raise TimeoutException(f"La página anterior no cargó en {self.page_load_timeout} s")
+
+    @property
+    def current_url(self) -> str:
+        return self.execute_script("return location.href;")
+
+    @property
+    def title(self) -> str:
+        return self.execute_script("return document.title;")
+
+    @property
+    def page_source(self) -> str:
+        return self.execute_script("return document.documentElement.outerHTML;")
+
+    def _evaluate(self, script: str, args, is_async: bool, timeout: Optional[float] = None):
+        expression = _SCRIPT_HEAD + script + _SCRIPT_TAIL % (
+            json.dumps([self._serialize(arg) for arg in args]), "true" if is_async else "false",
+        )
+        response = self.execute_cdp_cmd("Runtime.evaluate", {
+            "expression": expression,
+            "returnByValue": True,
+            "awaitPromise": is_async,
+            "userGesture": True,
+        }, timeout=timeout)
+        details = response.get("exceptionDetails")
+        if details:
+            message = (details.get("exception") or {}).get("description") or details.get("text") or "error de JavaScript"
+            if "stale element reference" in message:
+                raise StaleElementReferenceException(message)
+            raise JavascriptException(message)
+        return self._deserialize(response.get("result", {}).get("value"))
+
+    def execute_script(self, script: str, *args):
+        try:
+            return self._evaluate(script, args, is_async=False)
+        except CdpError as e:
+            # El documento se reemplazó mientras se evaluaba (p. ej. un clic que navega)
+            if "context" in str(e).lower():
+                raise StaleElementReferenceException(str(e))
+            raise
+
+    def execute_async_script(self, script: str, *args):
+        return self._evaluate(script, args, is_async=True, timeout=self.script_timeout)
+
+    def _serialize(self, value):
+        if isinstance(value, CdpElement):
+            return {"__cdpNode": value.node_id, "__cdpDoc": value.doc}
+        if isinstance(value, (list, tuple)):
+            return [self._serialize(item) for item in value]
+        return value
+
+    def _deserialize(self, value):
+        if isinstance(value, list):
+            return [self._deserialize(item) for item in value]
+        if isinstance(value, dict):
+            if "__cdpNode" in value:
+                return CdpElement(self, value["__cdpNode"], value["__cdpDoc"])
+            return {key: self._deserialize(item) for key, item in value.items()}
+        return value
+
+    def _find(self, by: str, value: str, root: Optional["CdpElement"], find_all: bool) -> List["CdpElement"]:
+        kind, expression = _locator(by, value)
+        return self.execute_script(_FIND, kind, expression, root, find_all)
+
+    def find_element(self, by: str = By.ID, value: Optional[str] = None) -> "CdpElement":
+        elements = self._find(by, value, None, False)
+        if not elements:
+            raise NoSuchElementException(f"No se encontró el elemento: {by}={value}")
+        return elements[0]
+
+    def find_elements(self, by: str = By.ID, value: Optional[str] = None) -> List["CdpElement"]:
+        return self._find(by, value, None, True)
+
+    def dispatch_key(self, key: str, code: str, key_code: int, text: Optional[str] = None):
+        down = {"type": "keyDown" if text else "rawKeyDown", "key": key, "code": code,
+                "windowsVirtualKeyCode": key_code, "nativeVirtualKeyCode": key_code}
+        if text:
+            down["text"] = text
+        self.execute_cdp_cmd("Input.dispatchKeyEvent", down)
+        self.execute_cdp_cmd("Input.dispatchKeyEvent", {
+            "type": "keyUp", "key": key, "code": code,
+            "windowsVirtualKeyCode": key_code, "nativeVirtualKeyCode": key_code,
+        })
+
+    def quit(self):
+        self.closed = True
+        self.browser.close_page(self.target_id, self.browser_context_id)
+
+
+class CdpElement:
+    """Referencia a un nodo del documento; deja de valer (stale) al navegar o al quitarse del DOM."""
+
+    def __init__(self, driver: CdpDriver, node_id: int, doc: str):
+        self.parent = driver
+        self.node_id = node_id
+        self.doc = doc
+
+    def __eq__(self, other):
+        return isinstance(other, CdpElement) and (self.node_id, self.doc) == (other.node_id, other.doc)
+
+    def __hash__(self):
+        return hash((self.node_id, self.doc))
+
+    def __repr__(self):
+        return f"<CdpElement {self.doc}:{self.node_id}>"
+
+    @property
+    def tag_name(self) -> str:
+        return self.parent.execute_script("return arguments[0].tagName.toLowerCase();", self)
+
+    @property
+    def text(self) -> str:
+        return self.parent.execute_script(
+            "var el = arguments[0]; return (el.innerText || el.textContent || '').trim();", self
+        )
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        return self.parent.execute_script(_GET_ATTRIBUTE, self, name)
+
+    def get_dom_attribute(self, name: str) -> Optional[str]:
+        return self.parent.execute_script("return arguments[0].getAttribute(arguments[1]);", self, name)
+
+    def is_displayed(self) -> bool:
+        return self.parent.execute_script(_IS_DISPLAYED, self)
+
+    def is_enabled(self) -> bool:
+        return self.parent.execute_script("return !arguments[0].disabled;", self)
+
+    def click(self):
+        point = self.parent.execute_script(_CLICK_POINT, self)
+        if point is None:
+            self.parent.execute_script("arguments[0].click();", self)
+            return
+        x, y = point
+        for event, button in (("mouseMoved", "none"), ("mousePressed", "left"), ("mouseReleased", "left")):
+            self.parent.execute_cdp_cmd("Input.dispatchMouseEvent", {
+                "type": event, "x": x, "y": y, "button": button, "clickCount": 0 if button == "none" else 1,
+            })
+
+    def clear(self):
+        self.parent.execute_script(_CLEAR, self)
+
+    def send_keys(self, *value):
+        self.parent.execute_script("arguments[0].focus();", self)
+        text = "".join(str(item) for item in value)
+        pending: List[str] = []
+        for char in text:
+            key = _KEYS.get(char)
+            if key is None:
+                pending.append(char)
+                continue
+            if pending:
+                self.parent.execute_cdp_cmd("Input.insertText", {"text": "".join(pending)})
+                pending = []
+            self.parent.dispatch_key(*key)
+        if pending:
+            self.parent.execute_cdp_cmd("Input.insertText", {"text": "".join(pending)})
+
+    def find_element(self, by: str = By.ID, value: Optional[str] = None) -> "CdpElement":
+        elements = self.parent._find(by, value, self, False)
+        if not elements:
+            raise NoSuchElementException(f"No se encontró el elemento: {by}={value}")
+        return elements[0]
+
+    def find_elements(self, by: str = By.ID, value: Optional[str] = None) -> List["CdpElement"]:
+        return self.parent._find(by, value, self, True)
+
+
+class CdpPagePool:
+    """Pestañas de un único Chrome controlado por CDP, con la interfaz de ``DriverPool``.
+
+    Cada préstamo abre una pestaña nueva y al devolverla se cierra, así que no
+    hay estado que limpiar. Con ``isolate`` cada pestaña va en su propio
+    contexto de incógnito: los scrapes simultáneos no comparten cookies ni
+    almacenamiento. Si el navegador se cae se relanza en el siguiente
+    préstamo; tras ``max_uses`` pestañas o al superar ``max_rss_mb`` se lanza
+    otro y el anterior se cierra cuando se devuelve su última pestaña.
+    """
+
+    def __init__(self, size: int, lease_timeout: float = 30.0, browser_path: Optional[str] = None,
+                 browser_url: Optional[str] = None, window_size: str = "1280,800", max_uses: int = 0,
+                 max_rss_mb: int = 0, page_load_strategy: str = "normal", command_timeout: float = 30.0,
+                 isolate: bool = True):
+        self.size = size
+        self.isolate = isolate
+        self.lease_timeout = lease_timeout
+        self.browser_path = browser_path
+        self.browser_url = browser_url
+        self.window_size = window_size
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.page_load_strategy = page_load_strategy
+        self.command_timeout = command_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._browser: Optional[CdpBrowser] = None
+        self._open: Dict[int, int] = {}
+        self._uses: Dict[int, int] = {}
+        self._retired: Dict[int, CdpBrowser] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _launch(self) -> CdpBrowser:
+        with metrics.stage("driver_launch"):
+            if self.browser_url:
+                browser = CdpBrowser.connect(self.browser_url, self.command_timeout)
+            else:
+                browser = CdpBrowser.launch(self.browser_path, self.window_size,
+                                            command_timeout=self.command_timeout)
+        self._open[id(browser)] = 0
+        self._uses[id(browser)] = 0
+        logger.info("Navegador CDP iniciado correctamente.")
+        return browser
+
+    def _current_browser(self) -> CdpBrowser:
+        dead = None
+        try:
+            with self._lock:
+                browser = self._browser
+                if browser is not None and not browser.alive:
+                    logger.warning("El navegador CDP dejó de responder, se relanza.")
+                    dead = self._retire(browser)
+                    browser = None
+                if browser is None:
+                    browser = self._browser = self._launch()
+                self._open[id(browser)] += 1
+                self._uses[id(browser)] += 1
+                return browser
+        finally:
+            if dead is not None:
+                self._dispose(dead)
+
+    def _retire(self, browser: CdpBrowser) -> Optional[CdpBrowser]:
+        """Saca ``browser`` del turno; devuelve el navegador que hay que cerrar, si ya no tiene pestañas.
+
+        Llamar con el lock tomado y cerrar lo devuelto con ``_dispose`` ya fuera del lock.
+        """
+        if self._browser is browser:
+            self._browser = None
+        if self._open.get(id(browser), 0) > 0 and browser.alive:
+            self._retired[id(browser)] = browser
+            return None
+        return self._forget(browser)
+
+    def _forget(self, browser: CdpBrowser) -> CdpBrowser:
+        # Llamar con el lock tomado
+        self._open.pop(id(browser), None)
+        self._uses.pop(id(browser), None)
+        self._retired.pop(id(browser), None)
+        return browser
+
+    def _dispose(self, browser: CdpBrowser):
+        # Sin el lock: cerrar el navegador puede tardar varios segundos
+        try:
+            browser.close()
+            logger.debug("Navegador CDP cerrado.")
+        except Exception as e:
+            logger.warning("Error al cerrar el navegador CDP: %s", e)
+
+    def warm(self, count: Optional[int] = None):
+        if count == 0:
+            return
+        try:
+            with self._lock:
+                if self._browser is None:
+                    self._browser = self._launch()
+            logger.info("Navegador CDP precalentado.")
+        except Exception as e:
+            logger.exception("Error al precalentar el navegador CDP: %s", e)
+
+    @metrics.timed("driver_acquire")
+    def acquire(self, timeout: Optional[float] = None, page_load_strategy: Optional[str] = None) -> CdpDriver:
+        if self._closed:
+            raise RuntimeError("El pool de navegadores está cerrado")
+        timeout = self.lease_timeout if timeout is None else timeout
+        if not self._slots.acquire(timeout=timeout):
+            if timeout > 0:
+                metrics.count_timeout("driver_acquire")
+            raise PoolTimeout(f"No hay pestañas disponibles tras {timeout} s")
+        browser = None
+        try:
+            browser = self._current_browser()
+            return browser.new_page(page_load_strategy or self.page_load_strategy, self.isolate)
+        except Exception:
+            if browser is not None:
+                self._page_closed(browser)
+            self._slots.release()
+            raise
+
+    def renew(self, driver: CdpDriver) -> CdpDriver:
+        """Cambia la pestaña (y su contexto) por una limpia sin soltar el turno del pool.
+
+        Si falla, el turno sigue tomado: el llamador devuelve ``driver`` con ``release``.
+        """
+        self._close(driver)
+        browser = self._current_browser()
+        try:
+            return browser.new_page(driver.page_load_strategy, self.isolate)
+        except Exception:
+            self._page_closed(browser)
+            raise
+
+    def release(self, driver: CdpDriver, discard: bool = False):
+        try:
+            self._close(driver)
+        finally:
+            self._slots.release()
+
+    def _close(self, driver: CdpDriver):
+        if driver.closed:
+            return
+        try:
+            driver.quit()
+        finally:
+            self._page_closed(driver.browser)
+
+    def _page_closed(self, browser: CdpBrowser):
+        # La memoria se mide antes de tomar el lock: recorrer /proc es lento
+        over_memory = browser is self._browser and self._over_memory(browser)
+        to_close = None
+        with self._lock:
+            if id(browser) not in self._open:
+                return
+            self._open[id(browser)] -= 1
+            if id(browser) in self._retired:
+                if self._open[id(browser)] <= 0:
+                    to_close = self._forget(browser)
+            elif self._closed or over_memory or self._over_uses(browser):
+                to_close = self._retire(browser)
+        if to_close is not None:
+            self._dispose(to_close)
+
+    def _over_uses(self, browser: CdpBrowser) -> bool:
+        uses = self._uses.get(id(browser), 0)
+        if self.max_uses and uses >= self.max_uses:
+            logger.info("Reciclando navegador CDP tras %d pestañas.", uses)
+            return True
+        return False
+
+    def _over_memory(self, browser: CdpBrowser) -> bool:
+        if self.max_rss_mb and browser.pid:
+            rss = process_tree_rss_mb(browser.pid)
+            if rss > self.max_rss_mb:
+                logger.info("Reciclando navegador CDP por memoria: %.0f MB.", rss)
+                return True
+        return False
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None, page_load_strategy: Optional[str] = None):
+        driver = self.acquire(timeout, page_load_strategy)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            browsers = list(self._retired.values())
+            if self._browser is not None:
+                browsers.append(self._browser)
+                self._browser = None
+            for browser in browsers:
+                self._forget(browser)
+        for browser in browsers:
+            self._dispose(browser)
@@ -0,0 +1,287 @@
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_list(name: str, default: list) -> list:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return float(value)
+
+
+def _env_rate_limits(name: str, default: str) -> dict:
+    """``host=rps:ráfaga`` separados por comas, p. ej. ``google.com=0.5:2,medellin.gov.co=10:20``."""
+    limits = {}
+    for item in _env_list(name, [item for item in default.split(",") if item]):
+        host, _, rule = item.partition("=")
+        rate, _, burst = rule.partition(":")
+        limits[host.strip()] = (float(rate), int(burst) if burst.strip() else max(1, int(float(rate))))
+    return limits
+
+
+# ------------------- chromedriver -------------------
+
+# Ruta fija a chromedriver; si se define no se usa webdriver-manager
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH") or None
+# Sin acceso a red: usar CHROMEDRIVER_PATH o el chromedriver del PATH
+CHROMEDRIVER_OFFLINE = _env_bool("CHROMEDRIVER_OFFLINE", False)
+
+# ------------------- Pool de navegadores -------------------
+
+# Número máximo de navegadores Chrome vivos al mismo tiempo
+DRIVER_POOL_SIZE = _env_int("DRIVER_POOL_SIZE", 2)
+# Navegadores que se lanzan al arrancar la aplicación
+DRIVER_POOL_WARM = _env_int("DRIVER_POOL_WARM", DRIVER_POOL_SIZE)
+# Segundos máximos que una solicitud espera por un navegador libre
+DRIVER_LEASE_TIMEOUT = _env_float("DRIVER_LEASE_TIMEOUT", 30.0)
+# Usos antes de reciclar un navegador (0 = sin límite)
+DRIVER_MAX_USES = _env_int("DRIVER_MAX_USES", 50)
+# Memoria RSS máxima (MB) de chromedriver + Chrome antes de reciclar (0 = sin límite)
+DRIVER_MAX_RSS_MB = _env_int("DRIVER_MAX_RSS_MB", 1024)
+# Timeout (s) de scripts asíncronos que recupera cada navegador al volver al pool
+DRIVER_SCRIPT_TIMEOUT = _env_float("DRIVER_SCRIPT_TIMEOUT", 30.0)
+
+# ------------------- Backend de navegador -------------------
+
+# selenium (Chrome + chromedriver) o cdp (DevTools directo sobre un solo Chrome, idealmente
+# chrome-headless-shell); por endpoint con BROWSER_BACKEND_<ENDPOINT>=cdp
+BROWSER_BACKEND = os.getenv("BROWSER_BACKEND", "selenium")
+# Binario para el backend cdp; por defecto el primero de chrome-headless-shell, chromium o google-chrome
+CDP_BROWSER_PATH = os.getenv("CDP_BROWSER_PATH") or None
+# Conectarse a un Chrome ya abierto (ws://… o http://host:9222) en vez de lanzar uno
+CDP_BROWSER_URL = os.getenv("CDP_BROWSER_URL") or None
+# Pestañas abiertas a la vez en el navegador cdp
+CDP_MAX_PAGES = _env_int("CDP_MAX_PAGES", DRIVER_POOL_SIZE * 4)
+CDP_WINDOW_SIZE = os.getenv("CDP_WINDOW_SIZE", "1280,800")
+# Cada préstamo (y cada ítem de /product_images) en su propio contexto de incógnito:
+# cookies y almacenamiento aislados dentro del mismo proceso de Chrome
+CDP_ISOLATE_CONTEXTS = _env_bool("CDP_ISOLATE_CONTEXTS", True)
+# Pestañas y memoria RSS (MB) antes de reemplazar el navegador cdp (0 = sin límite)
+CDP_MAX_USES = _env_int("CDP_MAX_USES", 500)
+CDP_MAX_RSS_MB = _env_int("CDP_MAX_RSS_MB", 2048)
+
+# ------------------- Política de recursos -------------------
+
+SCRAPER_ENDPOINTS = ("scrape_direccion", "scrape_resultados", "verify_product", "product_images")
+
+# Bloquea imágenes, fuentes, trackers, etc. vía CDP en cada préstamo de navegador
+RESOURCE_BLOCKING_ENABLED = _env_bool("RESOURCE_BLOCKING_ENABLED", True)
+# Dominios extra a bloquear y dominios que nunca se bloquean (separados por comas)
+RESOURCE_BLOCK_DOMAINS = _env_list("RESOURCE_BLOCK_DOMAINS", [])
+RESOURCE_ALLOW_DOMAINS = _env_list("RESOURCE_ALLOW_DOMAINS", [])
+# Estrategia de carga de los navegadores precalentados (normal, eager, none)
+PAGE_LOAD_STRATEGY = os.getenv("PAGE_LOAD_STRATEGY", "eager")
+# MapGIS oculta con CSS sus avisos (alertify, "sin datos"): sin hojas de estilo parecerían visibles
+_DEFAULT_BLOCK_TYPES = {"scrape_direccion": ["image", "font", "media"]}
+# Por endpoint: RESOURCE_BLOCK_TYPES_<ENDPOINT>=image,font y PAGE_LOAD_STRATEGY_<ENDPOINT>=eager
+RESOURCE_POLICIES = {
+    endpoint: {
+        "block_types": _env_list(
+            f"RESOURCE_BLOCK_TYPES_{endpoint.upper()}",
+            _DEFAULT_BLOCK_TYPES.get(endpoint, ["image", "font", "stylesheet", "media"]),
+        ),
+        "page_load_strategy": os.getenv(f"PAGE_LOAD_STRATEGY_{endpoint.upper()}", PAGE_LOAD_STRATEGY),
+    }
+    for endpoint in SCRAPER_ENDPOINTS
+}
+
+# Backend de navegador por endpoint (scrape_direccion usa pestañas e iframes: siempre selenium)
+BROWSER_BACKENDS = {
+    endpoint: os.getenv(f"BROWSER_BACKEND_{endpoint.upper()}", BROWSER_BACKEND)
+    for endpoint in SCRAPER_ENDPOINTS
+}
+
+# ------------------- Ejecutor de scraping -------------------
+
+# Hilos que ejecutan código Selenium fuera del event loop
+EXECUTOR_MAX_WORKERS = _env_int("EXECUTOR_MAX_WORKERS", DRIVER_POOL_SIZE)
+# Trabajos que pueden esperar turno por endpoint antes de responder 503
+EXECUTOR_QUEUE_SIZE = _env_int("EXECUTOR_QUEUE_SIZE", 8)
+# Valor de la cabecera Retry-After (segundos) en las respuestas 503
+EXECUTOR_RETRY_AFTER = _env_int("EXECUTOR_RETRY_AFTER", 5)
+# Trabajos simultáneos por endpoint, p. ej. CONCURRENCY_SCRAPE_DIRECCION=1
+ENDPOINT_CONCURRENCY = {
+    endpoint: _env_int(f"CONCURRENCY_{endpoint.upper()}", EXECUTOR_MAX_WORKERS)
+    for endpoint in SCRAPER_ENDPOINTS
+}
+# Resultados en memoria por respuesta en streaming; con el búfer lleno el scraper espera al cliente
+STREAM_BUFFER_SIZE = _env_int("STREAM_BUFFER_SIZE", 16)
+
+# ------------------- Límites por host -------------------
+
+# Token bucket y concurrencia adaptativa (AIMD) por sitio de destino, compartidos por
+# navegadores y clientes HTTP. Los hosts sin regla (y sus subdominios) no se limitan.
+RATE_LIMIT_ENABLED = _env_bool("RATE_LIMIT_ENABLED", True)
+RATE_LIMITS = _env_rate_limits(
+    "RATE_LIMITS",
+    "google.com=0.5:2,medellin.gov.co=10:20,registraduria.gov.co=5:10,"
+    "amazon.com=1:3,costco.com=1:3,target.com=1:3",
+)
+# Visitas simultáneas por host: valor inicial y cotas del límite adaptativo
+ADAPTIVE_CONCURRENCY_INITIAL = _env_int("ADAPTIVE_CONCURRENCY_INITIAL", 4)
+ADAPTIVE_CONCURRENCY_MIN = _env_int("ADAPTIVE_CONCURRENCY_MIN", 1)
+ADAPTIVE_CONCURRENCY_MAX = _env_int("ADAPTIVE_CONCURRENCY_MAX", 16)
+# Una visita más lenta que esto (segundos) cuenta como señal de saturación
+ADAPTIVE_SLOW_SECONDS = _env_float("ADAPTIVE_SLOW_SECONDS", 15.0)
+# Factor con que se reduce el límite ante bloqueo, timeout o lentitud
+ADAPTIVE_DECREASE = _env_float("ADAPTIVE_DECREASE", 0.5)
+# Pausa del host tras un CAPTCHA o 429/503; se duplica en cada bloqueo seguido (máx. 10 min)
+RATE_LIMIT_BLOCK_BACKOFF = _env_float("RATE_LIMIT_BLOCK_BACKOFF", 30.0)
+# Segundos máximos esperando turno antes de responder 503
+RATE_LIMIT_MAX_WAIT = _env_float("RATE_LIMIT_MAX_WAIT", 30.0)
+# Hosts propensos a CAPTCHA: ahí el texto típico ("unusual traffic", "not a robot"...) ya
+# cuenta como bloqueo. En los demás solo el formulario de CAPTCHA, /sorry/ o un 429/503
+RATE_LIMIT_CAPTCHA_HOSTS = tuple(_env_list("RATE_LIMIT_CAPTCHA_HOSTS", ["google.com"]))
+
+# ------------------- /scrape_direccion -------------------
+
+MAPGIS_URL = os.getenv("MAPGIS_URL", "https://www.medellin.gov.co/mapgis9/mapa.jsp?aplicacion=41")
+# Ruta rápida por HTTP. Plantillas de URL con {direccion}, {cbml}, {capa} (valor del radio) e {id};
+# se obtienen de la pestaña de red del navegador. Sin ellas se usa solo Selenium.
+MAPGIS_HTTP_ENABLED = _env_bool("MAPGIS_HTTP_ENABLED", True)
+MAPGIS_HTTP_UTILIDAD_URL = os.getenv("MAPGIS_HTTP_UTILIDAD_URL", "")
+MAPGIS_HTTP_SEARCH_URL = os.getenv("MAPGIS_HTTP_SEARCH_URL", "")
+MAPGIS_HTTP_LAYER_URL = os.getenv("MAPGIS_HTTP_LAYER_URL", "")
+MAPGIS_HTTP_TIMEOUT = _env_float("MAPGIS_HTTP_TIMEOUT", 15.0)
+# Pestañas que consultan a la vez las capas de MapGIS (1 = en secuencia)
+MAPGIS_LAYER_TABS = _env_int("MAPGIS_LAYER_TABS", 5)
+
+# ------------------- /scrape_resultados -------------------
+
+REGISTRADURIA_URL = os.getenv("REGISTRADURIA_URL", "https://resultadospreccongreso.registraduria.gov.co/senado/0")
+# Ruta rápida por HTTP: el índice de municipios y el JSON de resultados ({codigo}) que descarga
+# la SPA, tomados de la pestaña de red del navegador. Sin ellas se usa solo Selenium.
+REGISTRADURIA_HTTP_ENABLED = _env_bool("REGISTRADURIA_HTTP_ENABLED", True)
+REGISTRADURIA_HTTP_INDEX_URL = os.getenv("REGISTRADURIA_HTTP_INDEX_URL", "")
+REGISTRADURIA_HTTP_RESULTS_URL = os.getenv("REGISTRADURIA_HTTP_RESULTS_URL", "")
+REGISTRADURIA_HTTP_TIMEOUT = _env_float("REGISTRADURIA_HTTP_TIMEOUT", 10.0)
+# Segundos que se reutiliza el índice de municipios antes de volver a descargarlo
+REGISTRADURIA_INDEX_TTL = _env_int("REGISTRADURIA_INDEX_TTL", 24 * 3600)
+
+# ------------------- /verify_product y /product_images -------------------
+
+# Buscador usado para llegar a las fichas de producto (se cambia para pruebas locales)
+GOOGLE_URL = os.getenv("GOOGLE_URL", "https://www.google.com")
+GOOGLE_IMAGES_URL = os.getenv("GOOGLE_IMAGES_URL", "https://www.google.com/imghp")
+
+# ------------------- /verify_product -------------------
+
+# Resultados de Google que se revisan buscando la palabra de verificación
+VERIFY_PRODUCT_TOP_K = _env_int("VERIFY_PRODUCT_TOP_K", 2)
+# Buscar primero la palabra leyendo las páginas por HTTP; el navegador solo revisa las que no la tienen
+VERIFY_PRODUCT_HTTP_ENABLED = _env_bool("VERIFY_PRODUCT_HTTP_ENABLED", True)
+VERIFY_PRODUCT_HTTP_TIMEOUT = _env_float("VERIFY_PRODUCT_HTTP_TIMEOUT", 10.0)
+# Páginas que se revisan a la vez en el navegador (pestañas en cdp, navegadores libres en selenium)
+VERIFY_PRODUCT_PARALLELISM = _env_int("VERIFY_PRODUCT_PARALLELISM", 4)
+
+# ------------------- /product_images -------------------
+
+# Ir directo a la ficha de Amazon, Costco o Target (por TCIN, ASIN, número de artículo o la
+# búsqueda de la tienda) antes de pasar por Google
+PRODUCT_RESOLVER_ENABLED = _env_bool("PRODUCT_RESOLVER_ENABLED", True)
+# Índice SQLite identificador -> URL de la ficha; vacío = solo en memoria
+PRODUCT_URL_INDEX_PATH = os.getenv("PRODUCT_URL_INDEX_PATH", "product_urls.sqlite3")
+# Leer la ficha por HTTP (sin navegador) antes de abrirla con Selenium
+RETAILER_HTTP_ENABLED = _env_bool("RETAILER_HTTP_ENABLED", True)
+RETAILER_HTTP_TIMEOUT = _env_float("RETAILER_HTTP_TIMEOUT", 10.0)
+# Fichas que se descargan a la vez por solicitud
+PRODUCT_IMAGES_HTTP_PARALLELISM = _env_int("PRODUCT_IMAGES_HTTP_PARALLELISM", 8)
+# Índice de imágenes ya resueltas por UPC, TCIN, Item, Model o descripción + tienda
+IMAGE_INDEX_ENABLED = _env_bool("IMAGE_INDEX_ENABLED", True)
+# Base SQLite del índice; vacío = solo en memoria. Las imágenes duran CACHE_TTL_PRODUCT_IMAGE
+IMAGE_INDEX_PATH = os.getenv("IMAGE_INDEX_PATH", "product_images.sqlite3")
+# Segundos que se recuerda que un ítem no tiene imagen
+IMAGE_INDEX_NEGATIVE_TTL = _env_float("IMAGE_INDEX_NEGATIVE_TTL", 24 * 3600.0)
+# Plantillas de ficha ({id}) y de búsqueda ({query}) por tienda
+PRODUCT_URLS = {
+    "amazon": os.getenv("AMAZON_PRODUCT_URL", "https://www.amazon.com/dp/{id}"),
+    "costco": os.getenv("COSTCO_PRODUCT_URL", "https://www.costco.com/.product.{id}.html"),
+    "target": os.getenv("TARGET_PRODUCT_URL", "https://www.target.com/p/-/A-{id}"),
+}
+PRODUCT_SEARCH_URLS = {
+    "amazon": os.getenv("AMAZON_SEARCH_URL", "https://www.amazon.com/s?k={query}"),
+    "costco": os.getenv("COSTCO_SEARCH_URL", "https://www.costco.com/CatalogSearch?keyword={query}"),
+    "target": os.getenv("TARGET_SEARCH_URL", "https://www.target.com/s?searchTerm={query}"),
+}
+
+# Navegadores que procesan en paralelo los ítems de una misma solicitud
+PRODUCT_IMAGES_PARALLELISM = _env_int("PRODUCT_IMAGES_PARALLELISM", DRIVER_POOL_SIZE)
+
+# ------------------- Caché de resultados -------------------
+
+CACHE_ENABLED = _env_bool("CACHE_ENABLED", True)
+# Entradas máximas en memoria (LRU)
+CACHE_MAX_ENTRIES = _env_int("CACHE_MAX_ENTRIES", 1000)
+# Base SQLite para el nivel en disco; vacío = solo memoria
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH") or None
+CACHE_DISK_MAX_ENTRIES = _env_int("CACHE_DISK_MAX_ENTRIES", 100000)
+# TTL en segundos por endpoint, p. ej. CACHE_TTL_SCRAPE_RESULTADOS=600 (0 = no cachear)
+CACHE_TTLS = {
+    "scrape_direccion": _env_float("CACHE_TTL_SCRAPE_DIRECCION", 7 * 24 * 3600.0),
+    "scrape_resultados": _env_float("CACHE_TTL_SCRAPE_RESULTADOS", 3600.0),
+    "verify_product": _env_float("CACHE_TTL_VERIFY_PRODUCT", 24 * 3600.0),
+    "product_image": _env_float("CACHE_TTL_PRODUCT_IMAGE", 7 * 24 * 3600.0),
+}
+
+# ------------------- Trabajos asíncronos -------------------
+
+# Base de datos SQLite donde se guardan trabajos y resultados
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.sqlite3")
+# Hilos que atienden la cola de trabajos (cada uno usa un navegador del pool)
+JOB_WORKERS = _env_int("JOB_WORKERS", 1)
+# Segundos que se conservan los resultados de trabajos terminados
+JOB_RESULT_TTL = _env_float("JOB_RESULT_TTL", 3600.0)
+# Segundos de lease de un trabajo tomado; si el worker no lo renueva, vuelve a la cola
+JOB_LEASE_SECONDS = _env_float("JOB_LEASE_SECONDS", 60.0)
+# Cada cuántos segundos el worker renueva los leases de sus trabajos
+JOB_HEARTBEAT_INTERVAL = _env_float("JOB_HEARTBEAT_INTERVAL", 15.0)
+# Segundos entre consultas a la cola cuando está vacía
+JOB_POLL_INTERVAL = _env_float("JOB_POLL_INTERVAL", 1.0)
+# Intentos de un trabajo cuyo worker muere antes de darlo por fallido
+JOB_MAX_ATTEMPTS = _env_int("JOB_MAX_ATTEMPTS", 3)
+
+# ------------------- Estado compartido entre réplicas -------------------
+
+# Vacío = estado por proceso (JOBS_DB_PATH, CACHE_DB_PATH, límites en memoria).
+# sqlite:///ruta/estado.sqlite3 (réplicas del mismo host) o redis://host:6379/0 (varios nodos);
+# la cola de trabajos, el nivel en disco de la caché y los token buckets pasan a vivir ahí
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL") or None
+# Prefijo de las claves en Redis
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "scraper:")
+# Vida del candado de un scrape entre réplicas; quien lo tiene lo renueva cada TTL/3
+CACHE_SHARED_LOCK_TTL = _env_float("CACHE_SHARED_LOCK_TTL", 120.0)
+
+# ------------------- Métricas -------------------
+
+# Expone /metrics (Prometheus) y mide cada etapa del scraping
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+# Trazas por etapa con OpenTelemetry (requiere el paquete opentelemetry-api/sdk)
+TRACING_ENABLED = _env_bool("TRACING_ENABLED", False)
+
+# ------------------- Logging -------------------
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# json (una línea JSON por registro) o text (legible en consola)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# De los fallos esperados (capa sin datos, imagen no encontrada...) se emite uno de cada N
+LOG_SAMPLE_EVERY = _env_int("LOG_SAMPLE_EVERY", 100)
@@ -0,0 +1,281 @@
+import functools
+import logging
+import os
+import queue
+import random
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36"
+]
+
+_STORAGE_TYPES = "cookies,local_storage,session_storage,indexeddb,websql,service_workers,cache_storage"
+
+
+class PoolTimeout(Exception):
+    """No se liberó ningún navegador dentro del tiempo de espera."""
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_chromedriver_path(pinned_path: Optional[str] = None, offline: bool = False) -> str:
+    """Resuelve la ruta de chromedriver una sola vez por proceso.
+
+    Orden: ruta fijada (``CHROMEDRIVER_PATH``), ``chromedriver`` en el PATH si
+    estamos en modo offline y, por último, webdriver-manager (que puede
+    consultar la red).
+    """
+    if pinned_path:
+        if not (os.path.isfile(pinned_path) and os.access(pinned_path, os.X_OK)):
+            raise FileNotFoundError(f"chromedriver no encontrado o no ejecutable en {pinned_path}")
+        logger.info("Usando chromedriver fijado: %s", pinned_path)
+        return pinned_path
+
+    if offline:
+        local_path = shutil.which("chromedriver")
+        if not local_path:
+            raise FileNotFoundError(
+                "Modo offline: define CHROMEDRIVER_PATH o instala chromedriver en el PATH"
+            )
+        logger.info("Usando chromedriver local (offline): %s", local_path)
+        return local_path
+
+    path = ChromeDriverManager().install()
+    logger.info("chromedriver resuelto con webdriver-manager: %s", path)
+    return path
+
+
+def build_chrome_options(page_load_strategy: str = "normal"):
+    options = webdriver.ChromeOptions()
+    options.page_load_strategy = page_load_strategy
+    options.add_argument('--ignore-certificate-errors')
+    options.add_argument('--ignore-certificate-errors-spki-list')
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--window-size=1920,1080')
+    options.add_argument("--disable-notifications")
+    options.add_argument(f"user-agent={random.choice(USER_AGENTS)}")
+    return options
+
+
+def process_tree_rss_mb(root_pid: int) -> float:
+    # Suma el RSS de chromedriver y todos sus descendientes (Chrome, renderers, GPU...).
+    # Solo disponible en Linux; en otros sistemas devuelve 0 y no se recicla por memoria.
+    if not os.path.isdir("/proc"):
+        return 0.0
+
+    children: Dict[int, list] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+            # El nombre del proceso va entre paréntesis y puede contener espacios
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+            children.setdefault(ppid, []).append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+
+    total_kb = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        pending.extend(children.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+class DriverPool:
+    """Pool acotado de navegadores Chrome headless reutilizables.
+
+    Los navegadores se prestan con ``acquire``/``release`` (o ``lease``), se
+    limpian al devolverse y se reciclan tras ``max_uses`` usos o al superar
+    ``max_rss_mb`` de memoria. La estrategia de carga de página se fija al
+    lanzar Chrome, así que los navegadores libres se agrupan por estrategia.
+    """
+
+    def __init__(self, size: int, max_uses: int = 0, max_rss_mb: int = 0, lease_timeout: float = 30.0,
+                 chromedriver_path: Optional[str] = None, offline: bool = False,
+                 page_load_strategy: str = "normal", script_timeout: float = 30.0):
+        self.size = size
+        self.chromedriver_path = chromedriver_path
+        self.offline = offline
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.lease_timeout = lease_timeout
+        self.page_load_strategy = page_load_strategy
+        self.script_timeout = script_timeout
+        self._idle: Dict[str, queue.LifoQueue] = {}
+        self._slots = threading.BoundedSemaphore(size)
+        self._uses: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _idle_queue(self, page_load_strategy: str) -> queue.LifoQueue:
+        with self._lock:
+            return self._idle.setdefault(page_load_strategy, queue.LifoQueue())
+
+    def _take_idle(self, page_load_strategy: Optional[str] = None):
+        # Sin estrategia: cualquier navegador libre (se usa para desalojar)
+        strategies = [page_load_strategy] if page_load_strategy else list(self._idle)
+        for strategy in strategies:
+            try:
+                return self._idle_queue(strategy).get_nowait()
+            except queue.Empty:
+                continue
+        return None
+
+    def _launch(self, page_load_strategy: str):
+        driver_path = resolve_chromedriver_path(self.chromedriver_path, self.offline)
+        with metrics.stage("driver_launch"):
+            driver = webdriver.Chrome(service=Service(driver_path), options=build_chrome_options(page_load_strategy))
+        with self._lock:
+            self._uses[id(driver)] = 0
+        logger.info("ChromeDriver iniciado correctamente.")
+        return driver
+
+    def _quit(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+            logger.debug("Navegador cerrado.")
+        except Exception as e:
+            logger.warning("Error al cerrar el navegador: %s", e)
+
+    def warm(self, count: Optional[int] = None):
+        count = self.size if count is None else min(count, self.size)
+        launched = 0
+        for _ in range(count):
+            if not self._slots.acquire(blocking=False):
+                break
+            try:
+                self._idle_queue(self.page_load_strategy).put(self._launch(self.page_load_strategy))
+                launched += 1
+            except Exception as e:
+                logger.exception("Error al precalentar el pool de navegadores: %s", e)
+                break
+            finally:
+                self._slots.release()
+        logger.info("Pool de navegadores precalentado con %d instancias.", launched)
+
+    @metrics.timed("driver_acquire")
+    def acquire(self, timeout: Optional[float] = None, page_load_strategy: Optional[str] = None):
+        if self._closed:
+            raise RuntimeError("El pool de navegadores está cerrado")
+        timeout = self.lease_timeout if timeout is None else timeout
+        page_load_strategy = page_load_strategy or self.page_load_strategy
+        if not self._slots.acquire(timeout=timeout):
+            if timeout > 0:
+                # Con timeout 0 el llamador solo pregunta si hay uno libre
+                metrics.count_timeout("driver_acquire")
+            raise PoolTimeout(f"No hay navegadores disponibles tras {timeout} s")
+        try:
+            driver = self._take_idle(page_load_strategy)
+            if driver is None:
+                # Si el pool está lleno, se cierra un navegador libre con otra estrategia
+                if len(self._uses) >= self.size:
+                    other = self._take_idle()
+                    if other is not None:
+                        self._quit(other)
+                driver = self._launch(page_load_strategy)
+            with self._lock:
+                self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+            return driver
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, driver, discard: bool = False):
+        try:
+            if discard or self._closed or self._should_recycle(driver) or not self._reset(driver):
+                self._quit(driver)
+            else:
+                strategy = driver.capabilities.get("pageLoadStrategy", self.page_load_strategy)
+                self._idle_queue(strategy).put(driver)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None, page_load_strategy: Optional[str] = None):
+        driver = self.acquire(timeout, page_load_strategy)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        self._closed = True
+        while True:
+            driver = self._take_idle()
+            if driver is None:
+                break
+            self._quit(driver)
+
+    def _should_recycle(self, driver) -> bool:
+        uses = self._uses.get(id(driver), 0)
+        if self.max_uses and uses >= self.max_uses:
+            logger.info("Reciclando navegador tras %d usos.", uses)
+            return True
+        if self.max_rss_mb:
+            try:
+                rss = process_tree_rss_mb(driver.service.process.pid)
+            except Exception:
+                rss = 0.0
+            if rss > self.max_rss_mb:
+                logger.info("Reciclando navegador por memoria: %.0f MB.", rss)
+                return True
+        return False
+
+    def _reset(self, driver) -> bool:
+        # Deja el navegador como recién lanzado: una sola pestaña, sin iframes,
+        # sin esperas implícitas, con el timeout de scripts por defecto, sin cookies ni almacenamiento del sitio anterior.
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.switch_to.default_content()
+            driver.implicitly_wait(0)
+            driver.set_script_timeout(self.script_timeout)
+
+            parsed = urlparse(driver.current_url)
+            if parsed.scheme in ("http", "https"):
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+                    "origin": f"{parsed.scheme}://{parsed.netloc}",
+                    "storageTypes": _STORAGE_TYPES,
+                })
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+            driver.get("about:blank")
+
+            # Health check: el navegador responde a comandos
+            return driver.execute_script("return 1;") == 1
+        except Exception as e:
+            logger.warning("Navegador no saludable, se descarta: %s", e)
+            return False
@@ -0,0 +1,71 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+import metrics
+
+
+def _run_for(endpoint: str, fn: Callable, *args, **kwargs):
+    with metrics.endpoint(endpoint), metrics.stage("total"):
+        return fn(*args, **kwargs)
+
+
+class ExecutorBusy(Exception):
+    """La cola de un endpoint está llena; el cliente debe reintentar más tarde."""
+
+    def __init__(self, endpoint: str, retry_after: int):
+        super().__init__(f"Cola llena para {endpoint}")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class ScrapeExecutor:
+    """Ejecuta el scraping síncrono (Selenium) fuera del event loop.
+
+    Cada endpoint tiene un máximo de trabajos ejecutándose a la vez
+    (``limits``) y como mucho ``queue_size`` trabajos esperando turno; por
+    encima de eso ``run`` lanza ``ExecutorBusy`` sin encolar nada.
+    """
+
+    def __init__(self, max_workers: int, limits: Dict[str, int], queue_size: int, retry_after: int = 5):
+        self.max_workers = max_workers
+        self.limits = limits
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scraper")
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._pending: Dict[str, int] = {}
+
+    def _semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        if endpoint not in self._semaphores:
+            limit = self.limits.get(endpoint, self.max_workers)
+            self._semaphores[endpoint] = asyncio.Semaphore(limit)
+        return self._semaphores[endpoint]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            endpoint: {"limit": self.limits.get(endpoint, self.max_workers), "pending": pending}
+            for endpoint, pending in self._pending.items()
+        }
+
+    async def run(self, endpoint: str, fn: Callable, *args, **kwargs):
+        limit = self.limits.get(endpoint, self.max_workers)
+        pending = self._pending.get(endpoint, 0)
+        if pending >= limit + self.queue_size:
+            raise ExecutorBusy(endpoint, self.retry_after)
+
+        self._pending[endpoint] = pending + 1
+        try:
+            async with self._semaphore(endpoint):
+                loop = asyncio.get_running_loop()
+                # run_in_executor no propaga el contexto (ID de correlación) por sí solo
+                context = contextvars.copy_context()
+                call = functools.partial(_run_for, endpoint, fn, *args, **kwargs)
+                return await loop.run_in_executor(self._pool, context.run, call)
+        finally:
+            self._pending[endpoint] -= 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
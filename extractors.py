@@ -0,0 +1,145 @@
+"""Extracción de datos con una sola llamada ``execute_script`` por página.
+
+Cada ``find_element``/``.text`` es un viaje de ida y vuelta a chromedriver;
+estas funciones leen la tabla o los partidos completos dentro del navegador y
+devuelven JSON. Devuelven ``None`` cuando la página no tiene la forma
+esperada, para que el llamador use el camino elemento a elemento.
+"""
+import logging
+from typing import Optional
+
+import logs
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+_TABLE_ROWS = """
+var table = document.querySelector(arguments[0]);
+if (!table || !table.tBodies.length) { return null; }
+return Array.from(table.tBodies[0].rows).map(function (row) {
+    return Array.from(row.cells)
+        .filter(function (cell) { return cell.tagName === 'TD'; })
+        .map(function (cell) { return (cell.innerText || '').trim(); })
+        .join(' | ');
+});
+"""
+
+_PARTIDOS = """
+var limit = arguments[0];
+var done = arguments[arguments.length - 1];
+var LISTA = '.FilaTablaPartidos__ContainerLista-jcnt0x-3';
+
+function text(root, selector) {
+    var el = root.querySelector(selector);
+    return el ? (el.innerText || '').trim() : '';
+}
+function visible(el) {
+    return el && el.isConnected && el.offsetParent !== null;
+}
+function waitFor(check, timeout) {
+    return new Promise(function (resolve, reject) {
+        var start = Date.now();
+        (function poll() {
+            var value = check();
+            if (value) { return resolve(value); }
+            if (Date.now() - start > timeout) { return reject(new Error('timeout')); }
+            setTimeout(poll, 25);
+        })();
+    });
+}
+
+async function run() {
+    var nombres = document.querySelectorAll('.FilaTablaPartidos__NombrePartido-jcnt0x-7');
+    var porcentajes = document.querySelectorAll('.porcAgr');
+    var votos = document.querySelectorAll('.numAgr');
+    var botones = document.querySelectorAll('div.containerMasMenos button');
+    var total = Math.min(nombres.length, porcentajes.length, votos.length);
+    var partidos = [];
+    for (var i = 0; i < total; i++) {
+        var partido = {
+            nombre: (nombres[i].innerText || '').trim(),
+            porcentaje: (porcentajes[i].innerText || '').trim(),
+            votos: (votos[i].innerText || '').trim(),
+            candidatos: []
+        };
+        partidos.push(partido);
+        var boton = botones[i];
+        if (!boton) { continue; }
+        boton.scrollIntoView(true);
+        boton.click();
+        var lista = await waitFor(function () {
+            var el = document.querySelector(LISTA);
+            return visible(el) ? el : null;
+        }, 10000);
+        var filas = lista.querySelectorAll('.FilaTablaPartidos__ElementoCandidatos-jcnt0x-5');
+        for (var j = 0; j < filas.length && partido.candidatos.length < limit; j++) {
+            var parrafos = filas[j].querySelectorAll('p');
+            if (parrafos.length < 3) { continue; }
+            partido.candidatos.push({
+                nombre: text(filas[j], '.FilaTablaPartidos__NombreCandidato-jcnt0x-4'),
+                porcentaje: text(filas[j], '.percent'),
+                votos: (parrafos[2].innerText || '').trim()
+            });
+        }
+        boton.click();
+        await waitFor(function () { return !visible(lista); }, 5000);
+    }
+    return partidos;
+}
+
+run().then(done, function (e) { done({error: String(e)}); });
+"""
+
+
+@metrics.timed()
+def extract_table_rows(driver, selector: str = "table#res0"):
+    """Filas de la tabla como ``'celda | celda'``, igual que el recorrido por elementos."""
+    try:
+        rows = driver.execute_script(_TABLE_ROWS, selector)
+    except Exception as e:
+        logger.info("Extracción JS de la tabla falló: %s", e, extra=logs.SAMPLED)
+        return None
+    return rows if isinstance(rows, list) else None
+
+
+def _script_timeout(driver) -> Optional[float]:
+    # Selenium lo expone en driver.timeouts; CdpDriver, como atributo.
+    # None si no se puede leer: el pool lo repone al devolver el navegador
+    try:
+        timeouts = getattr(driver, "timeouts", None)
+        return timeouts.script if timeouts is not None else driver.script_timeout
+    except Exception:
+        return None
+
+
+@metrics.timed()
+def extract_partidos(driver, candidatos_por_partido: int = 5, timeout: float = 120):
+    """Partidos con sus primeros candidatos, expandiendo cada partido dentro de la página."""
+    previous = _script_timeout(driver)
+    try:
+        driver.set_script_timeout(timeout)
+        partidos = driver.execute_async_script(_PARTIDOS, candidatos_por_partido)
+    except Exception as e:
+        logger.warning("Extracción JS de partidos falló: %s", e)
+        return None
+    finally:
+        # El navegador vuelve al pool: no debe heredar el timeout largo
+        if previous is not None:
+            try:
+                driver.set_script_timeout(previous)
+            except Exception:
+                pass
+    if not isinstance(partidos, list) or not partidos:
+        if isinstance(partidos, dict):
+            logger.warning("Extracción JS de partidos falló: %s", partidos.get("error"))
+        return None
+
+    partidos_info = {}
+    for partido in partidos:
+        partidos_info[partido["nombre"]] = {
+            "porcentaje": partido["porcentaje"],
+            "votos": partido["votos"],
+            "candidatos": partido["candidatos"],
+        }
+    return partidos_info
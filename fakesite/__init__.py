@@ -0,0 +1,24 @@
+from fakesite import google, mapgis, registraduria
+from fakesite.server import FakeSite
+
+
+SITES = {
+    "mapgis": mapgis,
+    "registraduria": registraduria,
+    "google": google,
+}
+
+
+def build_site(latency_ms: int = 0, jitter_ms: int = 0, port: int = 0) -> FakeSite:
+    routes = {}
+    for site in SITES.values():
+        routes.update(site.ROUTES)
+    return FakeSite(routes, latency_ms=latency_ms, jitter_ms=jitter_ms, port=port)
+
+
+def site_env(base_url: str):
+    """Variables de entorno que apuntan la aplicación al sitio local."""
+    env = {}
+    for site in SITES.values():
+        env.update(site.env(base_url))
+    return env
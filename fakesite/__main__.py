@@ -0,0 +1,27 @@
+import argparse
+import time
+
+from fakesite import build_site, site_env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sitio local que imita las páginas scrapeadas")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--jitter-ms", type=int, default=0)
+    args = parser.parse_args()
+
+    site = build_site(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, port=args.port)
+    base_url = site.start()
+    print(f"Sitio local en {base_url}. Variables para la aplicación:")
+    for name, value in site_env(base_url).items():
+        print(f"export {name}='{value}'")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Imitación de Google (búsqueda web e imágenes) y de las fichas de Costco, Amazon y Target.
+
+Los resultados de búsqueda enlazan a fichas locales de la tienda mencionada en
+la consulta, con el marcado que leen los scrapers: ``Product Preview 1`` con
+``canvas=`` en Costco, ``data-a-dynamic-image`` en Amazon y ``srcset`` en Target.
+Cada tienda tiene además su propia búsqueda, con el primer resultado marcado
+como en el sitio real; buscar un número de artículo redirige directo a la ficha.
+"""
+import hashlib
+import html
+import json
+from urllib.parse import quote
+
+STORES = ("costco", "amazon", "target")
+SIZES = ((300, 300), (600, 600), (1200, 1200))
+
+
+def _product_id(query: str) -> str:
+    words = [word for word in query.lower().split() if word not in STORES]
+    return hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()[:10]
+
+
+def _image(store: str, product_id: str, width: int, height: int) -> str:
+    return f"/img?store={store}&id={product_id}&w={width}&h={height}"
+
+
+def _product_url(store: str, query: str) -> str:
+    paths = {"costco": "/costco/product", "amazon": "/amazon/dp", "target": "/target/p"}
+    return f"{paths[store]}?id={_product_id(query)}&q={quote(query)}"
+
+
+def home(query):
+    body = """<!doctype html>
+<html><body>
+<form action="/google/search" method="get">
+  <input type="text" name="q" autocomplete="off">
+</form>
+</body></html>"""
+    return 200, "text/html", body
+
+
+def imghp(query):
+    body = """<!doctype html>
+<html><body>
+<form action="/google/search" method="get">
+  <input type="hidden" name="tbm" value="isch">
+  <input type="text" name="q" autocomplete="off">
+</form>
+</body></html>"""
+    return 200, "text/html", body
+
+
+def search(query):
+    q = query.get("q", "")
+    product_id = _product_id(q)
+    if query.get("tbm") == "isch":
+        thumbs = "".join(
+            f'<div><img src="{html.escape(_image("google", product_id, 150, 150))}" '
+            f'data-full="{html.escape(_image("google", product_id, 1024, 1024))}"></div>'
+            for _ in range(3)
+        )
+        body = f"""<!doctype html>
+<html><body>
+<div id="rso">{thumbs}</div>
+<div id="visor"></div>
+<script>
+document.querySelectorAll('#rso img').forEach(function (img) {{
+    img.onclick = function () {{
+        setTimeout(function () {{
+            document.getElementById('visor').innerHTML =
+                '<div jsname="figiqf"><img src="' + img.dataset.full + '"></div>';
+        }}, 50);
+    }};
+}});
+</script>
+</body></html>"""
+        return 200, "text/html", body
+
+    # La tienda mencionada va primero, como haría Google
+    named = [store for store in STORES if store in q.lower()]
+    order = named + [store for store in STORES if store not in named]
+    results = "".join(
+        f'<div class="g"><a href="{html.escape(_product_url(store, q))}">'
+        f'<h3>{html.escape(q)} | {store.capitalize()}</h3></a></div>'
+        for store in order
+    )
+    body = f"""<!doctype html>
+<html><body>
+<div id="search">{results}</div>
+</body></html>"""
+    return 200, "text/html", body
+
+
+def _ficha(title: str, gallery: str) -> str:
+    return f"""<!doctype html>
+<html><body>
+<h1>{html.escape(title)}</h1>
+{gallery}
+<p>{html.escape(title)}. Descripción del producto de prueba.</p>
+</body></html>"""
+
+
+def costco(query):
+    product_id = query.get("id", "")
+    previews = "".join(
+        f'<img alt="Product Preview 1" src="{html.escape(_image("costco", product_id, 100, 100))}&amp;canvas={w},{h}">'
+        for w, h in SIZES
+    )
+    return 200, "text/html", _ficha(query.get("q", ""), previews)
+
+
+def amazon(query):
+    product_id = query.get("id", "")
+    dynamic = json.dumps({_image("amazon", product_id, w, h): [w, h] for w, h in SIZES})
+    gallery = (
+        f'<img data-a-image-name="landingImage" src="{html.escape(_image("amazon", product_id, 300, 300))}" '
+        f"data-a-dynamic-image='{html.escape(dynamic, quote=False)}'>"
+    )
+    return 200, "text/html", _ficha(query.get("q", ""), gallery)
+
+
+def target(query):
+    product_id = query.get("id", "")
+    srcset = ", ".join(f"{_image('target', product_id, w, h)} {w}w" for w, h in SIZES)
+    gallery = (
+        f'<div tabindex="-1"><img src="{html.escape(_image("target", product_id, 300, 300))}" '
+        f'srcset="{html.escape(srcset)}"></div>'
+    )
+    return 200, "text/html", _ficha(query.get("q", ""), gallery)
+
+
+# Enlace del primer resultado en la búsqueda de cada tienda, como en el sitio real
+SEARCH_RESULT_MARKUP = {
+    "amazon": '<div data-component-type="s-search-result"><h2><a href="{href}">{title}</a></h2></div>',
+    "costco": '<div class="product-tile-set"><a href="{href}">{title}</a></div>',
+    "target": '<a data-test="product-title" href="{href}">{title}</a>',
+}
+
+
+def _store_search(store: str, param: str):
+    def handler(query):
+        q = query.get(param, "")
+        if q.isdigit():
+            return 302, "text/html", _product_url(store, q)
+        result = SEARCH_RESULT_MARKUP[store].format(
+            href=html.escape(_product_url(store, q)), title=html.escape(q),
+        )
+        return 200, "text/html", f"<!doctype html>\n<html><body>\n{result}\n</body></html>"
+    return handler
+
+
+def image(query):
+    body = '<svg xmlns="http://www.w3.org/2000/svg" width="1" height="1"></svg>'
+    return 200, "image/svg+xml", body
+
+
+ROUTES = {
+    "/google/": home,
+    "/google/imghp": imghp,
+    "/google/search": search,
+    "/costco/product": costco,
+    "/amazon/dp": amazon,
+    "/target/p": target,
+    "/amazon/s": _store_search("amazon", "k"),
+    "/costco/search": _store_search("costco", "keyword"),
+    "/target/s": _store_search("target", "searchTerm"),
+    "/img": image,
+}
+
+
+# Variables de entorno para apuntar la aplicación a este sitio
+def env(base_url: str):
+    return {
+        "GOOGLE_URL": f"{base_url}/google/",
+        "GOOGLE_IMAGES_URL": f"{base_url}/google/imghp",
+        "AMAZON_PRODUCT_URL": f"{base_url}/amazon/dp?id={{id}}",
+        "COSTCO_PRODUCT_URL": f"{base_url}/costco/product?id={{id}}",
+        "TARGET_PRODUCT_URL": f"{base_url}/target/p?id={{id}}",
+        "AMAZON_SEARCH_URL": f"{base_url}/amazon/s?k={{query}}",
+        "COSTCO_SEARCH_URL": f"{base_url}/costco/search?keyword={{query}}",
+        "TARGET_SEARCH_URL": f"{base_url}/target/s?searchTerm={{query}}",
+    }
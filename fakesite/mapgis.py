@@ -0,0 +1,101 @@
+"""Imitación de MapGIS (mapa.jsp + utilidad 53) con los mismos IDs que usa el scraper."""
+import hashlib
+import html
+import json
+import os
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "mapgis.json")
+
+with open(FIXTURES, encoding="utf-8") as f:
+    DATA = json.load(f)
+
+
+def _cbml(direccion: str) -> str:
+    key = " ".join(direccion.lower().split())
+    if key in DATA["direcciones"]:
+        return DATA["direcciones"][key]
+    # Cualquier dirección tiene un CBML estable para poder generar carga
+    return str(int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16))[:10]
+
+
+def mapa(query):
+    body = """<!doctype html>
+<html><body>
+<div class="ajs-modal"><button class="btn btn-siguiente ajs-ok"
+    onclick="this.parentNode.style.display='none';
+             document.getElementById('contenedor').innerHTML =
+             '<iframe id=&quot;frmUtilidad53&quot; src=&quot;/mapgis9/utilidad53.html&quot; width=&quot;800&quot; height=&quot;600&quot;></iframe>';">
+    Aceptar</button></div>
+<div id="contenedor"></div>
+</body></html>"""
+    return 200, "text/html", body
+
+
+def utilidad(query):
+    radios = "\n".join(
+        f'<label><input type="radio" name="capa" id="{capa["id"]}" value="{html.escape(capa["valor"])}">'
+        f'{html.escape(capa["valor"])}</label>'
+        for capa in DATA["capas"]
+    )
+    body = f"""<!doctype html>
+<html><body>
+<input type="text" id="strBusqueda">
+<button id="buscar" type="button">Buscar</button>
+<input type="hidden" id="strCbml" value="">
+{radios}
+<div id="noDatos" style="display:none">No hay datos</div>
+<div id="resultado"></div>
+<script>
+document.getElementById('buscar').onclick = function () {{
+    var direccion = document.getElementById('strBusqueda').value;
+    fetch('/mapgis9/buscar?direccion=' + encodeURIComponent(direccion))
+        .then(function (r) {{ return r.json(); }})
+        .then(function (data) {{ document.getElementById('strCbml').value = data.cbml || ''; }});
+}};
+document.querySelectorAll('input[type=radio]').forEach(function (radio) {{
+    radio.onclick = function () {{
+        var cbml = document.getElementById('strCbml').value;
+        fetch('/mapgis9/capa?cbml=' + encodeURIComponent(cbml) + '&capa=' + encodeURIComponent(radio.value))
+            .then(function (r) {{ return r.text(); }})
+            .then(function (fragment) {{
+                var vacio = fragment.indexOf('noDatos') >= 0;
+                document.getElementById('noDatos').style.display = vacio ? 'block' : 'none';
+                document.getElementById('resultado').innerHTML = vacio ? '' : fragment;
+            }});
+    }};
+}});
+</script>
+</body></html>"""
+    return 200, "text/html", body
+
+
+def buscar(query):
+    direccion = query.get("direccion", "")
+    return 200, "application/json", json.dumps({"cbml": _cbml(direccion) if direccion.strip() else ""})
+
+
+def capa(query):
+    filas = DATA["tablas"].get(query.get("capa", ""))
+    if not query.get("cbml") or not filas:
+        return 200, "text/html", '<div id="noDatos" style="display:block">No hay datos</div>'
+    rows = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(cell)}</td>" for cell in fila) + "</tr>" for fila in filas
+    )
+    return 200, "text/html", f'<table id="res0"><tbody>{rows}</tbody></table>'
+
+
+ROUTES = {
+    "/mapgis9/mapa.jsp": mapa,
+    "/mapgis9/utilidad53.html": utilidad,
+    "/mapgis9/buscar": buscar,
+    "/mapgis9/capa": capa,
+}
+
+# Variables de entorno para apuntar la aplicación a este sitio
+def env(base_url: str):
+    return {
+        "MAPGIS_URL": f"{base_url}/mapgis9/mapa.jsp?aplicacion=41",
+        "MAPGIS_HTTP_UTILIDAD_URL": f"{base_url}/mapgis9/utilidad53.html",
+        "MAPGIS_HTTP_SEARCH_URL": f"{base_url}/mapgis9/buscar?direccion={{direccion}}",
+        "MAPGIS_HTTP_LAYER_URL": f"{base_url}/mapgis9/capa?cbml={{cbml}}&capa={{capa}}",
+    }
@@ -0,0 +1,128 @@
+"""Imitación de la SPA de preconteo de la Registraduría y del JSON que consume."""
+import hashlib
+import json
+import os
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "registraduria.json")
+
+with open(FIXTURES, encoding="utf-8") as f:
+    DATA = json.load(f)
+
+
+def _resultados(codigo: str):
+    # Votos sintéticos pero estables por municipio
+    seed = int(hashlib.sha1(codigo.encode("utf-8")).hexdigest(), 16)
+    partidos = []
+    for i, partido in enumerate(DATA["partidos"]):
+        candidatos = [
+            {"nombre": nombre, "votos": (seed >> (i + j)) % 5000 + 10}
+            for j, nombre in enumerate(partido["candidatos"])
+        ]
+        candidatos.sort(key=lambda candidato: candidato["votos"], reverse=True)
+        partidos.append({"nombre": partido["nombre"], "votos": sum(c["votos"] for c in candidatos), "candidatos": candidatos})
+    total = sum(partido["votos"] for partido in partidos) or 1
+    for partido in partidos:
+        partido["porcentaje"] = f"{partido['votos'] * 100 / total:.2f}%"
+        for candidato in partido["candidatos"]:
+            candidato["porcentaje"] = f"{candidato['votos'] * 100 / total:.2f}%"
+    partidos.sort(key=lambda partido: partido["votos"], reverse=True)
+    return {"partidos": partidos}
+
+
+def spa(query):
+    body = """<!doctype html>
+<html><body>
+<div id="root">
+  <input id="downshift-0-input" autocomplete="off">
+  <ul id="downshift-0-menu"></ul>
+  <div id="tabla"></div>
+</div>
+<script>
+var municipios = [];
+var sugerencias = [];
+var resaltado = -1;
+var input = document.getElementById('downshift-0-input');
+var menu = document.getElementById('downshift-0-menu');
+// La SPA tarda un poco en hidratar: el índice llega por XHR
+fetch('/json/municipios.json').then(function (r) { return r.json(); }).then(function (d) { municipios = d.municipios; });
+
+function normalizar(s) { return s.normalize('NFD').replace(/[\\u0300-\\u036f]/g, '').toLowerCase(); }
+
+input.addEventListener('input', function () {
+    var texto = normalizar(input.value);
+    sugerencias = municipios.filter(function (m) { return normalizar(m.nombre).indexOf(texto) >= 0; });
+    resaltado = -1;
+    menu.innerHTML = sugerencias.map(function (m, i) {
+        return '<li id="downshift-0-item-' + i + '">' + m.nombre + '</li>';
+    }).join('');
+});
+input.addEventListener('keydown', function (e) {
+    if (e.key === 'ArrowDown') { resaltado = Math.min(resaltado + 1, sugerencias.length - 1); }
+    if (e.key === 'Enter' && resaltado >= 0) {
+        var elegido = sugerencias[resaltado];
+        menu.innerHTML = '';
+        input.value = elegido.nombre;
+        cargar(elegido.codigo);
+    }
+});
+
+function cargar(codigo) {
+    fetch('/json/resultados?codigo=' + encodeURIComponent(codigo))
+        .then(function (r) { return r.json(); })
+        .then(function (d) { pintar(d.partidos); });
+}
+
+function pintar(partidos) {
+    var tabla = document.getElementById('tabla');
+    tabla.innerHTML = partidos.map(function (p, i) {
+        return '<div class="FilaTablaPartidos__Fila-jcnt0x-1" data-i="' + i + '">' +
+            '<p class="FilaTablaPartidos__NombrePartido-jcnt0x-7">' + p.nombre + '</p>' +
+            '<span class="porcAgr">' + p.porcentaje + '</span>' +
+            '<span class="numAgr">' + p.votos + '</span>' +
+            '<div class="containerMasMenos"><button type="button">+</button></div>' +
+            '<div class="slot"></div></div>';
+    }).join('');
+    tabla.querySelectorAll('div.containerMasMenos button').forEach(function (boton, i) {
+        boton.addEventListener('click', function () {
+            var slot = boton.parentNode.nextSibling;
+            if (slot.firstChild) { slot.innerHTML = ''; return; }
+            setTimeout(function () {
+                slot.innerHTML = '<div class="FilaTablaPartidos__ContainerLista-jcnt0x-3">' +
+                    partidos[i].candidatos.map(function (c) {
+                        return '<div class="FilaTablaPartidos__ElementoCandidatos-jcnt0x-5">' +
+                            '<p class="FilaTablaPartidos__NombreCandidato-jcnt0x-4">' + c.nombre + '</p>' +
+                            '<p class="percent">' + c.porcentaje + '</p><p>' + c.votos + '</p></div>';
+                    }).join('') + '</div>';
+            }, 50);
+        });
+    });
+}
+</script>
+</body></html>"""
+    return 200, "text/html", body
+
+
+def municipios(query):
+    return 200, "application/json", json.dumps({"municipios": DATA["municipios"]}, ensure_ascii=False)
+
+
+def resultados(query):
+    codigo = query.get("codigo", "")
+    if codigo not in {municipio["codigo"] for municipio in DATA["municipios"]}:
+        return 404, "application/json", "{}"
+    return 200, "application/json", json.dumps(_resultados(codigo), ensure_ascii=False)
+
+
+ROUTES = {
+    "/senado/0": spa,
+    "/json/municipios.json": municipios,
+    "/json/resultados": resultados,
+}
+
+# Variables de entorno para apuntar la aplicación a este sitio
+def env(base_url: str):
+    return {
+        "REGISTRADURIA_URL": f"{base_url}/senado/0",
+        "REGISTRADURIA_HTTP_INDEX_URL": f"{base_url}/json/municipios.json",
+        "REGISTRADURIA_HTTP_RESULTS_URL": f"{base_url}/json/resultados?codigo={{codigo}}",
+    }
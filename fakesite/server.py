@@ -0,0 +1,76 @@
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Un handler recibe los parámetros de la query y devuelve (status, content-type, cuerpo);
+# en una redirección 3xx el cuerpo es el destino
+Route = Callable[[Dict[str, str]], Tuple[int, str, str]]
+
+
+class FakeSite:
+    """Servidor local que imita los sitios que scrapeamos, con latencia configurable."""
+
+    def __init__(self, routes: Dict[str, Route], latency_ms: int = 0, jitter_ms: int = 0,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.routes = routes
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _serve(self):
+                parsed = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                if self.command == "POST":
+                    length = int(self.headers.get("Content-Length") or 0)
+                    body = self.rfile.read(length).decode("utf-8")
+                    query.update({key: values[0] for key, values in parse_qs(body).items()})
+                route = site.routes.get(parsed.path)
+                if route is None:
+                    status, content_type, body = 404, "text/plain", "not found"
+                else:
+                    site.delay()
+                    status, content_type, body = route(query)
+                data = body.encode("utf-8")
+                self.send_response(status)
+                if 300 <= status < 400:
+                    self.send_header("Location", body)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _serve
+            do_POST = _serve
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def delay(self):
+        latency = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if latency:
+            time.sleep(latency / 1000)
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fakesite", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
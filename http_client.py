@@ -0,0 +1,40 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import throttle
+
+# Respuestas con las que el sitio pide bajar el ritmo
+THROTTLE_STATUS = (429, 503)
+
+
+class ThrottledSession(requests.Session):
+    """Sesión cuyas solicitudes respetan el límite por host de ``throttle``."""
+
+    def request(self, method, url, *args, **kwargs):
+        with throttle.slot(url) as outcome:
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except requests.exceptions.RetryError:
+                # Los 503 se reintentan en el adaptador; si se agotan llega este error
+                outcome.blocked("HTTP 503")
+                raise
+            if response.status_code in THROTTLE_STATUS:
+                outcome.blocked(f"HTTP {response.status_code}")
+            return response
+
+
+def build_http_session(pool_size: int = 10, retries: int = 2) -> requests.Session:
+    session = ThrottledSession()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=retries, backoff_factor=0.3, status_forcelist=(502, 503, 504)),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    )
+    return session
@@ -0,0 +1,188 @@
+"""Índice persistente de imágenes de producto ya resueltas.
+
+Cada ítem se identifica por sus campos más fuertes: ``UPC`` y ``TCIN`` valen
+para cualquier tienda; ``Item``, ``Model`` y la descripción normalizada, solo
+dentro de la tienda. La clave es el SHA-256 de ese identificador, así que el
+mismo producto en otro pallet u otro manifiesto se resuelve sin buscarlo.
+Cada entrada guarda de dónde salió la imagen (``source``) y también se guardan
+los fallos (``found = 0``) con un TTL más corto, para no repetir búsquedas que
+no dieron nada. Un fallo es de una tienda: se guarda siempre bajo una clave con
+la tienda, aunque el ítem tenga UPC o TCIN.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from product_resolver import item_keys
+
+# Identificadores que no dependen de la tienda
+GLOBAL_PREFIXES = ("upc", "tcin")
+
+# Orígenes de una imagen
+SOURCE_RETAILER_HTTP = "retailer_http"
+SOURCE_RETAILER = "retailer"
+SOURCE_GOOGLE_SEARCH = "google_search"
+SOURCE_GOOGLE_IMAGES = "google_images"
+SOURCE_IMPORT = "import"
+
+
+def image_idents(store: str, item) -> List[str]:
+    """Identificadores del ítem, del más fuerte al más débil."""
+    store = store.strip().lower()
+    return [
+        key if key.split(":", 1)[0] in GLOBAL_PREFIXES else f"{store}/{key}"
+        for key in item_keys(item)
+    ]
+
+
+def miss_ident(store: str, item) -> Optional[str]:
+    """Identificador de un fallo: el más fuerte del ítem, siempre dentro de la tienda."""
+    keys = item_keys(item)
+    return f"{store.strip().lower()}/{keys[0]}" if keys else None
+
+
+def content_key(ident: str) -> str:
+    return hashlib.sha256(ident.encode("utf-8")).hexdigest()
+
+
+class ProductImageIndex:
+    def __init__(self, db_path: Optional[str] = None, ttl: float = 30 * 24 * 3600.0,
+                 negative_ttl: float = 24 * 3600.0):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path or ":memory:", check_same_thread=False)
+        with self._conn:
+            if db_path:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS product_images (
+                    key TEXT PRIMARY KEY,
+                    ident TEXT NOT NULL,
+                    image_link TEXT,
+                    found INTEGER NOT NULL,
+                    source TEXT,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+
+    def lookup(self, store: str, item, max_age: Optional[float] = None) -> Tuple[bool, Optional[str], Optional[str]]:
+        """``(encontrado, imagen, origen)``. Un fallo vigente cuenta como encontrado sin imagen.
+
+        Con ``max_age`` solo cuentan las entradas guardadas hace a lo sumo esos segundos.
+        """
+        idents = image_idents(store, item)
+        if not idents:
+            return False, None, None
+        keys = [content_key(ident) for ident in idents]
+        miss = miss_ident(store, item)
+        # Los fallos solo cuentan bajo claves de esta tienda (p. ej. no un upc: de otra)
+        miss_keys = [content_key(ident) for ident in idents + [miss] if "/" in ident]
+        wanted = list(dict.fromkeys(keys + miss_keys))
+        now = time.time()
+        oldest = now - max_age if max_age is not None else 0.0
+        with self._lock:
+            rows = {
+                row[0]: row[1:]
+                for row in self._conn.execute(
+                    f"SELECT key, image_link, found, source FROM product_images "
+                    f"WHERE key IN ({','.join('?' * len(wanted))}) AND expires_at > ? AND updated_at >= ?",
+                    (*wanted, now, oldest),
+                ).fetchall()
+            }
+        # Una imagen bajo cualquier identificador gana a un fallo bajo otro más fuerte
+        for key in keys:
+            if key in rows and rows[key][1]:
+                return True, rows[key][0], rows[key][2]
+        for key in miss_keys:
+            if key in rows:
+                return True, None, rows[key][2]
+        return False, None, None
+
+    def save(self, store: str, item, image_link: Optional[str], source: Optional[str]):
+        """Guarda la imagen bajo todos los identificadores del ítem; un fallo, solo bajo el más fuerte de la tienda."""
+        if image_link:
+            idents = image_idents(store, item)
+        else:
+            idents = [miss_ident(store, item)] if item_keys(item) else []
+        self._put([(ident, image_link, source) for ident in idents])
+
+    def _put(self, entries: Iterable[Tuple[str, Optional[str], Optional[str]]], now: Optional[float] = None):
+        now = now or time.time()
+        rows = [
+            (content_key(ident), ident, link, 1 if link else 0, source, now,
+             now + (self.ttl if link else self.negative_ttl))
+            for ident, link, source in entries
+        ]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO product_images "
+                "(key, ident, image_link, found, source, updated_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def export(self, include_misses: bool = False) -> Iterator[Dict[str, Any]]:
+        """Entradas vigentes, para volcarlas en NDJSON."""
+        query = "SELECT ident, image_link, source, updated_at FROM product_images WHERE expires_at > ?"
+        if not include_misses:
+            query += " AND found = 1"
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY ident", (time.time(),)).fetchall()
+        for ident, link, source, updated_at in rows:
+            yield {"ident": ident, "image_link": link, "source": source, "updated_at": updated_at}
+
+    def import_entries(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Carga entradas exportadas (``ident``) o filas de manifiesto (``store`` + campos del ítem).
+
+        Devuelve cuántos identificadores se escribieron.
+        """
+        rows = []
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            link = entry.get("image_link") or None
+            source = entry.get("source") or SOURCE_IMPORT
+            if entry.get("ident"):
+                rows.append((entry["ident"], link, source))
+            elif entry.get("store"):
+                fields = _Fields(entry)
+                if link:
+                    rows.extend((ident, link, source) for ident in image_idents(entry["store"], fields))
+                elif item_keys(fields):
+                    rows.append((miss_ident(entry["store"], fields), None, source))
+        self._put(rows)
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            found, misses = self._conn.execute(
+                "SELECT COALESCE(SUM(found), 0), COALESCE(SUM(1 - found), 0) FROM product_images WHERE expires_at > ?",
+                (time.time(),),
+            ).fetchone()
+            sources = dict(self._conn.execute(
+                "SELECT COALESCE(source, ''), COUNT(*) FROM product_images WHERE found = 1 GROUP BY source"
+            ).fetchall())
+        return {"images": found, "misses": misses, "sources": sources}
+
+
+class _Fields:
+    """Acceso por atributo a una fila importada, como un StoreDataItem."""
+
+    def __init__(self, entry: Dict[str, Any]):
+        self._entry = entry
+
+    def __getattr__(self, name):
+        return self._entry.get(name)
+
@@ -0,0 +1,333 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+import logs
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Un handler recibe el payload del trabajo y una función progress(hechos, total)
+JobHandler = Callable[[Dict[str, Any], Callable[[int, int], None]], Any]
+
+
+# Columnas agregadas después de la primera versión de la tabla
+_LEASE_COLUMNS = {
+    "lease_owner": "TEXT",
+    "lease_expires": "REAL",
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+class JobStore:
+    """Persistencia de trabajos en SQLite; sobrevive a reinicios del proceso.
+
+    Varios procesos pueden compartir el archivo: cada trabajo se toma con
+    ``claim`` bajo un lease que el dueño renueva con ``heartbeat``. Si el
+    proceso muere, el lease vence y ``requeue_expired`` lo devuelve a la cola.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Otros procesos pueden tener la base tomada un momento
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress_done INTEGER NOT NULL DEFAULT 0,
+                    progress_total INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL
+                )
+                """
+            )
+            existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in _LEASE_COLUMNS.items():
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def create(self, kind: str, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), QUEUED, now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def update(self, job_id: str, owner: Optional[str] = None, **fields) -> bool:
+        """Con ``owner`` solo se escribe si ese worker aún tiene el lease del trabajo."""
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        query = f"UPDATE jobs SET {columns} WHERE id = ?"
+        params = (*fields.values(), job_id)
+        if owner is not None:
+            query += " AND status = ? AND lease_owner = ?"
+            params += (RUNNING, owner)
+        with self._lock, self._conn:
+            return self._conn.execute(query, params).rowcount > 0
+
+    def claim(self, owner: str, lease: float) -> Optional[sqlite3.Row]:
+        """Toma el trabajo en cola más antiguo y lo marca como corriendo a nombre de ``owner``."""
+        now = time.time()
+        with self._lock, self._conn:
+            # BEGIN IMMEDIATE: dos procesos no pueden elegir el mismo trabajo
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                (RUNNING, owner, now + lease, now, row["id"]),
+            )
+            return self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+
+    def heartbeat(self, job_id: str, owner: str, lease: float) -> bool:
+        """Renueva el lease; ``False`` si el trabajo ya no es de ``owner``."""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+                (time.time() + lease, job_id, RUNNING, owner),
+            ).rowcount > 0
+
+    def requeue_expired(self, max_attempts: int) -> Dict[str, int]:
+        """Devuelve a la cola los trabajos cuyo lease venció (su worker murió).
+
+        Los que ya se intentaron ``max_attempts`` veces quedan fallidos.
+        """
+        now = time.time()
+        # Sin lease: trabajos que corrían antes de que existieran los leases
+        expired = "status = ? AND COALESCE(lease_expires, 0) < ?"
+        with self._lock, self._conn:
+            failed = self._conn.execute(
+                f"UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, updated_at = ?, finished_at = ? "
+                f"WHERE {expired} AND attempts >= ?",
+                (FAILED, "Se agotaron los intentos: el worker dejó de responder", now, now, RUNNING, now,
+                 max_attempts),
+            ).rowcount
+            requeued = self._conn.execute(
+                f"UPDATE jobs SET status = ?, progress_done = 0, lease_owner = NULL, updated_at = ? WHERE {expired}",
+                (QUEUED, now, RUNNING, now),
+            ).rowcount
+        return {"requeued": requeued, "failed": failed}
+
+    def release(self, owner: str) -> int:
+        """Devuelve a la cola los trabajos de ``owner`` sin gastarles un intento (apagado ordenado)."""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, progress_done = 0, lease_owner = NULL, attempts = attempts - 1, "
+                "updated_at = ? WHERE status = ? AND lease_owner = ?",
+                (QUEUED, time.time(), RUNNING, owner),
+            ).rowcount
+
+    def purge_finished(self, ttl: float) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, time.time() - ttl),
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def job_status(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "job_id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "progress": {"done": row["progress_done"], "total": row["progress_total"]},
+        "error": row["error"],
+        "attempts": row["attempts"],
+        "worker": row["lease_owner"] if row["status"] == RUNNING else None,
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+        "finished_at": row["finished_at"],
+    }
+
+
+def worker_id() -> str:
+    """Identifica a este proceso como dueño de leases: host, pid y un sufijo por arranque."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class JobManager:
+    """Cola de trabajos atendida por hilos que usan el pool de navegadores.
+
+    La cola vive en ``store``: si es compartida, cada réplica toma trabajos con
+    lease y los que eran de una réplica caída vuelven a la cola al vencer.
+    """
+
+    def __init__(self, store, workers: int, result_ttl: float, purge_interval: float = 60.0,
+                 lease_seconds: float = 60.0, heartbeat_interval: float = 15.0, poll_interval: float = 1.0,
+                 max_attempts: int = 3):
+        self.store = store
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.purge_interval = purge_interval
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id()
+        self._handlers: Dict[str, JobHandler] = {}
+        self._running: Dict[str, str] = {}
+        self._running_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads: list = []
+        self._stop = threading.Event()
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        if kind not in self._handlers:
+            raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+        job_id = self.store.create(kind, payload)
+        # Un worker local lo toma sin esperar al siguiente sondeo; en otra réplica, en el próximo
+        self._wake.set()
+        logger.info("Trabajo %s (%s) encolado.", job_id, kind)
+        return job_id
+
+    def start(self):
+        self._stop.clear()
+        self._requeue_expired()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        for target, name in ((self._heartbeat_loop, "job-heartbeat"), (self._purge_loop, "job-janitor")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Worker de trabajos %s iniciado con %d hilos.", self.worker_id, self.workers)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        # Lo que no alcanzó a terminar pasa a otra réplica sin esperar a que venza el lease
+        try:
+            released = self.store.release(self.worker_id)
+            if released:
+                logger.info("%d trabajos devueltos a la cola al apagar.", released)
+        except Exception as e:
+            logger.exception("Error al devolver trabajos a la cola: %s", e)
+
+    def _requeue_expired(self):
+        counts = self.store.requeue_expired(self.max_attempts)
+        if counts["requeued"]:
+            logger.warning("%d trabajos con lease vencido vuelven a la cola.", counts["requeued"])
+            self._wake.set()
+        if counts["failed"]:
+            logger.warning("%d trabajos fallidos tras agotar los intentos.", counts["failed"])
+
+    def _purge_loop(self):
+        # Los leases vencen en lease_seconds: se revisan al menos con esa frecuencia
+        interval = min(self.purge_interval, self.lease_seconds)
+        last_purge = time.monotonic()
+        while not self._stop.wait(interval):
+            try:
+                self._requeue_expired()
+                if time.monotonic() - last_purge >= self.purge_interval:
+                    last_purge = time.monotonic()
+                    purged = self.store.purge_finished(self.result_ttl)
+                    if purged:
+                        logger.info("%d trabajos expirados eliminados.", purged)
+            except Exception as e:
+                logger.exception("Error al purgar trabajos: %s", e)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            with self._running_lock:
+                running = list(self._running)
+            for job_id in running:
+                try:
+                    if not self.store.heartbeat(job_id, self.worker_id, self.lease_seconds):
+                        logger.warning("Trabajo %s: se perdió el lease, otra réplica lo retomará.", job_id)
+                except Exception as e:
+                    logger.exception("Error al renovar el lease del trabajo %s: %s", job_id, e)
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                row = self.store.claim(self.worker_id, self.lease_seconds)
+            except Exception as e:
+                logger.exception("Error al tomar un trabajo de la cola: %s", e)
+                row = None
+            if row is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            with logs.correlation(row["id"]):
+                self._run(row)
+
+    def _run(self, row):
+        job_id = row["id"]
+        owner = self.worker_id
+        handler = self._handlers.get(row["kind"])
+        if handler is None:
+            self.store.update(job_id, owner=owner, status=FAILED,
+                              error=f"Tipo de trabajo desconocido: {row['kind']}", finished_at=time.time())
+            return
+
+        def progress(done: int, total: int):
+            self.store.update(job_id, owner=owner, progress_done=done, progress_total=total)
+
+        with self._running_lock:
+            self._running[job_id] = row["kind"]
+        try:
+            result = handler(json.loads(row["payload"]), progress)
+            if self.store.update(job_id, owner=owner, status=DONE, result=json.dumps(result, ensure_ascii=False),
+                                 finished_at=time.time()):
+                logger.info("Trabajo %s completado.", job_id)
+            else:
+                logger.warning("Trabajo %s terminado sin lease; se descarta el resultado.", job_id)
+        except HTTPException as http_exc:
+            self.store.update(job_id, owner=owner, status=FAILED, error=str(http_exc.detail),
+                              finished_at=time.time())
+            logger.warning("Trabajo %s fallido: %s", job_id, http_exc.detail)
+        except Exception as e:
+            self.store.update(job_id, owner=owner, status=FAILED, error=str(e), finished_at=time.time())
+            logger.exception("Trabajo %s fallido: %s", job_id, e)
+        finally:
+            with self._running_lock:
+                self._running.pop(job_id, None)
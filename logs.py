@@ -0,0 +1,162 @@
+"""Logging estructurado en JSON con ID de correlación, muestreo y emisión en segundo plano.
+
+Los módulos usan ``logging.getLogger(__name__)`` como siempre. ``setup``
+instala en la raíz un ``QueueHandler``: el hilo que registra solo encola y un
+``QueueListener`` formatea y escribe, así que las rutas calientes nunca
+esperan a stdout. Cada registro lleva el ``correlation_id`` de la solicitud o
+trabajo en curso (``correlation``) y el endpoint activo.
+
+Los fallos esperados (capa sin datos, imagen no encontrada…) se registran con
+``extra=SAMPLED``: por cada mensaje se emite el primero y luego uno de cada
+``sample_every``, con el número de omitidos en ``suppressed``.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+import metrics
+
+
+SAMPLED = {"sampled": True}
+
+_correlation_id: contextvars.ContextVar = contextvars.ContextVar("correlation_id", default=None)
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[logging.Handler] = None
+
+# Atributos propios de LogRecord; el resto son campos pasados con extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "correlation_id", "endpoint", "sampled", "suppressed",
+}
+
+
+def new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_correlation_id() -> Optional[str]:
+    return _correlation_id.get()
+
+
+@contextmanager
+def correlation(correlation_id: Optional[str] = None):
+    """Asocia los registros del bloque (y de las tareas e hilos que copien el contexto) a un ID."""
+    token = _correlation_id.set(correlation_id or new_id())
+    try:
+        yield _correlation_id.get()
+    finally:
+        _correlation_id.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copia el ID de correlación y el endpoint del hilo que registra."""
+
+    def filter(self, record):
+        record.correlation_id = _correlation_id.get()
+        endpoint = metrics.current_endpoint()
+        record.endpoint = None if endpoint == metrics.UNKNOWN_ENDPOINT else endpoint
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, sample_every: int):
+        super().__init__()
+        self.sample_every = sample_every
+        self._seen: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.sample_every <= 1 or not getattr(record, "sampled", False):
+            return True
+        key = (record.name, str(record.msg))
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+        if seen % self.sample_every:
+            return False
+        record.suppressed = self.sample_every - 1 if seen else 0
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # El mensaje se resuelve aquí (los argumentos podrían cambiar después);
+        # la traza de la excepción se formatea en el hilo del listener.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in ("correlation_id", "endpoint", "suppressed"):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(correlation_id)s] %(message)s")
+
+    def format(self, record):
+        if not hasattr(record, "correlation_id"):
+            record.correlation_id = None
+        return super().format(record)
+
+
+def setup(level: str = "INFO", fmt: str = "json", sample_every: int = 100, stream=None):
+    """Configura el logger raíz; se puede llamar de nuevo para cambiar la configuración."""
+    global _listener, _handler
+    shutdown()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _handler = _QueueHandler(log_queue)
+    _handler.addFilter(SamplingFilter(sample_every))
+    _handler.addFilter(ContextFilter())
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level.upper())
+    # Bibliotecas ruidosas: solo advertencias
+    for name in ("urllib3", "selenium", "WDM", "httpx"):
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+
+
+def shutdown():
+    """Vacía la cola pendiente y retira el handler."""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# Lo que quede en la cola se escribe antes de salir
+atexit.register(shutdown)
@@ -1,23 +1,223 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import contextvars
 import json
-import random
-import traceback
+import logging
+import queue
+import threading
 import time
 import re
-from typing import Optional, List, Dict, Any
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from typing import Callable, Optional, List, Dict, Any
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
-from webdriver_manager.chrome import ChromeDriverManager
 
+import config
+import logs
+import metrics
+import throttle
+from cache import ResultCache, make_key, parse_cache_control
+from mapgis_http import MapgisHttpEngine
+from image_index import (
+    SOURCE_GOOGLE_IMAGES, SOURCE_GOOGLE_SEARCH, SOURCE_RETAILER, SOURCE_RETAILER_HTTP, ProductImageIndex,
+)
+from product_resolver import INDEXED, SEARCH, SEARCH_RESULT_SELECTORS, ProductResolver, ProductUrlIndex
+from registraduria_http import RegistraduriaHttpEngine
+from retailer_http import RetailerHttpEngine, largest_canvas_link, largest_dynamic_image, widest_srcset
+from verify_http import VerifyHttpEngine
+from extractors import extract_partidos, extract_table_rows
+from driver_pool import DriverPool, PoolTimeout, resolve_chromedriver_path
+from cdp_browser import CdpDriver, CdpPagePool
+from resource_policy import DEFAULT_BLOCKED_DOMAINS, ResourcePolicy
+from waits import (
+    click_and_wait_for_navigation,
+    wait_for_dom_quiet,
+    wait_for_gone,
+    wait_for_network_idle,
+    wait_for_staleness,
+    wait_for_value,
+)
+from executor import ExecutorBusy, ScrapeExecutor
+from jobs import DONE, FAILED, JobManager, JobStore, job_status
+from shared_state import open_shared_state
+
+
+driver_pool = DriverPool(
+    size=config.DRIVER_POOL_SIZE,
+    max_uses=config.DRIVER_MAX_USES,
+    max_rss_mb=config.DRIVER_MAX_RSS_MB,
+    lease_timeout=config.DRIVER_LEASE_TIMEOUT,
+    chromedriver_path=config.CHROMEDRIVER_PATH,
+    offline=config.CHROMEDRIVER_OFFLINE,
+    page_load_strategy=config.PAGE_LOAD_STRATEGY,
+    script_timeout=config.DRIVER_SCRIPT_TIMEOUT,
+)
+
+logs.setup(level=config.LOG_LEVEL, fmt=config.LOG_FORMAT, sample_every=config.LOG_SAMPLE_EVERY)
+metrics.configure(enabled=config.METRICS_ENABLED, tracing=config.TRACING_ENABLED)
+# Cola de trabajos, caché y token buckets comunes a todas las réplicas (None = por proceso)
+shared_state = open_shared_state(
+    config.SHARED_STATE_URL,
+    prefix=config.SHARED_STATE_PREFIX,
+    cache_max_entries=config.CACHE_DISK_MAX_ENTRIES,
+)
+throttle.configure(
+    enabled=config.RATE_LIMIT_ENABLED,
+    rules=config.RATE_LIMITS,
+    initial=config.ADAPTIVE_CONCURRENCY_INITIAL,
+    min_limit=config.ADAPTIVE_CONCURRENCY_MIN,
+    max_limit=config.ADAPTIVE_CONCURRENCY_MAX,
+    slow_after=config.ADAPTIVE_SLOW_SECONDS,
+    decrease=config.ADAPTIVE_DECREASE,
+    block_backoff=config.RATE_LIMIT_BLOCK_BACKOFF,
+    max_wait=config.RATE_LIMIT_MAX_WAIT,
+    shared=shared_state,
+    captcha_hosts=config.RATE_LIMIT_CAPTCHA_HOSTS,
+)
+logger = logging.getLogger(__name__)
+
+# Endpoints cuyos scrapers solo usan la API que imita CdpDriver (sin pestañas ni iframes)
+CDP_ENDPOINTS = ("scrape_resultados", "verify_product", "product_images")
+
+browser_backends = {}
+for endpoint, backend in config.BROWSER_BACKENDS.items():
+    if backend not in ("selenium", "cdp"):
+        raise ValueError(f"Backend de navegador inválido para {endpoint}: {backend}")
+    if backend == "cdp" and endpoint not in CDP_ENDPOINTS:
+        logger.warning("%s no admite el backend cdp, se usa selenium", endpoint)
+        backend = "selenium"
+    browser_backends[endpoint] = backend
+
+cdp_pool = None
+if "cdp" in browser_backends.values():
+    cdp_pool = CdpPagePool(
+        size=config.CDP_MAX_PAGES,
+        lease_timeout=config.DRIVER_LEASE_TIMEOUT,
+        browser_path=config.CDP_BROWSER_PATH,
+        browser_url=config.CDP_BROWSER_URL,
+        window_size=config.CDP_WINDOW_SIZE,
+        max_uses=config.CDP_MAX_USES,
+        max_rss_mb=config.CDP_MAX_RSS_MB,
+        page_load_strategy=config.PAGE_LOAD_STRATEGY,
+        isolate=config.CDP_ISOLATE_CONTEXTS,
+    )
+browser_pools = {"selenium": driver_pool, "cdp": cdp_pool}
+
+mapgis_engine = None
+_mapgis_urls = {
+    "MAPGIS_HTTP_UTILIDAD_URL": config.MAPGIS_HTTP_UTILIDAD_URL,
+    "MAPGIS_HTTP_SEARCH_URL": config.MAPGIS_HTTP_SEARCH_URL,
+    "MAPGIS_HTTP_LAYER_URL": config.MAPGIS_HTTP_LAYER_URL,
+}
+if config.MAPGIS_HTTP_ENABLED and any(_mapgis_urls.values()) and not all(_mapgis_urls.values()):
+    # A medias, la ruta HTTP fallaría en cada solicitud y todo iría a Selenium sin avisar
+    missing = ", ".join(name for name, url in _mapgis_urls.items() if not url)
+    raise ValueError(f"Ruta HTTP de MapGIS configurada a medias: falta {missing}")
+if config.MAPGIS_HTTP_ENABLED and all(_mapgis_urls.values()):
+    mapgis_engine = MapgisHttpEngine(
+        utilidad_url=config.MAPGIS_HTTP_UTILIDAD_URL,
+        search_url=config.MAPGIS_HTTP_SEARCH_URL,
+        layer_url=config.MAPGIS_HTTP_LAYER_URL,
+        timeout=config.MAPGIS_HTTP_TIMEOUT,
+    )
+
+registraduria_engine = None
+if config.REGISTRADURIA_HTTP_ENABLED and config.REGISTRADURIA_HTTP_INDEX_URL and config.REGISTRADURIA_HTTP_RESULTS_URL:
+    registraduria_engine = RegistraduriaHttpEngine(
+        index_url=config.REGISTRADURIA_HTTP_INDEX_URL,
+        results_url=config.REGISTRADURIA_HTTP_RESULTS_URL,
+        timeout=config.REGISTRADURIA_HTTP_TIMEOUT,
+        index_ttl=config.REGISTRADURIA_INDEX_TTL,
+    )
+
+product_resolver = None
+if config.PRODUCT_RESOLVER_ENABLED:
+    product_resolver = ProductResolver(
+        index=ProductUrlIndex(config.PRODUCT_URL_INDEX_PATH or None),
+        product_urls=config.PRODUCT_URLS,
+        search_urls=config.PRODUCT_SEARCH_URLS,
+    )
+
+image_index = None
+if config.IMAGE_INDEX_ENABLED:
+    image_index = ProductImageIndex(
+        config.IMAGE_INDEX_PATH or None,
+        ttl=config.CACHE_TTLS["product_image"],
+        negative_ttl=config.IMAGE_INDEX_NEGATIVE_TTL,
+    )
+
+retailer_engine = None
+if config.RETAILER_HTTP_ENABLED and product_resolver is not None:
+    retailer_engine = RetailerHttpEngine(timeout=config.RETAILER_HTTP_TIMEOUT)
+
+verify_engine = None
+if config.VERIFY_PRODUCT_HTTP_ENABLED:
+    verify_engine = VerifyHttpEngine(timeout=config.VERIFY_PRODUCT_HTTP_TIMEOUT)
+
+resource_policies = {
+    endpoint: ResourcePolicy(
+        block_types=policy["block_types"] if config.RESOURCE_BLOCKING_ENABLED else [],
+        block_domains=DEFAULT_BLOCKED_DOMAINS + config.RESOURCE_BLOCK_DOMAINS if config.RESOURCE_BLOCKING_ENABLED else [],
+        allow_domains=config.RESOURCE_ALLOW_DOMAINS,
+        page_load_strategy=policy["page_load_strategy"],
+    )
+    for endpoint, policy in config.RESOURCE_POLICIES.items()
+}
+
+scrape_executor = ScrapeExecutor(
+    max_workers=config.EXECUTOR_MAX_WORKERS,
+    limits=config.ENDPOINT_CONCURRENCY,
+    queue_size=config.EXECUTOR_QUEUE_SIZE,
+    retry_after=config.EXECUTOR_RETRY_AFTER,
+)
 
-app = FastAPI()
+result_cache = ResultCache(
+    max_entries=config.CACHE_MAX_ENTRIES,
+    db_path=config.CACHE_DB_PATH,
+    disk_max_entries=config.CACHE_DISK_MAX_ENTRIES,
+    shared=shared_state,
+    lock_ttl=config.CACHE_SHARED_LOCK_TTL,
+)
+
+job_manager = JobManager(
+    store=shared_state.job_store() if shared_state is not None else JobStore(config.JOBS_DB_PATH),
+    workers=config.JOB_WORKERS,
+    result_ttl=config.JOB_RESULT_TTL,
+    lease_seconds=config.JOB_LEASE_SECONDS,
+    heartbeat_interval=config.JOB_HEARTBEAT_INTERVAL,
+    poll_interval=config.JOB_POLL_INTERVAL,
+    max_attempts=config.JOB_MAX_ATTEMPTS,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        resolve_chromedriver_path(config.CHROMEDRIVER_PATH, config.CHROMEDRIVER_OFFLINE)
+    except Exception as e:
+        logger.exception("Error al resolver chromedriver: %s", e)
+    if "selenium" in browser_backends.values():
+        driver_pool.warm(config.DRIVER_POOL_WARM)
+    if cdp_pool is not None:
+        cdp_pool.warm(config.DRIVER_POOL_WARM)
+    job_manager.start()
+    yield
+    job_manager.stop()
+    scrape_executor.shutdown()
+    driver_pool.close()
+    if cdp_pool is not None:
+        cdp_pool.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,9 +227,26 @@ app.add_middleware(
     allow_headers=["*"],  # Permitir todas las cabeceras
 )
 
+
+@app.middleware("http")
+async def correlation_middleware(request: Request, call_next):
+    # Cada solicitud lleva un ID (el X-Request-ID del cliente o uno nuevo) en todos sus registros
+    with logs.correlation(request.headers.get("x-request-id")) as request_id:
+        started = time.perf_counter()
+        response = await call_next(request)
+        logger.info(
+            "%s %s -> %d", request.method, request.url.path, response.status_code,
+            extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1)},
+        )
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 class DireccionInput(BaseModel):
     direccion: str
 
+class DireccionesBatchInput(BaseModel):
+    direcciones: List[str]
+
 class MunicipioInput(BaseModel):
     municipio: str
 
@@ -60,199 +277,629 @@ class StoreDataInput(BaseModel):
     store: str
     data: List[StoreDataItem]
 
-def scrape_direccion(direccion: str):
-    options = webdriver.ChromeOptions()
-    options.add_argument('--ignore-certificate-errors')
-    options.add_argument('--ignore-certificate-errors-spki-list')
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--window-size=1920,1080')
-    user_agents = [
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
-        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36"
-    ]
-
-    options.add_argument(f"user-agent={random.choice(user_agents)}")
-    # Iniciar el navegador
+def lease_driver(endpoint: str, timeout: Optional[float] = None):
+    policy = resource_policies[endpoint]
     try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-        print("ChromeDriver iniciado correctamente.")
+        pool = browser_pools[browser_backends[endpoint]]
+        driver = pool.acquire(timeout, page_load_strategy=policy.page_load_strategy)
+        policy.apply(driver)
+        return driver
+    except PoolTimeout as e:
+        # Con timeout 0 solo se pregunta si hay un navegador libre: no es un error
+        logger.log(logging.DEBUG if timeout == 0 else logging.WARNING, "Pool de navegadores agotado: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Navegadores ocupados: {str(e)}",
+            headers={"Retry-After": str(config.EXECUTOR_RETRY_AFTER)},
+        )
     except Exception as e:
-        print(f"Error al iniciar ChromeDriver: {e}")
-        traceback.print_exc()
+        logger.exception("Error al iniciar ChromeDriver: %s", e)
         raise HTTPException(status_code=500, detail=f"Error al iniciar el navegador: {str(e)}")
 
-    resultados = {}
+def release_driver(driver):
+    (cdp_pool if isinstance(driver, CdpDriver) else driver_pool).release(driver)
 
-    try:
-        driver.get('https://www.medellin.gov.co/mapgis9/mapa.jsp?aplicacion=41')
-        print("Página cargada")
+def renew_driver(endpoint: str, driver):
+    """Contexto limpio para el siguiente scrape del mismo préstamo (solo CDP con contextos aislados)."""
+    if not isinstance(driver, CdpDriver) or not cdp_pool.isolate:
+        return driver
+    driver = cdp_pool.renew(driver)
+    resource_policies[endpoint].apply(driver)
+    return driver
 
-        WebDriverWait(driver, 20).until(
-            EC.visibility_of_element_located((By.CSS_SELECTOR, 'button.btn.btn-siguiente.ajs-ok'))
-        ).click()
-        print('Botón "Aceptar" clickeado')
+@contextmanager
+def throttled_visit(driver, url: str):
+    """Carga ``url`` con un turno del límite de su host y lo conserva mientras dura el bloque.
 
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.ID, 'frmUtilidad53'))
+    Al salir se revisa si la página es un CAPTCHA o aviso de bloqueo para que el
+    límite del host retroceda.
+    """
+    try:
+        with throttle.slot(url) as outcome:
+            try:
+                with metrics.stage("page_load"):
+                    driver.get(url)
+                yield
+            finally:
+                # Los hosts sin límite no tienen a quién avisar: no se revisa la página
+                reason = throttle.page_block_reason(driver, url) if throttle.limiter_for(url) else None
+                if reason:
+                    outcome.blocked(reason)
+    except throttle.Throttled as e:
+        raise throttled_error(e)
+
+def throttled_error(e: throttle.Throttled) -> HTTPException:
+    logger.warning("Sin turno para %s: %s", e.host, e)
+    return HTTPException(
+        status_code=503,
+        detail=f"Sitio de destino limitado: {str(e)}",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+def load_page(driver, url: str):
+    with throttled_visit(driver, url):
+        pass
+
+async def run_scraper(endpoint: str, fn, *args, **kwargs):
+    try:
+        return await scrape_executor.run(endpoint, fn, *args, **kwargs)
+    except ExecutorBusy as e:
+        logger.warning("Cola llena para %s, respondiendo 503", endpoint)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Servicio ocupado: {str(e)}",
+            headers={"Retry-After": str(e.retry_after)},
         )
-        print('iframe encontrado')
 
-        iframe = driver.find_element(By.ID, 'frmUtilidad53')
-        driver.switch_to.frame(iframe)
-        print('Cambio al contexto del iframe realizado.')
+def cache_policy(request: Request) -> Dict[str, Any]:
+    policy = parse_cache_control(request.headers.get("cache-control"))
+    if not config.CACHE_ENABLED:
+        policy.update(read=False, write=False)
+    return policy
+
+async def cached_scrape(request: Request, response: Response, endpoint: str, params: Dict[str, Any], fn, *args):
+    policy = cache_policy(request)
+    result, status = await result_cache.get_or_run(
+        endpoint,
+        params,
+        config.CACHE_TTLS[endpoint],
+        lambda: run_scraper(endpoint, fn, *args),
+        read=policy["read"],
+        write=policy["write"],
+        max_age=policy["max_age"],
+    )
+    response.headers["X-Cache"] = status
+    metrics.count_cache(endpoint, status)
+    return result
+
+async def stream_scraper(endpoint: str, fn, *args):
+    """Ejecuta ``fn(*args, emit)`` en el ejecutor y devuelve un iterador asíncrono de lo emitido.
+
+    ``emit`` bloquea el hilo del scraper mientras el búfer está lleno y devuelve
+    False cuando el cliente se desconectó, para que el scraper pare.
+    """
+    loop = asyncio.get_running_loop()
+    items: asyncio.Queue = asyncio.Queue(maxsize=config.STREAM_BUFFER_SIZE)
+    closed = threading.Event()
+    finished = object()
+
+    def put(item) -> bool:
+        try:
+            pending = asyncio.run_coroutine_threadsafe(items.put(item), loop)
+        except RuntimeError:
+            # El event loop ya se cerró (apagado del servidor)
+            return False
+        while True:
+            try:
+                pending.result(timeout=0.5)
+                return True
+            except CancelledError:
+                return False
+            except FutureTimeout:
+                if closed.is_set() or loop.is_closed():
+                    pending.cancel()
+                    return False
+
+    def emit(item):
+        if closed.is_set():
+            return False
+        return put(item)
+
+    def run():
+        try:
+            fn(*args, emit)
+        finally:
+            if not closed.is_set():
+                put(finished)
+
+    task = asyncio.ensure_future(run_scraper(endpoint, run))
+    # Deja correr el primer paso de la tarea: si la cola está llena, el 503 sale antes de empezar a transmitir
+    await asyncio.sleep(0)
+    if task.done():
+        task.result()
+
+    async def iterate():
+        try:
+            while True:
+                item = await items.get()
+                if item is finished:
+                    break
+                yield item
+            try:
+                await task
+            except HTTPException as http_exc:
+                yield {"error": http_exc.detail}
+            except Exception as e:
+                logger.exception("Error durante la transmisión: %s", e)
+                yield {"error": f"Error durante el scraping: {str(e)}"}
+        finally:
+            closed.set()
+
+    return iterate()
+
+def stream_format(request: Request) -> Optional[str]:
+    """Formato de streaming pedido con ``?stream=ndjson|sse`` o la cabecera Accept."""
+    requested = request.query_params.get("stream", "").lower()
+    if requested in ("ndjson", "sse"):
+        return requested
+    accept = request.headers.get("accept", "").lower()
+    if "text/event-stream" in accept:
+        return "sse"
+    if "application/x-ndjson" in accept:
+        return "ndjson"
+    return None
+
+def streaming_response(items, fmt: str):
+    async def ndjson():
+        async for item in items:
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    async def sse():
+        async for item in items:
+            event = "error" if "error" in item and len(item) == 1 else "item"
+            yield f"event: {event}\ndata: {json.dumps(item, ensure_ascii=False)}\n\n"
+        yield "event: end\ndata: {}\n\n"
+
+    if fmt == "sse":
+        return StreamingResponse(sse(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+def cached_call(endpoint: str, params: Dict[str, Any], fn, *args):
+    # Versión síncrona para los trabajos en segundo plano (sin single-flight)
+    key = make_key(endpoint, params)
+    if config.CACHE_ENABLED:
+        found, value = result_cache.get(key)
+        metrics.count_cache(endpoint, "HIT" if found else "MISS")
+        if found:
+            return value
+    with metrics.endpoint(endpoint), metrics.stage("total"):
+        value = fn(*args)
+    if config.CACHE_ENABLED:
+        result_cache.set(key, value, config.CACHE_TTLS[endpoint])
+    return value
+
+CAPAS_MAPGIS = 15
+
+
+def scrape_direccion_http(direccion: str, on_layer: Optional[Callable[[str, List[str]], Any]] = None):
+    """Ruta rápida sin navegador; None si no está configurada o falló (se usa Selenium)."""
+    if mapgis_engine is None:
+        return None
+    try:
+        with metrics.stage("http_fast_path"):
+            resultados = mapgis_engine.scrape(direccion, on_layer)
+        logger.info("MapGIS por HTTP: %d capas para %s", len(resultados), direccion)
+        return resultados
+    except throttle.Throttled as e:
+        # Selenium visitaría el mismo host: se responde 503 en vez de insistir
+        raise throttled_error(e)
+    except Exception as e:
+        logger.warning("Ruta HTTP de MapGIS falló, se usa Selenium: %s", e)
+        metrics.count_fallback("mapgis_http")
+        return None
+
 
-        search_input = WebDriverWait(driver, 30).until(
-            EC.visibility_of_element_located((By.ID, 'strBusqueda'))
-        )
-        print('Campo de búsqueda encontrado')
+def open_mapgis_session(driver):
+    driver.switch_to.default_content()
+    load_page(driver, config.MAPGIS_URL)
+    logger.debug("Página cargada")
 
-        search_input.send_keys(direccion)
-        print('Dirección ingresada:', direccion)
+    WebDriverWait(driver, 20).until(
+        EC.visibility_of_element_located((By.CSS_SELECTOR, 'button.btn.btn-siguiente.ajs-ok'))
+    ).click()
+    logger.debug('Botón "Aceptar" clickeado')
 
-        search_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, 'buscar'))
-        )
-        search_button.click()
-        print('Botón "Buscar" clickeado')
+    WebDriverWait(driver, 30).until(
+        EC.presence_of_element_located((By.ID, 'frmUtilidad53'))
+    )
+    logger.debug("iframe encontrado")
 
-        driver.implicitly_wait(30)
+    iframe = driver.find_element(By.ID, 'frmUtilidad53')
+    driver.switch_to.frame(iframe)
+    logger.debug("Cambio al contexto del iframe realizado.")
 
-        print('Esperando el campo "strCbml"')
+    WebDriverWait(driver, 30).until(
+        EC.visibility_of_element_located((By.ID, 'strBusqueda'))
+    )
+    logger.debug("Campo de búsqueda encontrado")
 
-        try:
-            WebDriverWait(driver, 60).until(
-                lambda driver: driver.find_element(By.ID, 'strCbml').get_attribute('value') != ''
-            )
-            print('"strCbml" encontrado y tiene un valor.')
-
-            strCbml_element = driver.find_element(By.ID, 'strCbml')
-            strCbml_value = strCbml_element.get_attribute('value')
-            if not strCbml_value:
-                print('El campo strCbml está vacío')
-                raise ValueError('El campo strCbml está vacío')
-            print('Valor de strCbml:', strCbml_value)
-        except Exception as e:
-            print(f"Error al obtener strCbml: {e}")
-            traceback.print_exc()
-            with open('pagina_error.html', 'w', encoding='utf-8') as f:
-                f.write(driver.page_source)
-            raise HTTPException(status_code=500, detail=f"Error durante el scraping: {str(e)}")
 
-        for i in range(1, 16):
-            try:
-                radio_button_xpath = f'//input[@type="radio" and @id="{i}"]'
-                print(f'Intentando localizar el radio button {i} usando XPath: {radio_button_xpath}')
+def buscar_cbml(driver, direccion: str):
+    search_input = WebDriverWait(driver, 30).until(
+        EC.visibility_of_element_located((By.ID, 'strBusqueda'))
+    )
+    search_input.clear()
+    # En sesiones reutilizadas strCbml conserva el valor de la dirección anterior
+    driver.execute_script("var el = document.getElementById('strCbml'); if (el) { el.value = ''; }")
+    search_input.send_keys(direccion)
+    logger.debug("Dirección ingresada: %s", direccion)
 
-                radio_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, radio_button_xpath))
-                )
-                print(f'Radio button {i} localizado y clickeable.')
+    search_button = WebDriverWait(driver, 10).until(
+        EC.element_to_be_clickable((By.ID, 'buscar'))
+    )
+    search_button.click()
+    logger.debug('Botón "Buscar" clickeado')
 
-                valor_radio = radio_button.get_attribute("value")
-                print(f'Valor del radio button {i}: {valor_radio}')
+    logger.debug('Esperando el campo "strCbml"')
 
-                radio_button.click()
-                print(f'Radio button {i} clickeado')
+    try:
+        # Espera explícita: una implícita seguiría activa en leer_capa y cada
+        # find_element de 'noDatos' tardaría su timeout completo en las capas con datos
+        strCbml_value = wait_for_value(driver, 'strCbml', timeout=60)
+        logger.info("Valor de strCbml: %s", strCbml_value)
+        return strCbml_value
+    except Exception as e:
+        logger.exception("Error al obtener strCbml: %s", e)
+        with open('pagina_error.html', 'w', encoding='utf-8') as f:
+            f.write(driver.page_source)
+        raise HTTPException(status_code=500, detail=f"Error durante el scraping: {str(e)}")
 
-                try:
-                    alert_element = driver.find_element(By.ID, 'noDatos')
-                    if alert_element.is_displayed():
-                        print(f'Alerta "no datos" mostrada para el radio button {i}')
-                        continue
-                except:
-                    print(f'No se encontró alerta "no datos" para el radio button {i}')
 
-                try:
-                    result_table = WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, 'table#res0'))
-                    )
-                    print(f'Tabla de resultados encontrada para el radio button {i}')
-
-                    if result_table:
-                        tbody = result_table.find_element(By.TAG_NAME, 'tbody')
-                        rows = tbody.find_elements(By.TAG_NAME, 'tr')
-                        table_data = [' | '.join([cell.text for cell in row.find_elements(By.TAG_NAME, 'td')]) for row in rows]
-                        resultados[valor_radio] = table_data
-                        print(f'Datos guardados para el radio button {i}')
+def click_capa(driver, i: int):
+    radio_button_xpath = f'//input[@type="radio" and @id="{i}"]'
+    logger.debug("Intentando localizar el radio button %d usando XPath: %s", i, radio_button_xpath)
+
+    radio_button = WebDriverWait(driver, 10).until(
+        EC.element_to_be_clickable((By.XPATH, radio_button_xpath))
+    )
+    logger.debug("Radio button %d localizado y clickeable.", i)
+
+    valor_radio = radio_button.get_attribute("value")
+    logger.debug("Valor del radio button %d: %s", i, valor_radio)
+
+    # La tabla de la capa anterior debe desaparecer antes de leer la nueva
+    old_table = driver.execute_script("return document.querySelector('table#res0');")
+    radio_button.click()
+    logger.debug("Radio button %d clickeado", i)
+    return valor_radio, old_table
+
+
+def leer_capa(driver, i: int, old_table=None):
+    """Filas de la capa recién seleccionada, o None si MapGIS indica que no hay datos."""
+    if old_table is not None:
+        wait_for_staleness(driver, old_table, timeout=5)
+    wait_for_dom_quiet(driver, quiet_ms=200, timeout=10)
+
+    try:
+        alert_element = driver.find_element(By.ID, 'noDatos')
+        if alert_element.is_displayed():
+            logger.debug('Alerta "no datos" mostrada para el radio button %d', i)
+            return None
+    except:
+        logger.debug('No se encontró alerta "no datos" para el radio button %d', i)
+
+    try:
+        result_table = WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, 'table#res0'))
+        )
+        logger.debug("Tabla de resultados encontrada para el radio button %d", i)
+
+        if result_table:
+            table_data = extract_table_rows(driver)
+            if table_data is None:
+                metrics.count_fallback("extract_table_rows")
+                tbody = result_table.find_element(By.TAG_NAME, 'tbody')
+                rows = tbody.find_elements(By.TAG_NAME, 'tr')
+                table_data = [' | '.join([cell.text for cell in row.find_elements(By.TAG_NAME, 'td')]) for row in rows]
+            return table_data
 
+    except Exception as e:
+        # Capa vacía o lenta: es un caso esperado, sin traza y muestreado
+        logger.info("Error al buscar tabla para el radio button %d: %s", i, e, extra=logs.SAMPLED)
+    return None
+
+
+_MAPGIS_STATE = """
+var state = {};
+document.querySelectorAll('input[id]').forEach(function (el) {
+    if (el.type === 'hidden' || el.type === 'text') { state[el.id] = el.value; }
+});
+return state;
+"""
+
+_RESTORE_MAPGIS_STATE = """
+var state = arguments[0];
+Object.keys(state).forEach(function (id) {
+    var el = document.getElementById(id);
+    if (el) { el.value = state[id]; }
+});
+"""
+
+
+def scrape_capas_en_pestanas(driver, capas: List[int], on_capa: Callable[[int, Optional[str], Any], bool]):
+    # Abre varias pestañas con la utilidad de MapGIS, les copia el estado del
+    # formulario (strCbml incluido) y consulta las capas por rondas: primero se
+    # hace clic en todas las pestañas y después se leen, de modo que las
+    # consultas de cada ronda corren a la vez en el navegador.
+    main_window = driver.current_window_handle
+    utilidad_url = driver.execute_script("return window.location.href;")
+    state = driver.execute_script(_MAPGIS_STATE)
+    tabs = []
+    try:
+        for _ in range(min(config.MAPGIS_LAYER_TABS, len(capas))):
+            driver.switch_to.new_window('tab')
+            # Network.setBlockedURLs es por pestaña: la nueva no hereda el bloqueo de la original
+            resource_policies["scrape_direccion"].apply(driver)
+            load_page(driver, utilidad_url)
+            WebDriverWait(driver, 30).until(
+                EC.presence_of_element_located((By.XPATH, '//input[@type="radio"]'))
+            )
+            driver.execute_script(_RESTORE_MAPGIS_STATE, state)
+            tabs.append(driver.current_window_handle)
+        logger.info("%d pestañas de MapGIS abiertas con strCbml=%s", len(tabs), state.get("strCbml"))
+
+        for ronda in range(0, len(capas), len(tabs)):
+            clicks = []
+            for handle, i in zip(tabs, capas[ronda:ronda + len(tabs)]):
+                driver.switch_to.window(handle)
+                try:
+                    clicks.append((handle, i) + click_capa(driver, i))
                 except Exception as e:
-                    print(f'Error al buscar tabla para el radio button {i}: {e}')
-                    traceback.print_exc()
+                    logger.info("Error en el radio button %d: %s", i, e, extra=logs.SAMPLED)
+            for handle, i, valor_radio, old_table in clicks:
+                driver.switch_to.window(handle)
+                if not on_capa(i, valor_radio, leer_capa(driver, i, old_table)):
+                    return
+    finally:
+        for handle in tabs:
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+            except Exception:
+                pass
+        driver.switch_to.window(main_window)
+        driver.switch_to.frame(driver.find_element(By.ID, 'frmUtilidad53'))
+
+
+def scrape_capas(driver, progress: Optional[Callable[[int, int], None]] = None,
+                 on_layer: Optional[Callable[[str, List[str]], bool]] = None):
+    """``(resultados por capa, completo)``; ``completo`` es False si ``on_layer`` cortó el recorrido."""
+    capas = list(range(1, CAPAS_MAPGIS + 1))
+    por_capa: Dict[int, Any] = {}
+    stopped = [False]
+
+    def on_capa(i: int, valor_radio: Optional[str], table_data):
+        por_capa[i] = (valor_radio, table_data)
+        if progress:
+            progress(len(por_capa), CAPAS_MAPGIS)
+        if table_data is not None:
+            logger.debug("Datos guardados para el radio button %d", i)
+            if on_layer and on_layer(valor_radio, table_data) is False:
+                logger.info("Cliente desconectado, se detiene el recorrido de capas.")
+                stopped[0] = True
+        return not stopped[0]
+
+    if progress:
+        progress(0, CAPAS_MAPGIS)
+
+    if config.MAPGIS_LAYER_TABS > 1:
+        try:
+            scrape_capas_en_pestanas(driver, capas, on_capa)
+        except Exception as e:
+            logger.warning("Consulta de capas en pestañas falló, se continúa en secuencia: %s", e, exc_info=True)
+            metrics.count_fallback("mapgis_tabs")
+
+    # Las capas que fallaron en paralelo se consultan una a una. Si ninguna
+    # pestaña devolvió datos, el estado copiado no sirvió y se repiten todas.
+    if not any(table_data is not None for _, table_data in por_capa.values()):
+        por_capa.clear()
+    for i in capas:
+        if stopped[0]:
+            break
+        if i in por_capa:
+            continue
+        try:
+            valor_radio, old_table = click_capa(driver, i)
+            on_capa(i, valor_radio, leer_capa(driver, i, old_table))
+        except Exception as e:
+            logger.warning("Error en el radio button %d: %s", i, e, exc_info=True)
+
+    resultados = {
+        por_capa[i][0]: por_capa[i][1]
+        for i in capas
+        if i in por_capa and por_capa[i][1] is not None
+    }
+    return resultados, not stopped[0]
 
-            except Exception as e:
-                print(f'Error en el radio button {i}: {e}')
-                traceback.print_exc()
 
-            time.sleep(0.5)
+def scrape_direccion(direccion: str, progress: Optional[Callable[[int, int], None]] = None):
+    resultados = scrape_direccion_http(direccion)
+    if resultados is not None:
+        if progress:
+            progress(CAPAS_MAPGIS, CAPAS_MAPGIS)
+        return json.dumps(resultados, ensure_ascii=False)
+
+    driver = lease_driver("scrape_direccion")
+
+    try:
+        open_mapgis_session(driver)
+        buscar_cbml(driver, direccion)
+        resultados, _ = scrape_capas(driver, progress)
 
         json_resultados = json.dumps(resultados, ensure_ascii=False)
-        print('Scraping completado exitosamente.')
+        logger.info("Scraping completado exitosamente.")
         return json_resultados
 
     except HTTPException as http_exc:
-        print(f"HTTPException: {http_exc.detail}")
+        logger.warning("HTTPException: %s", http_exc.detail)
         raise http_exc
     except Exception as e:
-        print(f"Excepción en scrape_direccion: {e}")
-        traceback.print_exc()
+        logger.exception("Excepción en scrape_direccion: %s", e)
         raise HTTPException(status_code=500, detail=f"Error durante el scraping: {str(e)}")
     finally:
-        driver.quit()
-        print("Navegador cerrado.")
+        release_driver(driver)
+
+
+def scrape_direccion_stream(direccion: str, emit):
+    key = make_key("scrape_direccion", {"direccion": direccion})
+    found, cached = result_cache.get(key) if config.CACHE_ENABLED else (False, None)
+    if found:
+        for capa, filas in json.loads(cached).items():
+            if not emit({"capa": capa, "filas": filas}):
+                return
+        return
+
+    def on_layer(capa, filas):
+        return emit({"capa": capa, "filas": filas})
+
+    resultados = scrape_direccion_http(direccion, on_layer)
+    complete = True
+    if resultados is None:
+        driver = lease_driver("scrape_direccion")
+        try:
+            open_mapgis_session(driver)
+            buscar_cbml(driver, direccion)
+            resultados, complete = scrape_capas(driver, on_layer=on_layer)
+        finally:
+            release_driver(driver)
+    # Si el cliente se fue a mitad del recorrido faltan capas: no se cachea
+    if config.CACHE_ENABLED and complete:
+        result_cache.set(key, json.dumps(resultados, ensure_ascii=False), config.CACHE_TTLS["scrape_direccion"])
+
+
+def scrape_direcciones_batch(direcciones: List[str], emit: Callable[[Dict[str, Any]], bool]):
+    # Una sola sesión de MapGIS para todo el lote: solo se reenvía strBusqueda
+    driver = None
+    try:
+        for direccion in direcciones:
+            key = make_key("scrape_direccion", {"direccion": direccion})
+            found, resultados = result_cache.get(key) if config.CACHE_ENABLED else (False, None)
+            if not found:
+                try:
+                    capas = scrape_direccion_http(direccion)
+                    if capas is None:
+                        if driver is None:
+                            driver = lease_driver("scrape_direccion")
+                            open_mapgis_session(driver)
+                        try:
+                            buscar_cbml(driver, direccion)
+                        except WebDriverException as e:
+                            # Sesión caducada (iframe recargado, ventana perdida...): se rehace una vez
+                            logger.warning("Sesión de MapGIS caducada, reabriendo: %s", e)
+                            open_mapgis_session(driver)
+                            buscar_cbml(driver, direccion)
+                        capas, _ = scrape_capas(driver)
+                    resultados = json.dumps(capas, ensure_ascii=False)
+                    if config.CACHE_ENABLED:
+                        result_cache.set(key, resultados, config.CACHE_TTLS["scrape_direccion"])
+                except Exception as e:
+                    detail = e.detail if isinstance(e, HTTPException) else str(e)
+                    logger.warning("Error en la dirección %s: %s", direccion, detail)
+                    if not emit({"direccion": direccion, "error": detail}):
+                        break
+                    continue
+            if not emit({"direccion": direccion, "resultados": resultados}):
+                logger.info("Cliente desconectado, se detiene el lote.")
+                break
+    finally:
+        if driver is not None:
+            release_driver(driver)
 
 
 @app.post("/scrape_direccion")
-async def scrape_direccion_endpoint(direccion: DireccionInput):
+async def scrape_direccion_endpoint(direccion: DireccionInput, request: Request, response: Response):
     try:
-        print(f"Solicitud recibida para scrape_direccion: {direccion.direccion}")
-        resultados = scrape_direccion(direccion.direccion)
-        print("Respuesta enviada exitosamente.")
+        logger.info("Solicitud recibida para scrape_direccion: %s", direccion.direccion)
+        fmt = stream_format(request)
+        if fmt:
+            items = await stream_scraper("scrape_direccion", scrape_direccion_stream, direccion.direccion)
+            return streaming_response(items, fmt)
+        resultados = await cached_scrape(
+            request, response, "scrape_direccion", {"direccion": direccion.direccion},
+            scrape_direccion, direccion.direccion
+        )
+        logger.info("Respuesta enviada exitosamente.")
         return {"resultados": resultados}
     except HTTPException as http_exc:
-        print(f"HTTPException: {http_exc.detail}")
+        logger.warning("HTTPException: %s", http_exc.detail)
         raise http_exc
     except Exception as e:
-        print(f"Excepción no manejada: {e}")
-        traceback.print_exc()
+        logger.exception("Excepción no manejada: %s", e)
         raise HTTPException(status_code=500, detail=f"Error inesperado: {str(e)}")
 
 
+@app.post("/scrape_direccion/batch")
+async def scrape_direccion_batch_endpoint(payload: DireccionesBatchInput, request: Request):
+    logger.info("Solicitud recibida para scrape_direccion/batch: %d direcciones", len(payload.direcciones))
+    items = await stream_scraper("scrape_direccion", scrape_direcciones_batch, payload.direcciones)
+    return streaming_response(items, stream_format(request) or "ndjson")
+
+
+def scrape_resultados_http(municipio: str):
+    """Resultados desde el JSON de la Registraduría; None si hay que recurrir a Selenium."""
+    if registraduria_engine is None:
+        return None
+    try:
+        with metrics.stage("http_fast_path"):
+            return registraduria_engine.resultados(municipio)
+    except throttle.Throttled as e:
+        # Selenium visitaría el mismo host: se responde 503 en vez de insistir
+        raise throttled_error(e)
+    except Exception as e:
+        logger.warning("Ruta HTTP de la Registraduría falló (%s), se usa Selenium", e)
+        metrics.count_fallback("registraduria_http")
+        return None
+
+
 def scrape_resultados_electorales(municipio: str):
-    options = webdriver.ChromeOptions()
-    options.add_argument('--ignore-certificate-errors')
-    options.add_argument('--ignore-certificate-errors-spki-list')
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--window-size=1920,1080')
-    options.add_argument("--disable-notifications")
+    partidos_info = scrape_resultados_http(municipio)
+    if partidos_info is not None:
+        return json.dumps(partidos_info, ensure_ascii=False)
+
+    driver = lease_driver("scrape_resultados")
 
     try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
         wait = WebDriverWait(driver, 20)
         
-        url = "https://resultadospreccongreso.registraduria.gov.co/senado/0"
-        driver.get(url)
+        load_page(driver, config.REGISTRADURIA_URL)
         
         search_input = WebDriverWait(driver, 20).until(
             EC.element_to_be_clickable((By.ID, "downshift-0-input"))
         )
-        time.sleep(3)
+        # La SPA termina de hidratarse cuando el DOM deja de cambiar
+        wait_for_dom_quiet(driver, quiet_ms=500, timeout=10)
         search_input.clear()
         search_input.send_keys(municipio)
-        time.sleep(2)
+        try:
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "[id^='downshift-0-item-']"))
+            )
+        except Exception:
+            logger.info("No aparecieron sugerencias de municipio, se continúa", extra=logs.SAMPLED)
         search_input.send_keys(Keys.ARROW_DOWN)
         search_input.send_keys(Keys.ENTER)
-        time.sleep(5)
+        wait_for_network_idle(driver, idle_ms=500, timeout=15)
+        wait_for_dom_quiet(driver, quiet_ms=300, timeout=10)
 
         js_script = "return document.querySelectorAll('div.containerMasMenos button').length > 0;"
         wait.until(lambda driver: driver.execute_script(js_script))
-        
+
+        partidos_info = extract_partidos(driver)
+        if partidos_info is not None:
+            return json.dumps(partidos_info, ensure_ascii=False)
+        logger.warning("Usando extracción elemento a elemento para los partidos")
+        metrics.count_fallback("extract_partidos")
+
         partidos_info = {}
         nombres_partidos = driver.find_elements(By.CLASS_NAME, "FilaTablaPartidos__NombrePartido-jcnt0x-7")
         porcentajes = driver.find_elements(By.CLASS_NAME, "porcAgr")
@@ -267,7 +914,6 @@ def scrape_resultados_electorales(municipio: str):
 
         for boton, partido_nombre in zip(botones, partidos_info.keys()):
             driver.execute_script("arguments[0].scrollIntoView(true);", boton)
-            time.sleep(1)
             driver.execute_script("arguments[0].click();", boton)
             
             WebDriverWait(driver, 10).until(
@@ -297,132 +943,227 @@ def scrape_resultados_electorales(municipio: str):
                     continue
             
             driver.execute_script("arguments[0].click();", boton)
-            time.sleep(0.5)
+            # La lista debe cerrarse antes de abrir la del siguiente partido
+            wait_for_gone(driver, container, timeout=5)
 
         return json.dumps(partidos_info, ensure_ascii=False)
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error en scrape_resultados_electorales: {e}")
-        traceback.print_exc()
+        logger.exception("Error en scrape_resultados_electorales: %s", e)
         raise HTTPException(status_code=500, detail=f"Error durante el scraping: {str(e)}")
     finally:
-        driver.quit()
+        release_driver(driver)
 
 @app.post("/scrape_resultados")
-async def scrape_resultados_endpoint(municipio: MunicipioInput):
+async def scrape_resultados_endpoint(municipio: MunicipioInput, request: Request, response: Response):
     try:
-        print(f"Solicitud recibida para scrape_resultados: {municipio.municipio}")
-        resultados = scrape_resultados_electorales(municipio.municipio)
+        logger.info("Solicitud recibida para scrape_resultados: %s", municipio.municipio)
+        resultados = await cached_scrape(
+            request, response, "scrape_resultados", {"municipio": municipio.municipio},
+            scrape_resultados_electorales, municipio.municipio
+        )
         return {"resultados": resultados}
     except HTTPException as http_exc:
-        print(f"HTTPException: {http_exc.detail}")
+        logger.warning("HTTPException: %s", http_exc.detail)
         raise http_exc
     except Exception as e:
-        print(f"Excepción no manejada: {e}")
-        traceback.print_exc()
+        logger.exception("Excepción no manejada: %s", e)
         raise HTTPException(status_code=500, detail=f"Error inesperado: {str(e)}")
 
 
-def scrape_google_search(search_query: str, verification_word: Optional[str] = None):
-    options = webdriver.ChromeOptions()
-    options.add_argument('--ignore-certificate-errors')
-    options.add_argument('--ignore-certificate-errors-spki-list')
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--window-size=1920,1080')
-    user_agents = [
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
-        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36"
-    ]
-    options.add_argument(f"user-agent={random.choice(user_agents)}")
+# Enlaces de los resultados, sin repetir y en el orden de la página
+_RESULT_LINKS = """
+var seen = {};
+return Array.from(document.querySelectorAll('#search .g a')).map(function (a) { return a.href; })
+    .filter(function (href) {
+        if (!/^https?:/.test(href) || seen[href]) return false;
+        seen[href] = true;
+        return true;
+    });
+"""
 
-    try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-        print("ChromeDriver iniciado correctamente.")
-        wait = WebDriverWait(driver, 10)
+_BODY_CONTAINS = """
+var body = document.body;
+return !!body && body.innerText.toLowerCase().indexOf(arguments[0]) !== -1;
+"""
 
-        print(f"Realizando búsqueda: {search_query}")
-        driver.get("https://www.google.com")
+
+def google_result_links(driver, search_query: str) -> List[str]:
+    wait = WebDriverWait(driver, 10)
+    with throttled_visit(driver, config.GOOGLE_URL):
         search_box = wait.until(EC.presence_of_element_located((By.NAME, "q")))
         search_box.send_keys(search_query)
         search_box.send_keys(Keys.RETURN)
-        
-        print("Esperando resultados de búsqueda...")
-        first_results = wait.until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "#search .g a"))
-        )[:2]
 
-        first_link = first_results[0].get_attribute('href')
+        logger.debug("Esperando resultados de búsqueda...")
+        wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "#search .g a")))
+        # Se leen una sola vez: nunca se vuelve a la página de resultados
+        return driver.execute_script(_RESULT_LINKS)[:config.VERIFY_PRODUCT_TOP_K]
 
-        if not verification_word:
-            print(f"Retornando primer link: {first_link}")
-            return {"status": "success", "link": first_link}
-        
-        print(f"Verificando palabra clave: {verification_word}")
-        for i, result in enumerate(first_results, 1):
+
+def verify_links_http(links: List[str], word: str) -> Optional[int]:
+    """Posición del primer enlace (en terminar) cuya página, leída por HTTP, contiene la palabra."""
+    stop = threading.Event()
+
+    def check(link):
+        with metrics.endpoint("verify_product"):
             try:
-                link = result.get_attribute('href')
-                print(f"Analizando link #{i}: {link}")
-                result.click()
-                
-                wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                
-                page_text = driver.find_element(By.TAG_NAME, "body").text.lower()
-                
-                if verification_word.lower() in page_text:
-                    print(f"Palabra clave encontrada en link #{i}")
-                    return {
-                        "status": "success", 
-                        "message": f"Palabra '{verification_word}' encontrada en el link #{i}", 
-                        "link": link
-                    }
-                
-                print(f"Palabra clave no encontrada en link #{i}, regresando a resultados...")
-                driver.back()
-                wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "#search .g a")))
-                
+                with metrics.stage("http_fast_path"):
+                    return verify_engine.contains(link, word, stop)
             except Exception as e:
-                print(f"Error al procesar el link #{i}: {str(e)}")
-                traceback.print_exc()
-                continue
-        
-        print("Palabra clave no encontrada en ningún resultado")
+                logger.info("Verificación por HTTP de %s falló: %s", link, e, extra=logs.SAMPLED)
+                return False
+
+    executor = ThreadPoolExecutor(max_workers=len(links), thread_name_prefix="verify-http")
+    try:
+        futures = {
+            executor.submit(contextvars.copy_context().run, check, link): index
+            for index, link in enumerate(links)
+        }
+        for future in as_completed(futures):
+            if future.result():
+                return futures[future]
+        return None
+    finally:
+        # Las lecturas que sigan en curso ven stop y cortan en el siguiente bloque
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def page_contains(driver, link: str, word: str) -> bool:
+    try:
+        load_page(driver, link)
+        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        return bool(driver.execute_script(_BODY_CONTAINS, word.lower()))
+    except Exception as e:
+        logger.info("Error al procesar %s: %s", link, e, extra=logs.SAMPLED)
+        return False
+
+
+def verify_links_in_browser(links: List[str], word: str, driver) -> Optional[int]:
+    """Revisa ``links`` a la vez en ``driver`` y en los navegadores libres; vuelve con la primera coincidencia.
+
+    Se hace cargo de ``driver``: cada hilo devuelve su navegador al pool al
+    terminar, aunque la función ya haya vuelto. Las cargas pendientes no
+    empiezan y las de CDP en curso se cortan.
+    """
+    drivers = [driver]
+    # Los navegadores adicionales solo se toman si están libres en este momento
+    for _ in range(min(config.VERIFY_PRODUCT_PARALLELISM, len(links)) - 1):
+        try:
+            drivers.append(lease_driver("verify_product", timeout=0))
+        except HTTPException:
+            break
+    logger.debug("Verificando %d enlaces con %d navegadores.", len(links), len(drivers))
+
+    pending = queue.Queue()
+    for entry in enumerate(links):
+        pending.put(entry)
+    checked = queue.Queue()
+    stop = threading.Event()
+
+    def work(driver):
+        with metrics.endpoint("verify_product"):
+            try:
+                while not stop.is_set():
+                    try:
+                        index, link = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    checked.put((index, page_contains(driver, link, word)))
+            finally:
+                release_driver(driver)
+                checked.put(None)
+
+    executor = ThreadPoolExecutor(max_workers=len(drivers), thread_name_prefix="verify-product")
+    for worker_driver in drivers:
+        executor.submit(contextvars.copy_context().run, work, worker_driver)
+    executor.shutdown(wait=False)
+
+    running = len(drivers)
+    while running:
+        entry = checked.get()
+        if entry is None:
+            running -= 1
+        elif entry[1]:
+            stop.set()
+            for other in drivers:
+                if isinstance(other, CdpDriver) and not other.closed:
+                    other.stop_loading()
+            return entry[0]
+    return None
+
+
+def scrape_google_search(search_query: str, verification_word: Optional[str] = None):
+    driver = lease_driver("verify_product")
+
+    try:
+        logger.info("Realizando búsqueda: %s", search_query)
+        links = google_result_links(driver, search_query)
+        if not links:
+            raise WebDriverException("La búsqueda no devolvió enlaces")
+        first_link = links[0]
+
+        if not verification_word:
+            logger.info("Retornando primer link: %s", first_link)
+            return {"status": "success", "link": first_link}
+
+        logger.debug("Verificando palabra clave en %d links: %s", len(links), verification_word)
+        index = verify_links_http(links, verification_word) if verify_engine is not None else None
+        if index is None:
+            if verify_engine is not None:
+                metrics.count_fallback("verify_http")
+            browser, driver = driver, None
+            index = verify_links_in_browser(links, verification_word, browser)
+
+        if index is not None:
+            logger.info("Palabra clave encontrada en link #%d", index + 1)
+            return {
+                "status": "success",
+                "message": f"Palabra '{verification_word}' encontrada en el link #{index + 1}",
+                "link": links[index]
+            }
+
+        logger.info("Palabra clave no encontrada en ningún resultado")
         return {
             "status": "not_found",
             "message": "No se encontró la palabra clave en los resultados",
             "link": first_link
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error durante el scraping: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error durante el scraping: %s", e)
         raise HTTPException(status_code=500, detail=f"Error durante la búsqueda: {str(e)}")
     
     finally:
-        driver.quit()
-        print("Navegador cerrado.")
+        if driver is not None:
+            release_driver(driver)
 
 @app.post("/verify_product")
-async def verify_product_endpoint(search_input: SearchInput):
+async def verify_product_endpoint(search_input: SearchInput, request: Request, response: Response):
     try:
-        print(f"Solicitud recibida para verify_product: {search_input.search_query}")
-        result = scrape_google_search(search_input.search_query, search_input.verification_word)
-        print("Respuesta enviada exitosamente.")
+        logger.info("Solicitud recibida para verify_product: %s", search_input.search_query)
+        result = await cached_scrape(
+            request, response, "verify_product", search_input.model_dump(),
+            scrape_google_search, search_input.search_query, search_input.verification_word
+        )
+        logger.info("Respuesta enviada exitosamente.")
         return result
     except HTTPException as http_exc:
-        print(f"HTTPException: {http_exc.detail}")
+        logger.warning("HTTPException: %s", http_exc.detail)
         raise http_exc
     except Exception as e:
-        print(f"Excepción no manejada: {e}")
-        traceback.print_exc()
+        logger.exception("Excepción no manejada: %s", e)
         raise HTTPException(status_code=500, detail=f"Error inesperado: {str(e)}")
 
 
 # ------------------- NUEVO ENDPOINT -------------------
 
+@metrics.timed()
 def extract_image_src(driver):
     try:
         modal_div = WebDriverWait(driver, 5).until(
@@ -430,24 +1171,24 @@ def extract_image_src(driver):
         )
         first_image = modal_div.find_element(By.TAG_NAME, "img")
         image_src = first_image.get_attribute("src")
-        print(f"URL de la imagen encontrada: {image_src}")
+        logger.debug("URL de la imagen encontrada: %s", image_src)
         return image_src
     except Exception as e:
-        print(f"Error al extraer la imagen: {e}")
+        logger.info("Error al extraer la imagen: %s", e, extra=logs.SAMPLED)
         return None    
 
 def search_in_google_images(query, driver):
     try:
-        driver.get("https://www.google.com/imghp")
-        search_box = WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.NAME, "q"))
-        )
-        search_box.send_keys(query)
-        search_box.send_keys(Keys.RETURN)
-        
-        WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.ID, "rso"))
-        )
+        with throttled_visit(driver, config.GOOGLE_IMAGES_URL):
+            search_box = WebDriverWait(driver, 5).until(
+                EC.presence_of_element_located((By.NAME, "q"))
+            )
+            search_box.send_keys(query)
+            search_box.send_keys(Keys.RETURN)
+
+            WebDriverWait(driver, 5).until(
+                EC.presence_of_element_located((By.ID, "rso"))
+            )
 
         rso_div = driver.find_element(By.ID, "rso")
         first_img = rso_div.find_element(By.TAG_NAME, "img")
@@ -455,56 +1196,60 @@ def search_in_google_images(query, driver):
 
         image_link = extract_image_src(driver)
         return image_link
+    except HTTPException:
+        # Límite del host (503): no es un "sin imagen" que deba cachearse
+        raise
     except Exception as e:
-        print(f"Error al buscar en Google Imágenes para '{query}': {e}")
+        logger.info("Error al buscar en Google Imágenes para '%s': %s", query, e, extra=logs.SAMPLED)
         return None
 
-def get_costco_image_link(query, driver):
+def read_costco_image(driver):
     try:
-        driver.get("https://www.google.com")
-        
-        search_box = WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.NAME, "q"))
-        )
-        search_box.send_keys(query)
-        search_box.send_keys(Keys.RETURN)
-
         WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "h3"))
+            EC.presence_of_element_located((By.XPATH, "//img[@alt='Product Preview 1']"))
         )
+    except Exception:
+        pass
+    images = driver.find_elements(By.XPATH, "//img[@alt='Product Preview 1']")
 
-        first_result = driver.find_element(By.CSS_SELECTOR, "h3")
-        first_result.click()
+    if not images:
+        logger.info("No se encontró 'Product Preview 1' en Costco.", extra=logs.SAMPLED)
+        return None
 
-        time.sleep(1)
-        images = driver.find_elements(By.XPATH, "//img[@alt='Product Preview 1']")
-        
-        if not images:
-            print("No se encontró 'Product Preview 1' en Costco.")
-            return None
-        
-        largest_canvas = 0
-        largest_canvas_link = None
-        
-        for img in images:
-            src = img.get_attribute("src")
-            canvas_match = re.search(r"canvas=(\d+),(\d+)", src)
-            if canvas_match:
-                width, height = map(int, canvas_match.groups())
-                canvas_size = width * height
-                if canvas_size > largest_canvas:
-                    largest_canvas = canvas_size
-                    largest_canvas_link = src
-        
-        return largest_canvas_link
-    except Exception as e:
-        print(f"Error al procesar el query '{query}' para Costco: {e}")
+    return largest_canvas_link(img.get_attribute("src") for img in images)
+
+def read_amazon_image(driver):
+    try:
+        landing_image = WebDriverWait(driver, 5).until(
+            EC.presence_of_element_located((By.XPATH, "//img[@data-a-image-name='landingImage']"))
+        )
+        data_dynamic_image = landing_image.get_attribute("data-a-dynamic-image")
+        return largest_dynamic_image(data_dynamic_image)
+    except:
+        logger.info("No se encontró la imagen 'landingImage' en Amazon.", extra=logs.SAMPLED)
         return None
 
-def get_amazon_image_link(query, driver):
+def read_target_image(driver):
     try:
-        driver.get("https://www.google.com")
-        
+        img = WebDriverWait(driver, 5).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "div[tabindex='-1'] img"))
+        )
+        srcset = img.get_attribute("srcset")
+        if not srcset:
+            return img.get_attribute("src")
+        return widest_srcset(srcset) or img.get_attribute("src")
+    except:
+        logger.info("No se encontró la imagen en Target.", extra=logs.SAMPLED)
+        return None
+
+RETAILER_IMAGE_READERS = {
+    "costco": read_costco_image,
+    "amazon": read_amazon_image,
+    "target": read_target_image,
+}
+
+def open_via_google(query, driver):
+    with throttled_visit(driver, config.GOOGLE_URL):
         search_box = WebDriverWait(driver, 5).until(
             EC.presence_of_element_located((By.NAME, "q"))
         )
@@ -515,119 +1260,356 @@ def get_amazon_image_link(query, driver):
             EC.presence_of_element_located((By.CSS_SELECTOR, "h3"))
         )
 
-        first_result = driver.find_element(By.CSS_SELECTOR, "h3")
-        first_result.click()
-        time.sleep(1)
+    first_result = driver.find_element(By.CSS_SELECTOR, "h3")
+    click_and_wait_for_navigation(driver, first_result)
 
-        try:
-            landing_image = driver.find_element(By.XPATH, "//img[@data-a-image-name='landingImage']")
-            data_dynamic_image = landing_image.get_attribute("data-a-dynamic-image")
-            image_dict = json.loads(data_dynamic_image)
-            
-            largest_area = 0
-            largest_url = None
-            
-            for url, dims in image_dict.items():
-                w, h = dims
-                area = w * h
-                if area > largest_area:
-                    largest_area = area
-                    largest_url = url
-            
-            return largest_url
-        except:
-            print("No se encontró la imagen 'landingImage' en Amazon.")
-            return None
+def get_google_result_image_link(store: str, query, driver):
+    """Ruta original: primer resultado de Google y lectura de la ficha."""
+    try:
+        open_via_google(query, driver)
+        return RETAILER_IMAGE_READERS[store](driver)
+    except HTTPException:
+        # Límite del host (503): no es un "sin imagen" que deba cachearse
+        raise
     except Exception as e:
-        print(f"Error al procesar el query '{query}' para Amazon: {e}")
+        logger.info("Error al procesar el query '%s' para %s: %s", query, store, e, extra=logs.SAMPLED)
         return None
 
-def get_target_image_link(query, driver):
+def open_search_result(driver, store: str):
+    # La búsqueda por número de artículo o UPC a veces redirige directo a la ficha
     try:
-        driver.get("https://www.google.com")
-        
-        search_box = WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.NAME, "q"))
+        first_result = WebDriverWait(driver, 5).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_RESULT_SELECTORS[store]))
         )
-        search_box.send_keys(query)
-        search_box.send_keys(Keys.RETURN)
+    except TimeoutException:
+        return
+    click_and_wait_for_navigation(driver, first_result)
 
-        WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "h3"))
-        )
+def get_direct_image_link(store: str, item: StoreDataItem, driver):
+    """Imagen desde la ficha resuelta sin Google (índice, identificador o búsqueda de la tienda)."""
+    for candidate in product_resolver.candidates(store, item):
+        try:
+            load_page(driver, candidate.url)
+            if candidate.kind == SEARCH:
+                open_search_result(driver, store)
+            link = RETAILER_IMAGE_READERS[store](driver)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.info("Error al abrir %s en %s: %s", candidate.url, store, e, extra=logs.SAMPLED)
+            link = None
+        if link:
+            logger.debug("Ficha de %s resuelta por %s: %s", store, candidate.kind, driver.current_url)
+            product_resolver.remember(store, item, driver.current_url)
+            return link
+        if candidate.kind == INDEXED:
+            product_resolver.forget(store, item)
+    return None
+
+
+def get_http_image_link(store: str, item: StoreDataItem):
+    """Imagen leyendo la ficha por HTTP; None si la ficha necesita el navegador."""
+    for candidate in product_resolver.candidates(store, item):
+        try:
+            with metrics.stage("http_fast_path"):
+                product_url, link = retailer_engine.image_link(store, candidate.url, search=candidate.kind == SEARCH)
+        except throttle.Throttled as e:
+            raise throttled_error(e)
+        except Exception as e:
+            logger.info("Ficha de %s por HTTP falló (%s): %s", store, candidate.url, e, extra=logs.SAMPLED)
+            continue
+        if link:
+            product_resolver.remember(store, item, product_url)
+            return link
+    return None
 
-        first_result = driver.find_element(By.CSS_SELECTOR, "h3")
-        first_result.click()
-        time.sleep(1)
 
-        try:
-            img = driver.find_element(By.CSS_SELECTOR, "div[tabindex='-1'] img")
-            srcset = img.get_attribute("srcset")
-            if not srcset:
-                return img.get_attribute("src")
-            
-            candidates = srcset.split(",")
-            max_width = 0
-            best_url = None
-            for candidate in candidates:
-                parts = candidate.strip().split(" ")
-                if len(parts) == 2:
-                    url, size = parts
-                    if size.endswith("w"):
-                        width = int(size.replace("w", ""))
-                        if width > max_width:
-                            max_width = width
-                            best_url = url
-            return best_url if best_url else img.get_attribute("src")
-        except:
-            print("No se encontró la imagen en Target.")
-            return None
-    except Exception as e:
-        print(f"Error al procesar el query '{query}' para Target: {e}")
-        return None
+def product_image_name(item: StoreDataItem):
+    return f"{item.Model or 'UnknownModel'}_{item.Item_Description or 'UnknownDescription'}_{item.Unit_Retail or 'UnknownPrice'}_{item.Brand or 'UnknownBrand'}"
 
 
-@app.post("/product_images")
-async def product_images_endpoint(payload: StoreDataInput):
-    store = payload.store
-    data = payload.data
-
-    chrome_options = webdriver.ChromeOptions()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-    results = []
-    try:
-        for item in data:
-            description = item.Item_Description
-            query = f"{description} {store}"
-            print(f"Buscando: {query}")
+def scrape_product_image(store: str, item: StoreDataItem, driver):
+    description = item.Item_Description
+    query = f"{description} {store}"
+    logger.debug("Buscando: %s", query)
 
-            if store.lower() == "costco":
-                link = get_costco_image_link(query, driver)
-                if not link:
-                    link = search_in_google_images(query, driver)
-            elif store.lower() == "amazon":
-                link = get_amazon_image_link(query, driver)
-                if not link:
-                    link = search_in_google_images(query, driver)
-            elif store.lower() == "target":
-                link = get_target_image_link(query, driver)
+    source = None
+    try:
+        store_key = store.lower()
+        if store_key in RETAILER_IMAGE_READERS:
+            link = None
+            if product_resolver is not None and product_resolver.supports(store_key):
+                link = get_direct_image_link(store_key, item, driver)
+                source = SOURCE_RETAILER
                 if not link:
-                    link = search_in_google_images(query, driver)
-            else:
-                # Si no es Costco, Amazon ni Target, buscar directamente en Google Images
+                    metrics.count_fallback("google_search")
+            if not link:
+                link = get_google_result_image_link(store_key, query, driver)
+                source = SOURCE_GOOGLE_SEARCH
+                if link and product_resolver is not None:
+                    product_resolver.remember(store_key, item, driver.current_url)
+            if not link:
+                metrics.count_fallback("google_images")
                 link = search_in_google_images(query, driver)
-            
-            results.append({
-                "name": f"{item.Model or 'UnknownModel'}_{description or 'UnknownDescription'}_{item.Unit_Retail or 'UnknownPrice'}_{item.Brand or 'UnknownBrand'}",
-                "image_link": link
-    })
+                source = SOURCE_GOOGLE_IMAGES
+        else:
+            # Si no es Costco, Amazon ni Target, buscar directamente en Google Images
+            link = search_in_google_images(query, driver)
+            source = SOURCE_GOOGLE_IMAGES
+        error = None
+    except Exception as e:
+        # Un ítem fallido no debe tumbar el lote completo
+        logger.exception("Error al procesar '%s': %s", query, e)
+        link = None
+        error = str(e)
+
+    result = {
+        "name": product_image_name(item),
+        "image_link": link
+    }
+    if error:
+        result["error"] = error
+    return result, source
+
+
+def scrape_product_images(store: str, data: List[StoreDataItem],
+                          progress: Optional[Callable[[int, int], None]] = None,
+                          on_result: Optional[Callable[[int, Dict[str, Any]], bool]] = None,
+                          read: bool = True, write: bool = True, max_age: Optional[float] = None):
+    # Los ítems se reparten entre varios navegadores mediante una cola compartida;
+    # cada resultado se guarda en su posición para conservar el orden de entrada.
+    # Con on_result cada resultado se entrega al terminar y no se acumula nada;
+    # si on_result devuelve False (cliente desconectado) se deja de procesar.
+    # read/write/max_age vienen de Cache-Control y rigen el índice de imágenes.
+    results: List[Optional[Dict[str, Any]]] = [] if on_result else [None] * len(data)
+    stopped = threading.Event()
+
+    def deliver(index: int, result: Dict[str, Any]):
+        if on_result is None:
+            results[index] = result
+        elif on_result(index, result) is False:
+            stopped.set()
+
+    pending = queue.Queue()
+    for index, item in enumerate(data):
+        found, link, _ = (
+            image_index.lookup(store, item, max_age) if image_index is not None and read else (False, None, None)
+        )
+        if image_index is not None and read:
+            metrics.count_cache("product_image", "MISS" if not found else "HIT" if link else "NEGATIVE")
+        if found:
+            deliver(index, {"name": product_image_name(item), "image_link": link})
+        else:
+            pending.put((index, item))
+    completed = [len(data) - pending.qsize()]
+    completed_lock = threading.Lock()
+    if progress:
+        progress(completed[0], len(data))
+
+    def finish(index: int, item: StoreDataItem, result: Dict[str, Any], source: Optional[str]):
+        # Los errores (límite del host, navegador caído) no se guardan: el ítem se reintenta
+        if image_index is not None and write and "error" not in result:
+            image_index.save(store, item, result["image_link"], source)
+        deliver(index, result)
+        with completed_lock:
+            completed[0] += 1
+            if progress:
+                progress(completed[0], len(data))
+
+    # Las fichas que se leen por HTTP no ocupan navegador; el resto queda para Selenium
+    store_key = store.lower()
+    if retailer_engine is not None and store_key in retailer_engine.STORES and not pending.empty():
+        http_pending = []
+        while not pending.empty():
+            http_pending.append(pending.get_nowait())
+
+        def fetch(entry):
+            with metrics.endpoint("product_images"):
+                try:
+                    return get_http_image_link(store_key, entry[1])
+                except Exception as e:
+                    logger.info("Ficha por HTTP no disponible: %s", e, extra=logs.SAMPLED)
+                    return None
+
+        workers = min(config.PRODUCT_IMAGES_HTTP_PARALLELISM, len(http_pending))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="product-images-http") as executor:
+            futures = {
+                executor.submit(contextvars.copy_context().run, fetch, entry): entry for entry in http_pending
+            }
+            for future in as_completed(futures):
+                index, item = futures[future]
+                link = future.result()
+                if link and not stopped.is_set():
+                    finish(index, item, {"name": product_image_name(item), "image_link": link}, SOURCE_RETAILER_HTTP)
+                elif not link:
+                    metrics.count_fallback("retailer_http")
+                    pending.put((index, item))
+
+    if pending.empty() or stopped.is_set():
+        return results
+
+    drivers = [lease_driver("product_images")]
+    # Los navegadores adicionales solo se toman si están libres en este momento
+    for _ in range(min(config.PRODUCT_IMAGES_PARALLELISM, pending.qsize()) - 1):
+        try:
+            drivers.append(lease_driver("product_images", timeout=0))
+        except HTTPException:
+            break
+    logger.info("Procesando %d ítems con %d navegadores.", pending.qsize(), len(drivers))
+
+    def work(driver):
+        with metrics.endpoint("product_images"):
+            try:
+                first = True
+                while not stopped.is_set():
+                    try:
+                        index, item = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    if not first:
+                        # Cada ítem en su propio contexto: no arrastra cookies del anterior
+                        try:
+                            driver = renew_driver("product_images", driver)
+                        except Exception as e:
+                            logger.warning("No se pudo abrir un contexto nuevo: %s", e)
+                            pending.put((index, item))
+                            return
+                    first = False
+                    finish(index, item, *scrape_product_image(store, item, driver))
+            finally:
+                release_driver(driver)
+
+    # Cada hilo corre en una copia del contexto para conservar el ID de correlación
+    with ThreadPoolExecutor(max_workers=len(drivers), thread_name_prefix="product-images") as executor:
+        list(executor.map(lambda driver: contextvars.copy_context().run(work, driver), drivers))
+
+    # Ítems que quedaron sin navegador (todos fallaron al renovar su contexto)
+    while not stopped.is_set() and not pending.empty():
+        index, item = pending.get_nowait()
+        finish(index, item, {"name": product_image_name(item), "image_link": None,
+                             "error": "Navegador no disponible"}, None)
+
+    return results
+
+
+def scrape_product_images_stream(store: str, data: List[StoreDataItem], policy: Dict[str, Any], emit):
+    scrape_product_images(store, data, on_result=lambda index, result: emit({"index": index, **result}),
+                          **policy)
 
-    finally:
-        driver.quit()
 
+@app.post("/product_images")
+async def product_images_endpoint(payload: StoreDataInput, request: Request):
+    policy = cache_policy(request)
+    fmt = stream_format(request)
+    if fmt:
+        items = await stream_scraper(
+            "product_images", scrape_product_images_stream, payload.store, payload.data, policy
+        )
+        return streaming_response(items, fmt)
+    results = await run_scraper("product_images", scrape_product_images, payload.store, payload.data, **policy)
     return {"results": results}
+
+
+
+# ------------------- TRABAJOS ASÍNCRONOS -------------------
+
+def run_scrape_direccion_job(payload: Dict[str, Any], progress):
+    direccion = DireccionInput(**payload)
+    resultados = cached_call(
+        "scrape_direccion", {"direccion": direccion.direccion},
+        scrape_direccion, direccion.direccion, progress
+    )
+    return {"resultados": resultados}
+
+def run_product_images_job(payload: Dict[str, Any], progress):
+    store_data = StoreDataInput(**payload)
+    with metrics.endpoint("product_images"), metrics.stage("total"):
+        return {"results": scrape_product_images(store_data.store, store_data.data, progress)}
+
+job_manager.register("scrape_direccion", run_scrape_direccion_job)
+job_manager.register("product_images", run_product_images_job)
+
+
+async def get_job_or_404(job_id: str):
+    # El almacén de trabajos es SQLite o Redis: fuera del event loop
+    row = await asyncio.to_thread(job_manager.store.get, job_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo {job_id} no encontrado o expirado")
+    return row
+
+@app.post("/jobs/scrape_direccion", status_code=202)
+async def submit_scrape_direccion_job(direccion: DireccionInput):
+    job_id = await asyncio.to_thread(job_manager.submit, "scrape_direccion", direccion.model_dump())
+    return {"job_id": job_id, "status": "queued"}
+
+@app.post("/jobs/product_images", status_code=202)
+async def submit_product_images_job(payload: StoreDataInput):
+    job_id = await asyncio.to_thread(job_manager.submit, "product_images", payload.model_dump())
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}")
+async def get_job_endpoint(job_id: str):
+    return job_status(await get_job_or_404(job_id))
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result_endpoint(job_id: str):
+    row = await get_job_or_404(job_id)
+    if row["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"El trabajo falló: {row['error']}")
+    if row["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"El trabajo aún no termina (estado: {row['status']})")
+    return json.loads(row["result"])
+
+
+@app.get("/cache/stats")
+async def cache_stats_endpoint():
+    return await asyncio.to_thread(result_cache.stats)
+
+
+def image_index_or_404():
+    if image_index is None:
+        raise HTTPException(status_code=404, detail="Índice de imágenes desactivado")
+    return image_index
+
+
+@app.get("/product_images/index/stats")
+async def image_index_stats_endpoint():
+    return await asyncio.to_thread(image_index_or_404().stats)
+
+
+@app.get("/product_images/index/export")
+async def image_index_export_endpoint(include_misses: bool = False):
+    index = image_index_or_404()
+    lines = (json.dumps(entry, ensure_ascii=False) + "\n" for entry in index.export(include_misses))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@app.post("/product_images/index/import")
+async def image_index_import_endpoint(request: Request):
+    # NDJSON (como el que devuelve /export) o una lista JSON; cada fila trae
+    # ident o store + campos del ítem, e image_link (vacío = sin imagen)
+    index = image_index_or_404()
+    body = (await request.body()).decode("utf-8")
+    try:
+        stripped = body.strip()
+        if stripped.startswith("["):
+            entries = json.loads(stripped)
+        else:
+            entries = [json.loads(line) for line in stripped.splitlines() if line.strip()]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Cuerpo inválido: {str(e)}")
+    imported = await asyncio.to_thread(index.import_entries, entries)
+    logger.info("Índice de imágenes: %d identificadores importados", imported)
+    return {"imported": imported}
+
+
+@app.get("/throttle/stats")
+async def throttle_stats_endpoint():
+    return throttle.stats()
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    if not metrics.enabled():
+        raise HTTPException(status_code=404, detail="Métricas desactivadas")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
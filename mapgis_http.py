@@ -0,0 +1,167 @@
+"""Consulta de MapGIS por HTTP directo, sin navegador.
+
+Reproduce las peticiones que hace la utilidad ``frmUtilidad53``: la búsqueda
+de la dirección (que devuelve el CBML) y la consulta de cada capa. Las URLs se
+configuran con plantillas porque son internas de MapGIS y pueden cambiar; si
+algo no cuadra se lanza ``MapgisHttpError`` y el llamador vuelve a Selenium.
+"""
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+
+from http_client import build_http_session
+
+
+class MapgisHttpError(Exception):
+    """La respuesta de MapGIS no tiene la forma esperada."""
+
+
+class _UtilidadParser(HTMLParser):
+    """Radios de capas (id, value), valor de ``strCbml``, aviso ``noDatos`` y filas de ``table#res0``."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.radios: List[Tuple[str, str]] = []
+        self.cbml: Optional[str] = None
+        self.no_datos = False
+        self.rows: Optional[List[List[str]]] = None
+        self._in_table = False
+        self._in_tbody = False
+        self._row: Optional[List[str]] = None
+        self._cell: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "input":
+            if attrs.get("type") == "radio" and attrs.get("id"):
+                self.radios.append((attrs["id"], attrs.get("value") or ""))
+            elif attrs.get("id") == "strCbml":
+                self.cbml = attrs.get("value") or None
+        elif attrs.get("id") == "noDatos":
+            style = (attrs.get("style") or "").replace(" ", "").lower()
+            self.no_datos = "display:none" not in style
+        elif tag == "table" and attrs.get("id") == "res0":
+            self._in_table = True
+            self.rows = []
+        elif self._in_table and tag == "tbody":
+            self._in_tbody = True
+        elif self._in_tbody and tag == "tr":
+            self._row = []
+        elif self._row is not None and tag == "td":
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self._cell is not None:
+            self._row.append(re.sub(r"\s+", " ", "".join(self._cell)).strip())
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+        elif tag == "tbody":
+            self._in_tbody = False
+        elif tag == "table" and self._in_table:
+            self._in_table = False
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def _parse(html: str) -> _UtilidadParser:
+    parser = _UtilidadParser()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+def _find_key(data: Any, names: Tuple[str, ...]) -> Optional[Any]:
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key.lower() in names and value not in (None, ""):
+                return value
+        for value in data.values():
+            found = _find_key(value, names)
+            if found is not None:
+                return found
+    elif isinstance(data, list):
+        for value in data:
+            found = _find_key(value, names)
+            if found is not None:
+                return found
+    return None
+
+
+class MapgisHttpEngine:
+    """Motor HTTP de MapGIS que produce el mismo ``resultados`` que el scraper Selenium."""
+
+    def __init__(self, utilidad_url: str, search_url: str, layer_url: str,
+                 timeout: float = 15, parallelism: int = 5, session: Optional[requests.Session] = None):
+        self.utilidad_url = utilidad_url
+        self.search_url = search_url
+        self.layer_url = layer_url
+        self.timeout = timeout
+        self.parallelism = parallelism
+        self.session = session or build_http_session(pool_size=parallelism * 2)
+        self._capas: Optional[List[Tuple[str, str]]] = None
+        self._lock = threading.Lock()
+
+    def _get(self, url: str) -> requests.Response:
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def capas(self) -> List[Tuple[str, str]]:
+        # La lista de capas (id del radio, valor) cambia muy poco: se lee una vez
+        with self._lock:
+            if self._capas is None:
+                radios = _parse(self._get(self.utilidad_url).text).radios
+                if not radios:
+                    raise MapgisHttpError("La utilidad de MapGIS no tiene capas")
+                self._capas = sorted(radios, key=lambda radio: int(radio[0]) if radio[0].isdigit() else 0)
+            return self._capas
+
+    def buscar_cbml(self, direccion: str) -> str:
+        response = self._get(self.search_url.format(direccion=quote(direccion)))
+        cbml = None
+        if "json" in response.headers.get("Content-Type", ""):
+            cbml = _find_key(response.json(), ("cbml", "strcbml"))
+        else:
+            cbml = _parse(response.text).cbml
+        if not cbml:
+            raise MapgisHttpError(f"MapGIS no devolvió CBML para {direccion}")
+        return str(cbml)
+
+    def consultar_capa(self, cbml: str, capa_id: str, capa_valor: str) -> Optional[List[str]]:
+        response = self._get(self.layer_url.format(cbml=quote(cbml), id=quote(capa_id), capa=quote(capa_valor)))
+        if "json" in response.headers.get("Content-Type", ""):
+            rows = response.json()
+            if not rows:
+                return None
+            if not isinstance(rows, list):
+                raise MapgisHttpError(f"Respuesta inesperada para la capa {capa_valor}")
+            return [" | ".join(str(cell) for cell in (row.values() if isinstance(row, dict) else row)) for row in rows]
+        page = _parse(response.text)
+        if page.no_datos:
+            return None
+        if page.rows is None:
+            raise MapgisHttpError(f"La capa {capa_valor} no tiene tabla res0")
+        return [" | ".join(row) for row in page.rows]
+
+    def scrape(self, direccion: str,
+               on_layer: Optional[Callable[[str, List[str]], Any]] = None) -> Dict[str, List[str]]:
+        cbml = self.buscar_cbml(direccion)
+        capas = self.capas()
+        with ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="mapgis-http") as executor:
+            tablas = list(executor.map(lambda capa: self.consultar_capa(cbml, *capa), capas))
+        resultados = {}
+        for (_, capa_valor), tabla in zip(capas, tablas):
+            if tabla is not None:
+                resultados[capa_valor] = tabla
+                if on_layer:
+                    on_layer(capa_valor, tabla)
+        return resultados
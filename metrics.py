@@ -0,0 +1,261 @@
+"""Métricas Prometheus y trazas por etapa del scraping.
+
+Cada etapa (préstamo y arranque del navegador, carga de página, cada espera
+con nombre, extracción…) se mide con ``stage`` o ``timed`` y se acumula en
+el histograma ``scraper_stage_seconds{endpoint, stage}``. El endpoint se toma
+del hilo actual (``endpoint``), así que las funciones auxiliares no necesitan
+recibirlo. ``render`` produce el formato de texto de Prometheus sin depender
+de ``prometheus_client``.
+
+Con las métricas desactivadas ``stage`` devuelve un contexto vacío y los
+contadores retornan de inmediato. Las trazas usan OpenTelemetry solo si está
+instalado y se activan aparte.
+"""
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional, Tuple
+
+from selenium.common.exceptions import TimeoutException
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+UNKNOWN_ENDPOINT = "-"
+
+_NOOP = nullcontext()
+_local = threading.local()
+_enabled = True
+_tracer = None
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, labels, value
+
+
+class Gauge(Counter):
+    def set(self, labels: Tuple[str, ...], value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [conteo por bucket (no acumulado), suma, total]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(entry[0]), entry[1], entry[2]) for labels, entry in self._values.items()}
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", labels + (_format_value(bound),), cumulative
+            yield f"{self.name}_bucket", labels + ("+Inf",), count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+STAGE_SECONDS = Histogram(
+    "scraper_stage_seconds", "Duración de cada etapa del scraping", ("endpoint", "stage"),
+)
+TIMEOUTS = Counter(
+    "scraper_timeouts_total", "Esperas o etapas que agotaron su tiempo", ("endpoint", "stage"),
+)
+FALLBACKS = Counter(
+    "scraper_fallbacks_total", "Veces que se recurrió a la ruta alternativa", ("endpoint", "fallback"),
+)
+CACHE_RESULTS = Counter(
+    "scraper_cache_total", "Consultas a la caché de resultados por resultado", ("endpoint", "result"),
+)
+HOST_CONCURRENCY_LIMIT = Gauge(
+    "scraper_host_concurrency_limit", "Límite de concurrencia adaptativo actual por host", ("host",),
+)
+HOST_IN_FLIGHT = Gauge(
+    "scraper_host_in_flight", "Visitas en curso por host", ("host",),
+)
+HOST_THROTTLED = Counter(
+    "scraper_host_throttled_total", "Bloqueos, visitas lentas y esperas rechazadas por host", ("host", "reason"),
+)
+HOST_WAIT_SECONDS = Histogram(
+    "scraper_host_wait_seconds", "Espera por un turno del límite del host", ("host",),
+)
+METRICS = (
+    STAGE_SECONDS, TIMEOUTS, FALLBACKS, CACHE_RESULTS,
+    HOST_CONCURRENCY_LIMIT, HOST_IN_FLIGHT, HOST_THROTTLED, HOST_WAIT_SECONDS,
+)
+
+
+def configure(enabled: bool = True, tracing: bool = False, service_name: str = "selenium-fastapi"):
+    global _enabled, _tracer
+    _enabled = enabled
+    _tracer = None
+    if tracing:
+        if otel_trace is None:
+            logger.warning("Trazas desactivadas: opentelemetry no está instalado")
+        else:
+            _tracer = otel_trace.get_tracer(service_name)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def current_endpoint() -> str:
+    return getattr(_local, "endpoint", UNKNOWN_ENDPOINT)
+
+
+@contextmanager
+def endpoint(name: str):
+    """Asocia las métricas del hilo actual a ``name`` mientras dure el bloque."""
+    previous = getattr(_local, "endpoint", UNKNOWN_ENDPOINT)
+    _local.endpoint = name
+    try:
+        yield
+    finally:
+        _local.endpoint = previous
+
+
+class _Stage:
+    __slots__ = ("name", "started", "span")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.span = None
+
+    def __enter__(self):
+        if _tracer is not None:
+            self.span = _tracer.start_as_current_span(f"{current_endpoint()}.{self.name}")
+            self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = (current_endpoint(), self.name)
+        STAGE_SECONDS.observe(labels, time.perf_counter() - self.started)
+        if exc_type is not None and issubclass(exc_type, (TimeoutException, TimeoutError)):
+            TIMEOUTS.inc(labels)
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+def stage(name: str):
+    """Mide el bloque como la etapa ``name``; las excepciones de timeout cuentan como timeout."""
+    if not _enabled:
+        return _NOOP
+    return _Stage(name)
+
+
+def timed(name: Optional[str] = None):
+    """Decorador de ``stage``. Un resultado ``False`` (espera agotada sin lanzar) cuenta como timeout."""
+    def decorator(fn):
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Stage(stage_name):
+                result = fn(*args, **kwargs)
+            if result is False:
+                TIMEOUTS.inc((current_endpoint(), stage_name))
+            return result
+        return wrapper
+    return decorator
+
+
+def count_timeout(stage_name: str):
+    if _enabled:
+        TIMEOUTS.inc((current_endpoint(), stage_name))
+
+
+def count_fallback(fallback: str):
+    if _enabled:
+        FALLBACKS.inc((current_endpoint(), fallback))
+
+
+def count_cache(endpoint_name: str, result: str):
+    if _enabled:
+        CACHE_RESULTS.inc((endpoint_name, result))
+
+
+def set_host_limits(host: str, limit: int, in_flight: int):
+    if _enabled:
+        HOST_CONCURRENCY_LIMIT.set((host,), limit)
+        HOST_IN_FLIGHT.set((host,), in_flight)
+
+
+def count_throttle(host: str, reason: str):
+    if _enabled:
+        HOST_THROTTLED.inc((host, reason))
+
+
+def observe_throttle_wait(host: str, seconds: float):
+    if _enabled:
+        HOST_WAIT_SECONDS.observe((host,), seconds)
+
+
+def _format_value(value: float) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render() -> str:
+    """Todas las métricas en el formato de texto 0.0.4 de Prometheus."""
+    lines = []
+    for metric in METRICS:
+        if isinstance(metric, Histogram):
+            kind = "histogram"
+        else:
+            kind = "gauge" if isinstance(metric, Gauge) else "counter"
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {kind}")
+        for sample_name, labels, value in metric.samples():
+            labelnames = metric.labelnames + (("le",) if sample_name.endswith("_bucket") else ())
+            rendered = ",".join(f'{key}="{_escape(label)}"' for key, label in zip(labelnames, labels))
+            lines.append(f"{sample_name}{{{rendered}}} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,176 @@
+"""Resolución directa de la ficha de producto en Amazon, Costco y Target.
+
+En lugar de buscar en Google y hacer clic en el primer resultado, se arma la
+URL de la ficha a partir de los campos del ítem (TCIN en Target, ASIN en el
+campo ``Item`` para Amazon, número de artículo de Costco) o, sin ellos, la
+búsqueda propia de la tienda por UPC, modelo o descripción. La URL final de
+cada ficha encontrada se guarda en un índice SQLite por identificador, así
+que un ítem repetido va directo a su ficha sin ninguna búsqueda.
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import quote_plus
+
+import logs
+from cache import normalize
+
+logger = logging.getLogger(__name__)
+
+# Tipos de candidato
+INDEXED = "index"
+PRODUCT = "product"
+SEARCH = "search"
+
+# Primer resultado de la búsqueda propia de cada tienda
+SEARCH_RESULT_SELECTORS = {
+    "amazon": "div[data-component-type='s-search-result'] h2 a, div[data-asin] a.a-link-normal.s-no-outline",
+    "costco": "div.product-tile-set a, a[data-testid^='Link_product']",
+    "target": "a[data-test='product-title']",
+}
+
+_ASIN = re.compile(r"B0[0-9A-Z]{8}|\d{9}[\dX]")
+_COSTCO_ITEM = re.compile(r"\d{4,9}")
+_TCIN = re.compile(r"\d{6,10}")
+
+# Campos identificadores de StoreDataItem, del más fuerte al más débil
+IDENTIFIER_FIELDS = (("upc", "UPC"), ("tcin", "TCIN"), ("item", "Item"), ("model", "Model"))
+
+
+class Candidate(NamedTuple):
+    url: str
+    kind: str
+
+
+def _field(item, name: str) -> str:
+    return re.sub(r"\s+", "", str(getattr(item, name, None) or "")).upper()
+
+
+def item_keys(item) -> List[str]:
+    """Claves del ítem para los índices: identificadores presentes y, al final, la descripción."""
+    keys = [f"{prefix}:{_field(item, name)}" for prefix, name in IDENTIFIER_FIELDS if _field(item, name)]
+    description = normalize(getattr(item, "Item_Description", None) or "")
+    if description:
+        keys.append(f"desc:{description}")
+    return keys
+
+
+class ProductUrlIndex:
+    """Índice persistente (tienda, identificador) -> URL de la ficha."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path or ":memory:", check_same_thread=False)
+        with self._conn:
+            if db_path:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS product_urls (
+                    store TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (store, key)
+                )
+                """
+            )
+
+    def get(self, store: str, keys: List[str]) -> Optional[str]:
+        """URL guardada para la clave más fuerte que tenga entrada."""
+        if not keys:
+            return None
+        with self._lock:
+            rows = dict(self._conn.execute(
+                f"SELECT key, url FROM product_urls WHERE store = ? AND key IN ({','.join('?' * len(keys))})",
+                (store, *keys),
+            ).fetchall())
+        for key in keys:
+            if key in rows:
+                return rows[key]
+        return None
+
+    def put(self, store: str, keys: List[str], url: str):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO product_urls (store, key, url, updated_at) VALUES (?, ?, ?, ?)",
+                [(store, key, url, now) for key in keys],
+            )
+
+    def forget(self, store: str, keys: List[str]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM product_urls WHERE store = ? AND key = ?", [(store, key) for key in keys],
+            )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM product_urls").fetchone()[0]
+
+
+class ProductResolver:
+    """Arma las URLs candidatas de la ficha de un ítem, de la más barata a la más cara.
+
+    ``product_urls`` y ``search_urls`` son plantillas por tienda: la de ficha
+    recibe ``{id}`` (ASIN, número de artículo o TCIN) y la de búsqueda ``{query}``.
+    """
+
+    def __init__(self, index: ProductUrlIndex, product_urls: Dict[str, str], search_urls: Dict[str, str]):
+        self.index = index
+        self.product_urls = product_urls
+        self.search_urls = search_urls
+
+    def supports(self, store: str) -> bool:
+        return store in self.product_urls or store in self.search_urls
+
+    def _product_id(self, store: str, item) -> Optional[str]:
+        if store == "target":
+            tcin = _field(item, "TCIN")
+            return tcin if _TCIN.fullmatch(tcin) else None
+        if store == "amazon":
+            asin = _field(item, "Item")
+            return asin if _ASIN.fullmatch(asin) else None
+        if store == "costco":
+            number = _field(item, "Item")
+            return number if _COSTCO_ITEM.fullmatch(number) else None
+        return None
+
+    def _search_query(self, item) -> Optional[str]:
+        return (
+            _field(item, "UPC")
+            or (getattr(item, "Model", None) or "").strip()
+            or (getattr(item, "Item_Description", None) or "").strip()
+            or None
+        )
+
+    def candidates(self, store: str, item) -> List[Candidate]:
+        result = []
+        indexed = self.index.get(store, item_keys(item))
+        if indexed:
+            result.append(Candidate(indexed, INDEXED))
+        product_id = self._product_id(store, item)
+        if product_id and store in self.product_urls:
+            url = self.product_urls[store].format(id=quote_plus(product_id))
+            if url != indexed:
+                result.append(Candidate(url, PRODUCT))
+        query = self._search_query(item)
+        if query and store in self.search_urls:
+            result.append(Candidate(self.search_urls[store].format(query=quote_plus(query)), SEARCH))
+        return result
+
+    def remember(self, store: str, item, url: str):
+        self.index.put(store, item_keys(item), url)
+
+    def forget(self, store: str, item):
+        """La ficha guardada ya no sirve (producto retirado, URL cambiada)."""
+        logger.info("Ficha indexada sin imagen en %s, se olvida", store, extra=logs.SAMPLED)
+        self.index.forget(store, item_keys(item))
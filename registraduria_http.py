@@ -0,0 +1,152 @@
+"""Resultados de la Registraduría leyendo el JSON que consume la SPA, sin navegador.
+
+La SPA de preconteo descarga un índice de divisiones (municipios con su
+código) y un JSON de resultados por código. Las URLs se configuran con
+plantillas; los nombres de campo admitidos están en los ``*_KEYS`` de abajo.
+Si la respuesta no tiene la forma esperada se lanza ``RegistraduriaHttpError``
+y el llamador vuelve a Selenium.
+"""
+import logging
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+
+from http_client import build_http_session
+
+logger = logging.getLogger(__name__)
+
+
+NOMBRE_KEYS = ("nombre", "nom", "name", "desc", "n")
+CODIGO_KEYS = ("codigo", "cod", "code", "amb", "c")
+PORCENTAJE_KEYS = ("porcentaje", "pvot", "porc", "percent", "p")
+VOTOS_KEYS = ("votos", "vot", "votes", "v")
+PARTIDOS_KEYS = ("partidos", "agrupaciones", "part")
+CANDIDATOS_KEYS = ("candidatos", "cand", "candidates")
+
+
+class RegistraduriaHttpError(Exception):
+    """La respuesta de la Registraduría no tiene la forma esperada."""
+
+
+def normalize_nombre(nombre: str) -> str:
+    sin_tildes = unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sin_tildes.lower().replace("-", " ").split())
+
+
+def _field(obj: Dict[str, Any], keys: Tuple[str, ...]) -> Optional[Any]:
+    lowered = {str(key).lower(): value for key, value in obj.items()}
+    for key in keys:
+        if key in lowered and lowered[key] is not None:
+            return lowered[key]
+    return None
+
+
+def _find_list(data: Any, keys: Tuple[str, ...]) -> Optional[List[Any]]:
+    if isinstance(data, dict):
+        value = _field(data, keys)
+        if isinstance(value, list):
+            return value
+        for value in data.values():
+            found = _find_list(value, keys)
+            if found is not None:
+                return found
+    elif isinstance(data, list):
+        for value in data:
+            found = _find_list(value, keys)
+            if found is not None:
+                return found
+    return None
+
+
+def _walk_divisiones(data: Any, out: List[Tuple[str, str]]):
+    # El índice puede venir plano o anidado (departamento > municipio): se recogen
+    # todos los objetos que tengan nombre y código.
+    if isinstance(data, dict):
+        nombre = _field(data, NOMBRE_KEYS)
+        codigo = _field(data, CODIGO_KEYS)
+        if isinstance(nombre, str) and codigo is not None and not isinstance(codigo, (dict, list)):
+            out.append((nombre, str(codigo)))
+        for value in data.values():
+            if isinstance(value, (dict, list)):
+                _walk_divisiones(value, out)
+    elif isinstance(data, list):
+        for value in data:
+            _walk_divisiones(value, out)
+
+
+def _texto(value: Any) -> str:
+    return "" if value is None else str(value)
+
+
+class RegistraduriaHttpEngine:
+    """Construye el mismo ``partidos_info`` que el scraper Selenium, con todos los candidatos."""
+
+    def __init__(self, index_url: str, results_url: str, timeout: float = 10,
+                 index_ttl: float = 24 * 3600, session: Optional[requests.Session] = None):
+        self.index_url = index_url
+        self.results_url = results_url
+        self.timeout = timeout
+        self.index_ttl = index_ttl
+        self.session = session or build_http_session()
+        self._index: Optional[List[Tuple[str, str, str]]] = None
+        self._index_loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _get_json(self, url: str) -> Any:
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def municipios(self) -> List[Tuple[str, str, str]]:
+        """Índice (nombre normalizado, nombre, código), construido una vez y refrescado tras ``index_ttl``."""
+        with self._lock:
+            if self._index is None or time.time() - self._index_loaded_at > self.index_ttl:
+                divisiones: List[Tuple[str, str]] = []
+                _walk_divisiones(self._get_json(self.index_url), divisiones)
+                if not divisiones:
+                    raise RegistraduriaHttpError("El índice de municipios está vacío")
+                self._index = [(normalize_nombre(nombre), nombre, codigo) for nombre, codigo in divisiones]
+                self._index_loaded_at = time.time()
+                logger.info("Índice de la Registraduría cargado: %d divisiones", len(self._index))
+            return self._index
+
+    def codigo_municipio(self, municipio: str) -> str:
+        # Igual que la SPA: coincidencia exacta o, si no, la primera sugerencia que contenga el texto
+        buscado = normalize_nombre(municipio)
+        index = self.municipios()
+        for normalizado, _, codigo in index:
+            if normalizado == buscado:
+                return codigo
+        for normalizado, _, codigo in index:
+            if buscado in normalizado:
+                return codigo
+        raise RegistraduriaHttpError(f"Municipio no encontrado en el índice: {municipio}")
+
+    def resultados(self, municipio: str) -> Dict[str, Dict[str, Any]]:
+        data = self._get_json(self.results_url.format(codigo=quote(self.codigo_municipio(municipio))))
+        partidos = _find_list(data, PARTIDOS_KEYS)
+        if not partidos:
+            raise RegistraduriaHttpError(f"Sin partidos en los resultados de {municipio}")
+
+        partidos_info = {}
+        for partido in partidos:
+            nombre = _field(partido, NOMBRE_KEYS)
+            if not nombre:
+                raise RegistraduriaHttpError("Partido sin nombre en los resultados")
+            candidatos = []
+            for candidato in _field(partido, CANDIDATOS_KEYS) or []:
+                candidatos.append({
+                    "nombre": _texto(_field(candidato, NOMBRE_KEYS)),
+                    "porcentaje": _texto(_field(candidato, PORCENTAJE_KEYS)),
+                    "votos": _texto(_field(candidato, VOTOS_KEYS)),
+                })
+            partidos_info[nombre] = {
+                "porcentaje": _texto(_field(partido, PORCENTAJE_KEYS)),
+                "votos": _texto(_field(partido, VOTOS_KEYS)),
+                "candidatos": candidatos,
+            }
+        return partidos_info
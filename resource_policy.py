@@ -0,0 +1,87 @@
+import logging
+from typing import Iterable, List
+
+logger = logging.getLogger(__name__)
+
+
+
+def _extension_patterns(*extensions: str) -> List[str]:
+    # setBlockedURLs compara la URL completa: "*.svg" y "*.svg?*" solo casan con la
+    # extensión al final de la ruta, no con "/icons.svg/ver" ni "?next=logo.icon"
+    return [pattern for ext in extensions for pattern in (f"*.{ext}", f"*.{ext}?*")]
+
+
+# Patrones de URL por tipo de recurso para Network.setBlockedURLs
+RESOURCE_TYPE_PATTERNS = {
+    "image": _extension_patterns("png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico", "bmp"),
+    "font": _extension_patterns("woff", "woff2", "ttf", "otf", "eot"),
+    "stylesheet": _extension_patterns("css"),
+    "media": _extension_patterns("mp4", "webm", "m3u8", "mp3", "ogg", "wav"),
+}
+
+# Analítica, publicidad y trackers que ningún scraper necesita
+DEFAULT_BLOCKED_DOMAINS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "scorecardresearch.com",
+    "amazon-adsystem.com",
+    "criteo.com",
+    "taboola.com",
+    "clarity.ms",
+]
+
+PAGE_LOAD_STRATEGIES = ("normal", "eager", "none")
+
+
+def _in_domain(host: str, domain: str) -> bool:
+    # "maps.google.com" está en "google.com"; "notgoogle.com" no
+    return host == domain or host.endswith("." + domain)
+
+
+class ResourcePolicy:
+    """Qué recursos bloquear y con qué estrategia de carga navega un scraper.
+
+    Los tipos se bloquean por extensión de la URL y los dominios por patrón;
+    ``allow_domains`` exime dominios de ``block_domains`` (no de los tipos).
+    """
+
+    def __init__(self, block_types: Iterable[str] = (), block_domains: Iterable[str] = (),
+                 allow_domains: Iterable[str] = (), page_load_strategy: str = "normal"):
+        unknown = set(block_types) - set(RESOURCE_TYPE_PATTERNS)
+        if unknown:
+            raise ValueError(f"Tipos de recurso desconocidos: {', '.join(sorted(unknown))}")
+        if page_load_strategy not in PAGE_LOAD_STRATEGIES:
+            raise ValueError(f"Estrategia de carga inválida: {page_load_strategy}")
+        self.block_types = list(block_types)
+        self.allow_domains = [domain.lower() for domain in allow_domains]
+        self.block_domains = [
+            domain.lower() for domain in block_domains
+            if not any(_in_domain(domain.lower(), allowed) for allowed in self.allow_domains)
+        ]
+        self.page_load_strategy = page_load_strategy
+
+    def blocked_url_patterns(self) -> List[str]:
+        patterns = []
+        for resource_type in self.block_types:
+            patterns.extend(RESOURCE_TYPE_PATTERNS[resource_type])
+        for domain in self.block_domains:
+            patterns.append(f"*://{domain}/*")
+            patterns.append(f"*://*.{domain}/*")
+        return patterns
+
+    def apply(self, driver):
+        patterns = self.blocked_url_patterns()
+        if not patterns:
+            return
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        except Exception as e:
+            logger.warning("No se pudo aplicar la política de recursos: %s", e)
+
@@ -0,0 +1,184 @@
+"""Imagen de las fichas de Amazon, Costco y Target por HTTP, sin navegador.
+
+Los lectores de Selenium solo consultan atributos estáticos del HTML:
+``data-a-dynamic-image`` de ``landingImage`` en Amazon, las URLs con
+``canvas=W,H`` de ``Product Preview 1`` en Costco y el ``srcset`` de la
+galería de Target. Aquí se descarga la ficha con la sesión HTTP compartida y
+se leen esos atributos con ``html.parser`` a medida que llega el cuerpo; en
+Amazon y Target se deja de leer en cuanto aparece la imagen. Si la ficha
+necesita JavaScript para pintarse no se encuentra nada y el llamador usa
+Selenium.
+"""
+import json
+import re
+from html.parser import HTMLParser
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+
+from http_client import build_http_session
+
+_CANVAS = re.compile(r"canvas=(\d+),(\d+)")
+
+
+def largest_canvas_link(srcs: Iterable[str]) -> Optional[str]:
+    """Costco: la URL cuyo ``canvas=W,H`` tiene mayor área."""
+    largest_canvas = 0
+    largest_canvas_link = None
+    for src in srcs:
+        canvas_match = _CANVAS.search(src or "")
+        if canvas_match:
+            width, height = map(int, canvas_match.groups())
+            canvas_size = width * height
+            if canvas_size > largest_canvas:
+                largest_canvas = canvas_size
+                largest_canvas_link = src
+    return largest_canvas_link
+
+
+def largest_dynamic_image(data_dynamic_image: str) -> Optional[str]:
+    """Amazon: la URL de mayor área en el JSON ``{url: [ancho, alto]}`` de ``data-a-dynamic-image``."""
+    largest_area = 0
+    largest_url = None
+    for url, dims in json.loads(data_dynamic_image).items():
+        w, h = dims
+        area = w * h
+        if area > largest_area:
+            largest_area = area
+            largest_url = url
+    return largest_url
+
+
+def widest_srcset(srcset: str) -> Optional[str]:
+    """Target: la URL de mayor ancho (``Nw``) del ``srcset``."""
+    max_width = 0
+    best_url = None
+    for candidate in srcset.split(","):
+        parts = candidate.strip().split(" ")
+        if len(parts) == 2:
+            url, size = parts
+            if size.endswith("w"):
+                width = int(size.replace("w", ""))
+                if width > max_width:
+                    max_width = width
+                    best_url = url
+    return best_url
+
+
+class _RetailerPageParser(HTMLParser):
+    """Atributos de la imagen de la ficha o, en una búsqueda, el enlace del primer resultado."""
+
+    def __init__(self, store: str, search: bool = False):
+        super().__init__(convert_charrefs=True)
+        self.store = store
+        self.search = search
+        self.done = False
+        self.previews: List[str] = []
+        self.dynamic_image: Optional[str] = None
+        self.srcset: Optional[str] = None
+        self.src: Optional[str] = None
+        self.result_href: Optional[str] = None
+        # Un booleano por <div> abierto: si es el contenedor buscado
+        self._divs: List[bool] = []
+        self._in_h2 = False
+
+    def _in_container(self) -> bool:
+        return any(self._divs)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "div":
+            self._divs.append(self._is_container(attrs))
+        elif tag == "h2":
+            self._in_h2 = True
+        elif tag == "a" and self.search and attrs.get("href") and self._is_result_link(attrs):
+            self.result_href = attrs["href"]
+            self.done = True
+        elif tag == "img" and not self.search:
+            # En la búsqueda las miniaturas no sirven: la imagen se lee en la ficha
+            self._read_image(attrs)
+
+    def handle_endtag(self, tag):
+        if tag == "div" and self._divs:
+            self._divs.pop()
+        elif tag == "h2":
+            self._in_h2 = False
+
+    def _is_container(self, attrs) -> bool:
+        if self.store == "target":
+            return attrs.get("tabindex") == "-1"
+        if not self.search:
+            return False
+        if self.store == "amazon":
+            return attrs.get("data-component-type") == "s-search-result" or bool(attrs.get("data-asin"))
+        return self.store == "costco" and "product-tile-set" in (attrs.get("class") or "").split()
+
+    def _is_result_link(self, attrs) -> bool:
+        if self.store == "target":
+            return attrs.get("data-test") == "product-title"
+        if self.store == "costco":
+            return self._in_container() or (attrs.get("data-testid") or "").startswith("Link_product")
+        classes = (attrs.get("class") or "").split()
+        return self._in_container() and (self._in_h2 or "s-no-outline" in classes)
+
+    def _read_image(self, attrs):
+        if self.store == "costco":
+            if attrs.get("alt") == "Product Preview 1" and attrs.get("src"):
+                self.previews.append(attrs["src"])
+        elif self.store == "amazon":
+            if attrs.get("data-a-image-name") == "landingImage" and attrs.get("data-a-dynamic-image"):
+                self.dynamic_image = attrs["data-a-dynamic-image"]
+                self.done = True
+        elif self.store == "target" and self._in_container():
+            self.srcset = attrs.get("srcset")
+            self.src = attrs.get("src")
+            self.done = True
+
+    def image_link(self) -> Optional[str]:
+        if self.store == "costco":
+            return largest_canvas_link(self.previews)
+        if self.store == "amazon":
+            return largest_dynamic_image(self.dynamic_image) if self.dynamic_image else None
+        if self.store == "target":
+            return (widest_srcset(self.srcset) if self.srcset else None) or self.src
+        return None
+
+
+class RetailerHttpEngine:
+    STORES = ("amazon", "costco", "target")
+
+    def __init__(self, timeout: float = 10, session: Optional[requests.Session] = None,
+                 chunk_size: int = 64 * 1024):
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.session = session or build_http_session()
+
+    def _parse(self, url: str, parser: _RetailerPageParser) -> Tuple[str, bool]:
+        """Descarga ``url`` y la pasa al parser hasta que termine; devuelve la URL final y si hubo redirección."""
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            response.encoding = response.encoding or "utf-8"
+            for chunk in response.iter_content(self.chunk_size, decode_unicode=True):
+                parser.feed(chunk)
+                if parser.done:
+                    break
+            parser.close()
+            return response.url, bool(response.history)
+
+    def image_link(self, store: str, url: str, search: bool = False) -> Tuple[str, Optional[str]]:
+        """``(URL de la ficha, imagen)``; con ``search`` se sigue antes el primer resultado."""
+        parser = _RetailerPageParser(store, search=search)
+        final_url, redirected = self._parse(url, parser)
+        if parser.result_href is not None:
+            product_url = urljoin(final_url, parser.result_href)
+            parser = _RetailerPageParser(store)
+            final_url, _ = self._parse(product_url, parser)
+        elif search and redirected:
+            # La búsqueda por número de artículo o UPC puede redirigir directo a la ficha;
+            # el parser de búsqueda no lee imágenes, así que se lee la ficha de nuevo
+            parser = _RetailerPageParser(store)
+            final_url, _ = self._parse(final_url, parser)
+        link = parser.image_link()
+        # Como el src que devuelve el navegador: siempre absoluta
+        return final_url, urljoin(final_url, link) if link else None
@@ -0,0 +1,399 @@
+"""Estado compartido entre réplicas: cola de trabajos, caché y límites por host.
+
+``SHARED_STATE_URL`` elige el backend:
+
+- ``sqlite:///ruta/estado.sqlite3``: un archivo SQLite (WAL) que comparten los
+  procesos de un mismo host o de un volumen local. Sirve para pruebas y para
+  varias réplicas en una sola máquina.
+- ``redis://host:6379/0``: Redis, para réplicas en varios nodos. Requiere el
+  paquete ``redis``.
+
+Los dos ofrecen lo mismo: ``job_store()`` (la cola con leases de ``jobs.py``),
+el nivel compartido de la caché (``cache_get``/``cache_set``), un candado por
+clave para que una sola réplica haga cada scrape (``acquire_lock``) y el token
+bucket de cada host (``reserve_token``).
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from jobs import DONE, FAILED, QUEUED, RUNNING, JobStore
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# (guardado, vence, valor), como las entradas de ResultCache
+CacheEntry = Tuple[float, float, Any]
+
+
+class SqliteSharedState:
+    kind = "sqlite"
+
+    def __init__(self, path: str, cache_max_entries: int = 100000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.cache_max_entries = cache_max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+        # Autocommit: las transacciones se abren a mano con BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def job_store(self) -> JobStore:
+        return JobStore(self.path)
+
+    def cache_get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at, expires_at, value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return (row[0], row[1], json.loads(row[2])) if row else None
+
+    def cache_set(self, key: str, entry: CacheEntry):
+        stored_at, expires_at, value = entry
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), stored_at, expires_at),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.cache_max_entries,),
+                )
+
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT owner, expires_at FROM locks WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[1] > now and row[0] != owner:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO locks (name, owner, expires_at) VALUES (?, ?, ?)", (name, owner, now + ttl)
+            )
+            # Aprovecha para limpiar los candados de réplicas caídas
+            conn.execute("DELETE FROM locks WHERE expires_at <= ?", (now,))
+            return True
+
+    def release_lock(self, name: str, owner: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, owner))
+
+    def reserve_token(self, name: str, rate: float, burst: int, max_wait: float) -> Optional[float]:
+        """Igual que ``throttle.TokenBucket.reserve``, con el saldo guardado en la base."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+            tokens, updated = row if row else (float(burst), now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if wait > max_wait:
+                return None
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)", (name, tokens - 1, now)
+            )
+            return wait
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ---- Redis ----
+# Los scripts Lua hacen atómica cada operación de varias claves.
+
+_CLAIM = """
+local ids = redis.call('ZRANGE', KEYS[1], 0, 0)
+if #ids == 0 then return false end
+local id = ids[1]
+redis.call('ZREM', KEYS[1], id)
+local job = ARGV[4] .. id
+redis.call('HSET', job, 'status', ARGV[5], 'lease_owner', ARGV[1], 'lease_expires', ARGV[2], 'updated_at', ARGV[3])
+redis.call('HINCRBY', job, 'attempts', 1)
+redis.call('ZADD', KEYS[2], ARGV[2], id)
+return id
+"""
+
+# KEYS: trabajo, leases, terminados. ARGV: id, dueño ('' = cualquiera), terminado_en ('' = no), campos...
+_UPDATE = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+if ARGV[2] ~= '' then
+  local job = redis.call('HMGET', KEYS[1], 'status', 'lease_owner')
+  if job[1] ~= ARGV[4] or job[2] ~= ARGV[2] then return 0 end
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 5))
+if ARGV[3] ~= '' then
+  redis.call('ZREM', KEYS[2], ARGV[1])
+  redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+  redis.call('HDEL', KEYS[1], 'lease_owner')
+end
+return 1
+"""
+
+_HEARTBEAT = """
+local job = redis.call('HMGET', KEYS[1], 'status', 'lease_owner')
+if job[1] ~= ARGV[3] or job[2] ~= ARGV[2] then return 0 end
+redis.call('HSET', KEYS[1], 'lease_expires', ARGV[4])
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[1])
+return 1
+"""
+
+# KEYS: leases, cola, terminados. ARGV: límite de vencimiento, dueño ('' = vencidos de cualquiera),
+# ahora, prefijo, intentos máximos, error, QUEUED, FAILED
+_REQUEUE = """
+local requeued, failed = 0, 0
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])) do
+  local job = ARGV[4] .. id
+  local fields = redis.call('HMGET', job, 'lease_owner', 'attempts', 'created_at')
+  if ARGV[2] == '' or fields[1] == ARGV[2] then
+    redis.call('ZREM', KEYS[1], id)
+    local attempts = tonumber(fields[2]) or 0
+    if ARGV[2] ~= '' then
+      redis.call('HINCRBY', job, 'attempts', -1)
+      attempts = 0
+    end
+    if attempts >= tonumber(ARGV[5]) then
+      redis.call('HSET', job, 'status', ARGV[8], 'error', ARGV[6], 'updated_at', ARGV[3], 'finished_at', ARGV[3])
+      redis.call('HDEL', job, 'lease_owner')
+      redis.call('ZADD', KEYS[3], ARGV[3], id)
+      failed = failed + 1
+    else
+      redis.call('HSET', job, 'status', ARGV[7], 'progress_done', 0, 'updated_at', ARGV[3])
+      redis.call('HDEL', job, 'lease_owner')
+      redis.call('ZADD', KEYS[2], fields[3], id)
+      requeued = requeued + 1
+    end
+  end
+end
+return {requeued, failed}
+"""
+
+# Toma el candado o, si ya es del mismo dueño, extiende su vencimiento
+_ACQUIRE_LOCK = """
+local current = redis.call('GET', KEYS[1])
+if current and current ~= ARGV[1] then return 0 end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+return 1
+"""
+
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+# Con el reloj de Redis: las réplicas no dependen de tener la hora sincronizada
+_RESERVE = """
+local rate, burst, max_wait = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens < 1 then wait = (1 - tokens) / rate end
+if wait > max_wait then return false end
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate + max_wait) + 60)
+return tostring(wait)
+"""
+
+_INT_FIELDS = ("progress_done", "progress_total", "attempts")
+_FLOAT_FIELDS = ("created_at", "updated_at", "finished_at", "lease_expires")
+_JOB_FIELDS = ("id", "kind", "payload", "status", "result", "error", "lease_owner") + _INT_FIELDS + _FLOAT_FIELDS
+
+
+def _job_row(fields: Dict[str, str]) -> Dict[str, Any]:
+    """Hash de Redis -> fila con los mismos campos y tipos que la tabla ``jobs``."""
+    row = {}
+    for name in _JOB_FIELDS:
+        value = fields.get(name)
+        if value is not None and name in _INT_FIELDS:
+            value = int(value)
+        elif value is not None and name in _FLOAT_FIELDS:
+            value = float(value)
+        row[name] = value
+    for name in _INT_FIELDS:
+        row[name] = row[name] or 0
+    return row
+
+
+class RedisJobStore:
+    """La interfaz de ``JobStore`` sobre Redis: un hash por trabajo y sorted sets para
+    la cola (por creación), los leases (por vencimiento) y los terminados."""
+
+    def __init__(self, client, prefix: str):
+        self._redis = client
+        self._job_prefix = f"{prefix}job:"
+        self._queue = f"{prefix}jobs:queued"
+        self._leases = f"{prefix}jobs:leases"
+        self._finished = f"{prefix}jobs:finished"
+        self._claim = client.register_script(_CLAIM)
+        self._update = client.register_script(_UPDATE)
+        self._heartbeat = client.register_script(_HEARTBEAT)
+        self._requeue = client.register_script(_REQUEUE)
+
+    def create(self, kind: str, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._redis.pipeline() as pipe:
+            pipe.hset(self._job_prefix + job_id, mapping={
+                "id": job_id, "kind": kind, "payload": json.dumps(payload, ensure_ascii=False),
+                "status": QUEUED, "progress_done": 0, "progress_total": 0, "attempts": 0,
+                "created_at": now, "updated_at": now,
+            })
+            pipe.zadd(self._queue, {job_id: now})
+            pipe.execute()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        fields = self._redis.hgetall(self._job_prefix + job_id)
+        return _job_row(fields) if fields else None
+
+    def update(self, job_id: str, owner: Optional[str] = None, **fields) -> bool:
+        fields["updated_at"] = time.time()
+        finished_at = fields.get("finished_at") if fields.get("status") in (DONE, FAILED) else None
+        values = [item for name, value in fields.items() if value is not None for item in (name, value)]
+        return bool(self._update(
+            keys=[self._job_prefix + job_id, self._leases, self._finished],
+            args=[job_id, owner or "", "" if finished_at is None else finished_at, RUNNING, *values],
+        ))
+
+    def claim(self, owner: str, lease: float) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        job_id = self._claim(keys=[self._queue, self._leases],
+                             args=[owner, now + lease, now, self._job_prefix, RUNNING])
+        return self.get(job_id) if job_id else None
+
+    def heartbeat(self, job_id: str, owner: str, lease: float) -> bool:
+        return bool(self._heartbeat(keys=[self._job_prefix + job_id, self._leases],
+                                    args=[job_id, owner, RUNNING, time.time() + lease]))
+
+    def _requeue_leases(self, until: str, owner: str, max_attempts: int) -> Tuple[int, int]:
+        requeued, failed = self._requeue(
+            keys=[self._leases, self._queue, self._finished],
+            args=[until, owner, time.time(), self._job_prefix, max_attempts,
+                  "Se agotaron los intentos: el worker dejó de responder", QUEUED, FAILED],
+        )
+        return int(requeued), int(failed)
+
+    def requeue_expired(self, max_attempts: int) -> Dict[str, int]:
+        requeued, failed = self._requeue_leases(str(time.time()), "", max_attempts)
+        return {"requeued": requeued, "failed": failed}
+
+    def release(self, owner: str) -> int:
+        # Con dueño no se gasta el intento, así que el máximo no aplica
+        return self._requeue_leases("+inf", owner, 1)[0]
+
+    def purge_finished(self, ttl: float) -> int:
+        expired = self._redis.zrangebyscore(self._finished, "-inf", time.time() - ttl)
+        if not expired:
+            return 0
+        with self._redis.pipeline() as pipe:
+            pipe.delete(*(self._job_prefix + job_id for job_id in expired))
+            pipe.zrem(self._finished, *expired)
+            pipe.execute()
+        return len(expired)
+
+    def close(self):
+        pass
+
+
+class RedisSharedState:
+    kind = "redis"
+
+    def __init__(self, url: str, prefix: str = "scraper:"):
+        if redis is None:
+            raise RuntimeError("SHARED_STATE_URL usa Redis pero el paquete redis no está instalado")
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._acquire_lock = self._redis.register_script(_ACQUIRE_LOCK)
+        self._release_lock = self._redis.register_script(_RELEASE_LOCK)
+        self._reserve = self._redis.register_script(_RESERVE)
+
+    def job_store(self) -> RedisJobStore:
+        return RedisJobStore(self._redis, self.prefix)
+
+    def cache_get(self, key: str) -> Optional[CacheEntry]:
+        raw = self._redis.get(f"{self.prefix}cache:{key}")
+        if raw is None:
+            return None
+        stored_at, expires_at, value = json.loads(raw)
+        return stored_at, expires_at, value
+
+    def cache_set(self, key: str, entry: CacheEntry):
+        ttl_ms = int((entry[1] - time.time()) * 1000)
+        if ttl_ms > 0:
+            self._redis.set(f"{self.prefix}cache:{key}", json.dumps(list(entry), ensure_ascii=False), px=ttl_ms)
+
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        return bool(self._acquire_lock(keys=[f"{self.prefix}lock:{name}"], args=[owner, int(ttl * 1000)]))
+
+    def release_lock(self, name: str, owner: str):
+        self._release_lock(keys=[f"{self.prefix}lock:{name}"], args=[owner])
+
+    def reserve_token(self, name: str, rate: float, burst: int, max_wait: float) -> Optional[float]:
+        wait = self._reserve(keys=[f"{self.prefix}bucket:{name}"], args=[rate, burst, max_wait])
+        return None if wait is None else float(wait)
+
+    def close(self):
+        self._redis.close()
+
+
+def open_shared_state(url: Optional[str], prefix: str = "scraper:", cache_max_entries: int = 100000):
+    """Backend según el esquema de ``url``; ``None`` si no hay estado compartido."""
+    if not url:
+        return None
+    scheme = urlsplit(url).scheme
+    if scheme in ("redis", "rediss", "unix"):
+        state = RedisSharedState(url, prefix=prefix)
+    elif scheme == "sqlite":
+        # sqlite:///relativa.sqlite3 o sqlite:////ruta/absoluta.sqlite3, como en SQLAlchemy
+        state = SqliteSharedState(url[len("sqlite:///"):], cache_max_entries=cache_max_entries)
+    else:
+        raise ValueError(f"SHARED_STATE_URL no soportada: {url} (usa sqlite:/// o redis://)")
+    logger.info("Estado compartido en %s (%s)", state.kind, url.split("@")[-1])
+    return state
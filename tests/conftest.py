@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos del servicio viven en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakesite import build_site  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def site_url():
+    """URL base de fakesite, el servidor local que imita los sitios scrapeados."""
+    site = build_site()
+    base_url = site.start()
+    yield base_url
+    site.stop()
+
+
+@pytest.fixture(scope="session")
+def main_module(tmp_path_factory):
+    """El módulo ``main`` sin navegadores al arrancar ni bases SQLite en el repositorio."""
+    data = tmp_path_factory.mktemp("main")
+    env = {
+        "CHROMEDRIVER_OFFLINE": "true",
+        "DRIVER_POOL_WARM": "0",
+        "JOBS_DB_PATH": str(data / "jobs.sqlite3"),
+        "JOB_POLL_INTERVAL": "0.05",
+        "IMAGE_INDEX_PATH": "",
+        "PRODUCT_URL_INDEX_PATH": "",
+        "METRICS_ENABLED": "false",
+    }
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in env.items():
+            patch.setenv(name, value)
+        import main
+        yield main
@@ -0,0 +1,71 @@
+import asyncio
+
+from cache import ResultCache, make_key, parse_cache_control
+
+
+def test_make_key_ignores_case_and_spaces():
+    assert make_key("ns", {"direccion": "Calle 10 "}) == make_key("ns", {"direccion": "calle  10"})
+    assert make_key("ns", {"direccion": "Calle 10"}) != make_key("ns", {"direccion": "Calle 11"})
+
+
+def test_set_get_respects_ttl_and_max_age(monkeypatch):
+    cache = ResultCache(max_entries=10)
+    now = [1000.0]
+    monkeypatch.setattr("cache.time.time", lambda: now[0])
+    cache.set("ns:a", {"v": 1}, ttl=60)
+    assert cache.get("ns:a") == (True, {"v": 1})
+    now[0] += 30
+    assert cache.get("ns:a", max_age=10) == (False, None)
+    now[0] += 31
+    assert cache.get("ns:a") == (False, None)
+
+
+def test_lru_eviction_counts():
+    cache = ResultCache(max_entries=2)
+    for key in ("ns:a", "ns:b", "ns:c"):
+        cache.set(key, key, ttl=60)
+    assert cache.get("ns:a") == (False, None)
+    assert cache.get("ns:c") == (True, "ns:c")
+    assert cache.stats()["namespaces"]["ns"]["evictions"] == 1
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    ResultCache(max_entries=10, db_path=path).set("ns:a", [1, 2], ttl=60)
+    assert ResultCache(max_entries=10, db_path=path).get("ns:a") == (True, [1, 2])
+
+
+def test_get_or_run_coalesces_concurrent_calls():
+    cache = ResultCache(max_entries=10)
+    runs = []
+
+    async def run():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_run("ns", {"q": 1}, 60, run) for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert len(runs) == 1
+    assert sorted(status for _, status in results) == ["COALESCED", "COALESCED", "MISS"]
+    assert asyncio.run(cache.get_or_run("ns", {"q": 1}, 60, run)) == ({"ok": True}, "HIT")
+
+
+def test_get_or_run_without_read_bypasses():
+    cache = ResultCache(max_entries=10)
+    cache.set(make_key("ns", {"q": 1}), "viejo", ttl=60)
+
+    async def run():
+        return "nuevo"
+
+    assert asyncio.run(cache.get_or_run("ns", {"q": 1}, 60, run, read=False)) == ("nuevo", "BYPASS")
+    assert cache.get(make_key("ns", {"q": 1})) == (True, "nuevo")
+
+
+def test_parse_cache_control():
+    assert parse_cache_control(None) == {"read": True, "write": True, "max_age": None}
+    assert parse_cache_control("no-cache") == {"read": False, "write": True, "max_age": None}
+    assert parse_cache_control("no-store") == {"read": False, "write": False, "max_age": None}
+    assert parse_cache_control("max-age=30, foo") == {"read": True, "write": True, "max_age": 30.0}
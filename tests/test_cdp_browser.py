@@ -0,0 +1,156 @@
+import itertools
+import json
+import threading
+
+import pytest
+import trio
+from selenium.common.exceptions import StaleElementReferenceException, WebDriverException
+from trio_websocket import serve_websocket
+
+from cdp_browser import CdpBrowser, CdpElement, CdpPagePool
+from driver_pool import PoolTimeout
+
+
+class FakeDevTools:
+    """Websocket de DevTools mínimo: responde lo justo para crear pestañas, navegar y evaluar."""
+
+    def __init__(self):
+        self.calls = []
+        self.evaluate = lambda expression: {"result": {"type": "string", "value": "ok"}}
+        self.navigate_error = None
+        self._ids = itertools.count(1)
+        self._ready = threading.Event()
+        self.url = None
+        threading.Thread(target=trio.run, args=(self._serve,), daemon=True).start()
+        self._ready.wait(5)
+
+    async def _serve(self):
+        async with trio.open_nursery() as nursery:
+            server = await nursery.start(serve_websocket, self._handle, "127.0.0.1", 0, None)
+            self.url = f"ws://127.0.0.1:{server.port}/devtools/browser/fake"
+            self._ready.set()
+
+    def _result(self, method, params):
+        if method == "Target.createBrowserContext":
+            return {"browserContextId": f"contexto-{next(self._ids)}"}
+        if method == "Target.createTarget":
+            return {"targetId": f"pestaña-{next(self._ids)}"}
+        if method == "Target.attachToTarget":
+            return {"sessionId": f"sesion-{params['targetId']}"}
+        if method == "Page.navigate":
+            if self.navigate_error:
+                return {"frameId": "F", "errorText": self.navigate_error}
+            return {"frameId": "F", "loaderId": "L"}
+        if method == "Runtime.evaluate":
+            return self.evaluate(params["expression"])
+        return {}
+
+    async def _handle(self, request):
+        ws = await request.accept()
+        while True:
+            try:
+                message = json.loads(await ws.get_message())
+            except Exception:
+                return
+            method, params = message["method"], message.get("params", {})
+            self.calls.append((method, params))
+            if method == "Bad.cmd":
+                error = {"code": -32601, "message": f"'{method}' wasn't found"}
+                await ws.send_message(json.dumps({"id": message["id"], "error": error}))
+                continue
+            await ws.send_message(json.dumps({"id": message["id"], "result": self._result(method, params)}))
+            if method == "Page.navigate" and not self.navigate_error:
+                event = {"method": "Page.domContentEventFired", "sessionId": message.get("sessionId"),
+                         "params": {"timestamp": 1}}
+                await ws.send_message(json.dumps(event))
+
+
+@pytest.fixture(scope="module")
+def devtools():
+    return FakeDevTools()
+
+
+@pytest.fixture
+def pool(devtools):
+    devtools.calls.clear()
+    devtools.navigate_error = None
+    pool = CdpPagePool(size=2, lease_timeout=0.1, browser_url=devtools.url, page_load_strategy="eager",
+                       command_timeout=2)
+    yield pool
+    pool.close()
+
+
+def test_get_waits_for_load_event(pool, devtools):
+    with pool.lease() as driver:
+        driver.get("http://sitio.test/")
+        assert ("Page.navigate", {"url": "http://sitio.test/"}) in devtools.calls
+        devtools.navigate_error = "net::ERR_NAME_NOT_RESOLVED"
+        with pytest.raises(WebDriverException, match="ERR_NAME_NOT_RESOLVED"):
+            driver.get("http://no-existe.test/")
+
+
+def test_execute_script_round_trips_nodes_and_errors(pool, devtools):
+    node = {"__cdpNode": 3, "__cdpDoc": "doc"}
+    devtools.evaluate = lambda expression: {"result": {"type": "object", "value": {"a": [1, node]}}}
+    with pool.lease() as driver:
+        value = driver.execute_script("return algo;")
+        assert value["a"][0] == 1
+        assert value["a"][1] == CdpElement(driver, 3, "doc")
+        devtools.evaluate = lambda expression: {
+            "exceptionDetails": {"text": "Uncaught", "exception": {"description": "Error: stale element reference"}}
+        }
+        with pytest.raises(StaleElementReferenceException):
+            driver.execute_script("return 1;")
+        with pytest.raises(WebDriverException, match="wasn't found"):
+            driver.execute_cdp_cmd("Bad.cmd")
+
+
+def test_isolated_pages_get_their_own_context(pool, devtools):
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first.browser_context_id != second.browser_context_id
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(first)
+    assert ("Target.disposeBrowserContext", {"browserContextId": first.browser_context_id}) in devtools.calls
+    pool.release(second)
+
+
+def test_recycles_browser_after_max_uses(devtools):
+    pool = CdpPagePool(size=2, browser_url=devtools.url, max_uses=2, command_timeout=2)
+    try:
+        first = pool.acquire()
+        browser = first.browser
+        second = pool.acquire()
+        # La segunda pestaña agota los usos: el navegador se retira, pero sigue abierto mientras tenga pestañas
+        pool.release(second)
+        assert pool._browser is None and browser.alive
+        third = pool.acquire()
+        assert third.browser is not browser
+        pool.release(first)
+        assert not browser.alive
+        pool.release(third)
+    finally:
+        pool.close()
+
+
+def test_memory_scan_and_close_happen_outside_the_lock(devtools, monkeypatch):
+    pool = CdpPagePool(size=1, browser_url=devtools.url, max_rss_mb=100, command_timeout=2)
+    held = []
+
+    def rss(pid):
+        held.append(pool._lock.locked())
+        return 500
+
+    monkeypatch.setattr(CdpBrowser, "pid", 4242)
+    monkeypatch.setattr("cdp_browser.process_tree_rss_mb", rss)
+    try:
+        driver = pool.acquire()
+        browser = driver.browser
+        close = browser.close
+        monkeypatch.setattr(browser, "close", lambda: (held.append(pool._lock.locked()), close()))
+        pool.release(driver)
+        assert held == [False, False]
+        assert pool._browser is None and not browser.alive
+    finally:
+        pool.close()
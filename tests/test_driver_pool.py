@@ -0,0 +1,110 @@
+import pytest
+
+import driver_pool
+from driver_pool import DriverPool, PoolTimeout
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current = handle
+
+    def default_content(self):
+        self.driver.in_frame = False
+
+
+class FakeChrome:
+    def __init__(self, service=None, options=None):
+        self.capabilities = {"pageLoadStrategy": options.page_load_strategy}
+        self.window_handles = ["principal"]
+        self.current = "principal"
+        self.in_frame = True
+        self.implicit_wait = 30
+        self.script_timeout = 120
+        self.current_url = "https://sitio.test/pagina"
+        self.commands = []
+        self.healthy = True
+        self.quitted = False
+        self.switch_to = FakeSwitchTo(self)
+
+    def close(self):
+        self.window_handles.remove(self.current)
+
+    def implicitly_wait(self, seconds):
+        self.implicit_wait = seconds
+
+    def set_script_timeout(self, seconds):
+        self.script_timeout = seconds
+
+    def execute_cdp_cmd(self, cmd, args):
+        self.commands.append(cmd)
+
+    def get(self, url):
+        self.current_url = url
+
+    def execute_script(self, script):
+        if not self.healthy:
+            raise RuntimeError("chrome not reachable")
+        return 1
+
+    def quit(self):
+        self.quitted = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(driver_pool, "resolve_chromedriver_path", lambda *args: "/usr/bin/chromedriver")
+    monkeypatch.setattr(driver_pool.webdriver, "Chrome", FakeChrome)
+    pool = DriverPool(size=2, max_uses=3, lease_timeout=0.1, script_timeout=30)
+    yield pool
+    pool.close()
+
+
+def test_release_resets_and_reuses(pool):
+    driver = pool.acquire()
+    driver.window_handles.append("pestaña")
+    pool.release(driver)
+    assert driver.window_handles == ["principal"]
+    assert not driver.in_frame
+    assert driver.implicit_wait == 0
+    assert driver.script_timeout == 30
+    assert "Storage.clearDataForOrigin" in driver.commands
+    assert driver.current_url == "about:blank"
+    assert pool.acquire() is driver
+
+
+def test_recycles_after_max_uses(pool):
+    first = pool.acquire()
+    pool.release(first)
+    for _ in range(2):
+        assert pool.acquire() is first
+        pool.release(first)
+    assert first.quitted
+    assert pool.acquire() is not first
+
+
+def test_unhealthy_driver_is_discarded(pool):
+    driver = pool.acquire()
+    driver.healthy = False
+    pool.release(driver)
+    assert driver.quitted
+    assert pool.acquire() is not driver
+
+
+def test_timeout_when_all_leased(pool):
+    leased = [pool.acquire(), pool.acquire()]
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(leased[0])
+    assert pool.acquire() is leased[0]
+
+
+def test_other_strategy_evicts_idle_driver(pool):
+    drivers = [pool.acquire(), pool.acquire()]
+    for driver in drivers:
+        pool.release(driver)
+    eager = pool.acquire(page_load_strategy="eager")
+    assert eager.capabilities["pageLoadStrategy"] == "eager"
+    assert sum(driver.quitted for driver in drivers) == 1
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def client(main_module):
+    with TestClient(main_module.app) as client:
+        yield client
+
+
+def test_cached_endpoint_reports_cache_status(client, main_module, monkeypatch):
+    calls = []
+
+    def fake_scrape(municipio):
+        calls.append(municipio)
+        return {"municipio": municipio}
+
+    monkeypatch.setattr(main_module, "scrape_resultados_electorales", fake_scrape)
+    first = client.post("/scrape_resultados", json={"municipio": "Bello"})
+    second = client.post("/scrape_resultados", json={"municipio": "bello "})
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+    assert calls == ["Bello"]
+    assert client.post(
+        "/scrape_resultados", json={"municipio": "Bello"}, headers={"Cache-Control": "no-cache"}
+    ).headers["X-Cache"] == "BYPASS"
+    assert len(calls) == 2
+
+
+def test_full_queue_answers_503(client, main_module, monkeypatch):
+    monkeypatch.setattr(main_module, "scrape_resultados_electorales", lambda municipio: {})
+    monkeypatch.setitem(main_module.scrape_executor._pending, "scrape_resultados", 10 ** 6)
+    response = client.post("/scrape_resultados", json={"municipio": "Envigado"},
+                           headers={"Cache-Control": "no-cache"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(main_module.config.EXECUTOR_RETRY_AFTER)
+
+
+def test_stream_emits_ndjson_items(client, main_module, monkeypatch):
+    def fake_stream(direccion, emit):
+        for capa in ("Capa 1", "Capa 2"):
+            if not emit({"capa": capa, "filas": [direccion]}):
+                return
+
+    monkeypatch.setattr(main_module, "scrape_direccion_stream", fake_stream)
+    response = client.post("/scrape_direccion?stream=ndjson", json={"direccion": "Calle 10"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [{"capa": "Capa 1", "filas": ["Calle 10"]}, {"capa": "Capa 2", "filas": ["Calle 10"]}]
+
+
+def test_stream_reports_scraper_errors(client, main_module, monkeypatch):
+    def fake_stream(direccion, emit):
+        emit({"capa": "Capa 1", "filas": []})
+        raise RuntimeError("se cayó MapGIS")
+
+    monkeypatch.setattr(main_module, "scrape_direccion_stream", fake_stream)
+    response = client.post("/scrape_direccion", json={"direccion": "Calle 11"},
+                           headers={"Accept": "text/event-stream"})
+    assert "event: item" in response.text
+    assert "event: error" in response.text and "se cayó MapGIS" in response.text
+    assert response.text.endswith("event: end\ndata: {}\n\n")
+
+
+def test_job_lifecycle(client, main_module, monkeypatch):
+    def fake_scrape(direccion, progress=None):
+        progress(1, 1)
+        return {"Capa 1": [direccion]}
+
+    monkeypatch.setattr(main_module, "scrape_direccion", fake_scrape)
+    submitted = client.post("/jobs/scrape_direccion", json={"direccion": "Carrera 43A"})
+    assert submitted.status_code == 202
+    job_id = submitted.json()["job_id"]
+    deadline = time.monotonic() + 5
+    while client.get(f"/jobs/{job_id}").json()["status"] != "done":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert client.get(f"/jobs/{job_id}/result").json() == {"resultados": {"Capa 1": ["Carrera 43A"]}}
+    assert client.get("/jobs/no-existe").status_code == 404
+
+
+def test_stats_endpoints(client):
+    assert "namespaces" in client.get("/cache/stats").json()
+    assert client.get("/product_images/index/stats").json()["images"] == 0
+
+
+def test_stream_buffer_is_bounded_and_stops_on_disconnect(main_module, monkeypatch):
+    monkeypatch.setattr(main_module.config, "STREAM_BUFFER_SIZE", 2)
+    produced = []
+    stopped = threading.Event()
+
+    def producer(emit):
+        for i in range(100):
+            if not emit(i):
+                stopped.set()
+                return
+            produced.append(i)
+
+    async def main():
+        items = await main_module.stream_scraper("stream_test", producer)
+        received = []
+        async for item in items:
+            received.append(item)
+            await asyncio.sleep(0.05)
+            # El scraper va como mucho un búfer (más el ítem en curso) por delante del cliente
+            assert len(produced) <= len(received) + 3
+            if len(received) == 3:
+                break
+        await items.aclose()
+        # El scraper nota la desconexión en su siguiente emit
+        assert await asyncio.to_thread(stopped.wait, 2)
+        return received
+
+    assert asyncio.run(main()) == [0, 1, 2]
+    assert len(produced) <= 6
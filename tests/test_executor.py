@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import pytest
+
+from executor import ExecutorBusy, ScrapeExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = ScrapeExecutor(max_workers=4, limits={"lento": 1}, queue_size=1, retry_after=7)
+    yield executor
+    executor.shutdown()
+
+
+def test_run_uses_worker_thread(executor):
+    result = asyncio.run(executor.run("rapido", lambda x: (x, threading.current_thread().name), 1))
+    assert result[0] == 1
+    assert result[1].startswith("scraper")
+
+
+def test_full_queue_raises_busy(executor):
+    release = threading.Event()
+
+    async def main():
+        # Uno corriendo y uno en cola llenan "lento"; el tercero se rechaza sin encolarse
+        running = [asyncio.ensure_future(executor.run("lento", release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorBusy) as busy:
+            await executor.run("lento", release.wait)
+        assert busy.value.retry_after == 7
+        assert executor.stats()["lento"] == {"limit": 1, "pending": 2}
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(main())
+    assert executor.stats()["lento"]["pending"] == 0
+
+
+def test_cancel_frees_slot(executor):
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.run("lento", release.wait))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert executor.stats()["lento"]["pending"] == 0
+        # El semáforo quedó libre: el siguiente no espera al hilo cancelado
+        result = await asyncio.wait_for(executor.run("lento", lambda: "ok"), 1)
+        release.set()
+        return result
+
+    assert asyncio.run(main()) == "ok"
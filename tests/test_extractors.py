@@ -0,0 +1,28 @@
+import pytest
+
+from extractors import extract_partidos
+
+
+class FakeDriver:
+    def __init__(self, result=None, error=None):
+        self.script_timeout = 30.0
+        self.result = result
+        self.error = error
+
+    def set_script_timeout(self, seconds):
+        self.script_timeout = seconds
+
+    def execute_async_script(self, script, *args):
+        assert self.script_timeout == 120
+        if self.error:
+            raise self.error
+        return self.result
+
+
+@pytest.mark.parametrize("driver", [
+    FakeDriver(result=[{"nombre": "Partido A", "porcentaje": "50%", "votos": "10", "candidatos": []}]),
+    FakeDriver(error=RuntimeError("script timeout")),
+])
+def test_extract_partidos_restores_script_timeout(driver):
+    extract_partidos(driver)
+    assert driver.script_timeout == 30.0
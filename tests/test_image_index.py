@@ -0,0 +1,65 @@
+import pytest
+
+from image_index import ProductImageIndex, image_idents
+
+
+class Item:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __getattr__(self, name):
+        return None
+
+
+@pytest.fixture
+def index():
+    return ProductImageIndex(None)
+
+
+def test_image_idents_global_and_store_scoped():
+    item = Item(UPC="0123 456", Item="B0ABCDEFGH", Item_Description="Silla  Roja")
+    assert image_idents("Amazon", item) == ["upc:0123456", "amazon/item:B0ABCDEFGH", "amazon/desc:silla roja"]
+
+
+def test_hit_is_shared_across_stores_by_upc(index):
+    index.save("amazon", Item(UPC="123", Item_Description="silla"), "http://img/1.jpg", "retailer")
+    assert index.lookup("target", Item(UPC="123")) == (True, "http://img/1.jpg", "retailer")
+    # La descripción sola no cruza de tienda
+    assert index.lookup("target", Item(Item_Description="silla")) == (False, None, None)
+
+
+def test_miss_is_scoped_to_its_store(index):
+    item = Item(UPC="123", Item_Description="silla")
+    index.save("amazon", item, None, "google_images")
+    assert index.lookup("amazon", item) == (True, None, "google_images")
+    assert index.lookup("target", item) == (False, None, None)
+
+
+def test_image_wins_over_miss(index):
+    item = Item(UPC="123", Item_Description="silla")
+    index.save("amazon", item, None, "google_images")
+    index.save("target", item, "http://img/2.jpg", "retailer")
+    assert index.lookup("amazon", item) == (True, "http://img/2.jpg", "retailer")
+
+
+def test_max_age_and_negative_ttl(index, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("image_index.time.time", lambda: now[0])
+    index.negative_ttl = 60
+    item = Item(UPC="123")
+    index.save("amazon", item, None, "google_images")
+    now[0] += 30
+    assert index.lookup("amazon", item, max_age=10) == (False, None, None)
+    assert index.lookup("amazon", item)[0] is True
+    now[0] += 31
+    assert index.lookup("amazon", item) == (False, None, None)
+
+
+def test_export_import_round_trip(index):
+    index.save("amazon", Item(UPC="123"), "http://img/1.jpg", "retailer")
+    other = ProductImageIndex(None)
+    assert other.import_entries(index.export()) == 1
+    assert other.lookup("costco", Item(UPC="123"))[1] == "http://img/1.jpg"
+    assert other.import_entries([{"store": "Target", "TCIN": "999"}]) == 1
+    assert other.lookup("target", Item(TCIN="999")) == (True, None, "import")
+    assert other.lookup("amazon", Item(TCIN="999")) == (False, None, None)
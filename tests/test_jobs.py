@@ -0,0 +1,77 @@
+import json
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from jobs import DONE, FAILED, QUEUED, JobManager, JobStore, job_status
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield store
+    store.close()
+
+
+def wait_for(store, job_id, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        row = store.get(job_id)
+        if row["status"] == status:
+            return row
+        time.sleep(0.02)
+    raise AssertionError(f"el trabajo quedó en {store.get(job_id)['status']}")
+
+
+def test_create_get_update(store):
+    job_id = store.create("kind", {"a": "ñ"})
+    row = store.get(job_id)
+    assert row["status"] == QUEUED
+    assert json.loads(row["payload"]) == {"a": "ñ"}
+    store.update(job_id, progress_done=1, progress_total=2)
+    status = job_status(store.get(job_id))
+    assert status["progress"] == {"done": 1, "total": 2}
+    assert store.get("no-existe") is None
+
+
+def test_purge_finished_only_removes_old(store):
+    old = store.create("kind", {})
+    fresh = store.create("kind", {})
+    store.update(old, status=DONE, finished_at=time.time() - 100)
+    store.update(fresh, status=DONE, finished_at=time.time())
+    assert store.purge_finished(ttl=50) == 1
+    assert store.get(old) is None
+    assert store.get(fresh) is not None
+
+
+def test_manager_runs_jobs_and_records_failures(store):
+    manager = JobManager(store, workers=1, result_ttl=60, poll_interval=0.05)
+
+    def ok(payload, progress):
+        progress(1, 1)
+        return {"echo": payload["x"]}
+
+    def http_error(payload, progress):
+        raise HTTPException(status_code=404, detail="sin datos")
+
+    manager.register("ok", ok)
+    manager.register("http_error", http_error)
+    manager.start()
+    try:
+        # Varios trabajos seguidos: el worker sigue vivo después del primero
+        first = manager.submit("ok", {"x": 1})
+        second = manager.submit("ok", {"x": 2})
+        failed = manager.submit("http_error", {})
+        assert json.loads(wait_for(store, first, DONE)["result"]) == {"echo": 1}
+        assert json.loads(wait_for(store, second, DONE)["result"]) == {"echo": 2}
+        assert wait_for(store, failed, FAILED)["error"] == "sin datos"
+        assert job_status(store.get(first))["progress"] == {"done": 1, "total": 1}
+    finally:
+        manager.stop()
+
+
+def test_submit_unknown_kind(store):
+    manager = JobManager(store, workers=1, result_ttl=60)
+    with pytest.raises(ValueError):
+        manager.submit("desconocido", {})
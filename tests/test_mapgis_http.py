@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from fakesite import mapgis
+from mapgis_http import MapgisHttpEngine, MapgisHttpError, _parse
+
+
+@pytest.fixture
+def engine(site_url):
+    env = mapgis.env(site_url)
+    return MapgisHttpEngine(
+        env["MAPGIS_HTTP_UTILIDAD_URL"], env["MAPGIS_HTTP_SEARCH_URL"], env["MAPGIS_HTTP_LAYER_URL"],
+        timeout=5, parallelism=4,
+    )
+
+
+def test_parse_utilidad_fragments():
+    page = _parse(
+        '<input type="radio" id="2" value="Usos"><input type="hidden" id="strCbml" value="123">'
+        '<div id="noDatos" style="display: none">No hay datos</div>'
+        '<table id="res0"><thead><tr><td>Encabezado</td></tr></thead>'
+        '<tbody><tr><td> a\n b </td><td>c</td></tr></tbody></table>'
+    )
+    assert page.radios == [("2", "Usos")]
+    assert page.cbml == "123"
+    assert page.no_datos is False
+    assert page.rows == [["a b", "c"]]
+    assert _parse('<div id="noDatos" style="display:block">No hay datos</div>').no_datos is True
+
+
+def test_capas_sorted_by_radio_id(engine):
+    capas = engine.capas()
+    assert len(capas) == len(mapgis.DATA["capas"])
+    assert [int(capa_id) for capa_id, _ in capas] == sorted(int(capa["id"]) for capa in mapgis.DATA["capas"])
+
+
+def test_buscar_cbml_from_json(engine):
+    assert engine.buscar_cbml("Calle 10 # 43-20") == mapgis.DATA["direcciones"]["calle 10 # 43-20"]
+
+
+def test_scrape_matches_fixture_tables(engine):
+    streamed = []
+    resultados = engine.scrape("Calle 10 # 43-20", on_layer=lambda capa, filas: streamed.append(capa))
+    esperado = {capa: [" | ".join(fila) for fila in filas] for capa, filas in mapgis.DATA["tablas"].items()}
+    assert resultados == esperado
+    # Las capas sin datos no aparecen y on_layer ve las mismas capas
+    assert sorted(streamed) == sorted(esperado)
+
+
+def test_layer_without_table_raises(site_url):
+    engine = MapgisHttpEngine(
+        f"{site_url}/mapgis9/utilidad53.html", f"{site_url}/mapgis9/buscar?direccion={{direccion}}",
+        # La utilidad no es una respuesta de capa: ni tabla res0 ni aviso noDatos visible
+        f"{site_url}/mapgis9/utilidad53.html?cbml={{cbml}}&capa={{capa}}",
+        timeout=5,
+    )
+    with pytest.raises(MapgisHttpError):
+        engine.consultar_capa("1", "1", "Clasificacion del suelo")
+
+
+def test_partial_http_config_fails_at_startup(tmp_path):
+    env = dict(os.environ, MAPGIS_HTTP_SEARCH_URL="http://mapgis.test/buscar?direccion={direccion}",
+               MAPGIS_HTTP_LAYER_URL="http://mapgis.test/capa?cbml={cbml}&capa={capa}",
+               MAPGIS_HTTP_UTILIDAD_URL="", JOBS_DB_PATH=str(tmp_path / "jobs.sqlite3"),
+               IMAGE_INDEX_PATH="", PRODUCT_URL_INDEX_PATH="")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", "import main"], cwd=root, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode != 0
+    assert "MAPGIS_HTTP_UTILIDAD_URL" in result.stderr
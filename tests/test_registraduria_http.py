@@ -0,0 +1,35 @@
+import pytest
+
+from fakesite import registraduria
+from registraduria_http import RegistraduriaHttpEngine, RegistraduriaHttpError, normalize_nombre
+
+
+@pytest.fixture
+def engine(site_url):
+    env = registraduria.env(site_url)
+    return RegistraduriaHttpEngine(env["REGISTRADURIA_HTTP_INDEX_URL"], env["REGISTRADURIA_HTTP_RESULTS_URL"],
+                                   timeout=5)
+
+
+def test_normalize_nombre():
+    assert normalize_nombre("  ITAGÜÍ ") == "itagui"
+    assert normalize_nombre("Bogotá-D.C.") == "bogota d.c."
+
+
+def test_codigo_municipio_exact_then_partial(engine):
+    assert engine.codigo_municipio("Medellín") == "01001"
+    assert engine.codigo_municipio("itagui") == "01129"
+    # Como la SPA: sin coincidencia exacta gana la primera sugerencia que contenga el texto
+    assert engine.codigo_municipio("bogota") == "16001"
+    with pytest.raises(RegistraduriaHttpError):
+        engine.codigo_municipio("Atlantis")
+
+
+def test_resultados_match_fixture(engine):
+    esperado = registraduria._resultados("01001")["partidos"]
+    partidos = engine.resultados("MEDELLÍN")
+    assert list(partidos) == [partido["nombre"] for partido in esperado]
+    primero = partidos[esperado[0]["nombre"]]
+    assert primero["votos"] == str(esperado[0]["votos"])
+    assert primero["porcentaje"] == esperado[0]["porcentaje"]
+    assert [c["nombre"] for c in primero["candidatos"]] == [c["nombre"] for c in esperado[0]["candidatos"]]
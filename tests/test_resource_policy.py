@@ -0,0 +1,40 @@
+import re
+
+import pytest
+
+from resource_policy import ResourcePolicy
+
+
+def blocked(policy, url):
+    # Como Network.setBlockedURLs: "*" es el único comodín y el patrón cubre la URL completa
+    for pattern in policy.blocked_url_patterns():
+        if re.fullmatch(".*".join(re.escape(part) for part in pattern.split("*")), url):
+            return True
+    return False
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://sitio.test/img/logo.png", True),
+    ("https://sitio.test/img/logo.svg?v=3", True),
+    ("https://sitio.test/estilos/app.css", True),
+    ("https://sitio.test/icons.svg/ver", False),
+    ("https://sitio.test/buscar?next=/favicon.icon", False),
+    ("https://sitio.test/api/capas.json", False),
+])
+def test_type_patterns_match_extension_only(url, expected):
+    policy = ResourcePolicy(block_types=["image", "stylesheet"])
+    assert blocked(policy, url) is expected
+
+
+def test_allow_list_matches_whole_domains():
+    policy = ResourcePolicy(
+        block_domains=["google.com", "maps.google.com", "notgoogle.com"], allow_domains=["google.com"]
+    )
+    assert policy.block_domains == ["notgoogle.com"]
+    assert blocked(policy, "https://cdn.notgoogle.com/x.js")
+    assert not blocked(policy, "https://maps.google.com/x.js")
+
+
+def test_unknown_type_is_rejected():
+    with pytest.raises(ValueError):
+        ResourcePolicy(block_types=["scripts"])
@@ -0,0 +1,60 @@
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from fakesite import google
+from retailer_http import (
+    RetailerHttpEngine, _RetailerPageParser, largest_canvas_link, largest_dynamic_image, widest_srcset,
+)
+
+
+@pytest.fixture
+def engine():
+    return RetailerHttpEngine(timeout=5, chunk_size=64)
+
+
+def image_size(link):
+    query = parse_qs(urlsplit(link).query)
+    # Costco lleva el tamaño en canvas=W,H; las demás tiendas en w
+    width = query["canvas"][0].split(",")[0] if "canvas" in query else query["w"][0]
+    return query["store"][0], int(width)
+
+
+def test_pickers():
+    assert largest_canvas_link(["a?canvas=10,10", "b?canvas=30,30", "c"]) == "b?canvas=30,30"
+    assert largest_dynamic_image('{"a": [10, 10], "b": [20, 5]}') == "a"
+    assert widest_srcset("a 300w, b 1200w, c 600w") == "b"
+
+
+@pytest.mark.parametrize("store, path", [("amazon", "/amazon/dp"), ("costco", "/costco/product"),
+                                         ("target", "/target/p")])
+def test_product_page_largest_image(site_url, engine, store, path):
+    product_url, link = engine.image_link(store, f"{site_url}{path}?id=abc&q=silla")
+    assert product_url.startswith(f"{site_url}{path}")
+    assert link.startswith(site_url)
+    assert image_size(link) == (store, 1200)
+
+
+@pytest.mark.parametrize("store, path", [("amazon", "/amazon/s?k=silla"), ("costco", "/costco/search?keyword=silla"),
+                                         ("target", "/target/s?searchTerm=silla")])
+def test_search_follows_first_result(site_url, engine, store, path):
+    product_url, link = engine.image_link(store, f"{site_url}{path}", search=True)
+    assert product_url.startswith(site_url + google._product_url(store, "silla").split("?")[0])
+    assert image_size(link) == (store, 1200)
+
+
+@pytest.mark.parametrize("store, path", [("amazon", "/amazon/s?k=12345"), ("costco", "/costco/search?keyword=12345"),
+                                         ("target", "/target/s?searchTerm=12345")])
+def test_search_redirected_to_product_page(site_url, engine, store, path):
+    product_url, link = engine.image_link(store, f"{site_url}{path}", search=True)
+    assert product_url == site_url + google._product_url(store, "12345")
+    assert image_size(link) == (store, 1200)
+
+
+def test_target_search_ignores_thumbnails_before_the_result_link():
+    parser = _RetailerPageParser("target", search=True)
+    parser.feed('<div tabindex="-1"><img src="/thumb.jpg" srcset="/thumb.jpg 100w"></div>')
+    assert not parser.done
+    parser.feed('<a data-test="product-title" href="/p/1">Silla</a>')
+    assert parser.done and parser.result_href == "/p/1"
+    assert parser.image_link() is None
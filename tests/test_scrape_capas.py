@@ -0,0 +1,58 @@
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, kind):
+        handle = f"pestaña-{len(self.driver.handles)}"
+        self.driver.handles.append(handle)
+        self.driver.current_window_handle = handle
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+    def frame(self, element):
+        pass
+
+
+class FakeDriver:
+    def __init__(self):
+        self.handles = ["principal"]
+        self.current_window_handle = "principal"
+        self.switch_to = FakeSwitchTo(self)
+
+    def execute_script(self, script, *args):
+        return {"strCbml": "0501230004"} if "querySelectorAll" in script else "https://mapgis.test/utilidad"
+
+    def execute_cdp_cmd(self, cmd, args):
+        return {}
+
+    def find_element(self, by, value):
+        return object()
+
+    def close(self):
+        pass
+
+
+def test_tab_rounds_stop_when_client_disconnects(main_module, monkeypatch):
+    clicked = []
+
+    def click_capa(driver, i):
+        clicked.append(i)
+        return f"Capa {i}", None
+
+    monkeypatch.setattr(main_module.config, "MAPGIS_LAYER_TABS", 3)
+    monkeypatch.setattr(main_module, "load_page", lambda driver, url: None)
+    monkeypatch.setattr(main_module, "click_capa", click_capa)
+    monkeypatch.setattr(main_module, "leer_capa", lambda driver, i, old_table=None: [f"fila {i}"])
+    sent = []
+
+    def on_layer(capa, filas):
+        sent.append(capa)
+        return len(sent) < 2
+
+    resultados, complete = main_module.scrape_capas(FakeDriver(), on_layer=on_layer)
+    assert not complete
+    assert sent == ["Capa 1", "Capa 2"]
+    # Solo la primera ronda de pestañas: ni más rondas ni el recorrido secuencial
+    assert clicked == [1, 2, 3]
+    assert list(resultados) == ["Capa 1", "Capa 2"]
@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+import pytest
+
+from cache import ResultCache, make_key
+from jobs import DONE, FAILED, QUEUED, RUNNING
+from shared_state import SqliteSharedState, open_shared_state
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = SqliteSharedState(str(tmp_path / "estado.sqlite3"))
+    yield state
+    state.close()
+
+
+def test_open_shared_state_by_scheme(tmp_path):
+    assert open_shared_state("") is None
+    state = open_shared_state(f"sqlite:///{tmp_path}/estado.sqlite3")
+    assert state.kind == "sqlite"
+    state.close()
+    with pytest.raises(ValueError):
+        open_shared_state("memcached://localhost")
+
+
+def test_cache_entries_expire(state, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("shared_state.time.time", lambda: now[0])
+    state.cache_set("ns:a", (now[0], now[0] + 60, {"v": "ñ"}))
+    assert state.cache_get("ns:a") == (1000.0, 1060.0, {"v": "ñ"})
+    now[0] += 61
+    assert state.cache_get("ns:a") is None
+
+
+def test_lock_is_exclusive_reentrant_and_expires(state, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("shared_state.time.time", lambda: now[0])
+    assert state.acquire_lock("k", "a", ttl=10)
+    assert not state.acquire_lock("k", "b", ttl=10)
+    # El mismo dueño lo renueva: sigue siendo suyo pasado el primer vencimiento
+    now[0] += 8
+    assert state.acquire_lock("k", "a", ttl=10)
+    now[0] += 8
+    assert not state.acquire_lock("k", "b", ttl=10)
+    now[0] += 3
+    assert state.acquire_lock("k", "b", ttl=10)
+    state.release_lock("k", "a")
+    assert not state.acquire_lock("k", "a", ttl=10)
+    state.release_lock("k", "b")
+    assert state.acquire_lock("k", "a", ttl=10)
+
+
+def test_reserve_token_burst_then_wait(state, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("shared_state.time.time", lambda: now[0])
+    assert state.reserve_token("host", rate=1.0, burst=2, max_wait=5) == 0.0
+    assert state.reserve_token("host", rate=1.0, burst=2, max_wait=5) == 0.0
+    assert state.reserve_token("host", rate=1.0, burst=2, max_wait=5) == pytest.approx(1.0)
+    # Más allá de max_wait no se reserva nada
+    assert state.reserve_token("host", rate=1.0, burst=2, max_wait=1.5) is None
+    now[0] += 3
+    assert state.reserve_token("host", rate=1.0, burst=2, max_wait=0) == 0.0
+
+
+def test_result_cache_coalesces_across_replicas(tmp_path):
+    path = str(tmp_path / "estado.sqlite3")
+    first = ResultCache(10, shared=SqliteSharedState(path), lock_poll=0.02)
+    second = ResultCache(10, shared=SqliteSharedState(path), lock_poll=0.02)
+    runs = []
+
+    async def run():
+        runs.append(1)
+        await asyncio.sleep(0.2)
+        return {"ok": True}
+
+    async def main():
+        leader = asyncio.create_task(first.get_or_run("ns", {"q": 1}, 60, run))
+        await asyncio.sleep(0.05)
+        follower = await second.get_or_run("ns", {"q": 1}, 60, run)
+        return await leader, follower
+
+    leader, follower = asyncio.run(main())
+    assert len(runs) == 1
+    assert leader == ({"ok": True}, "MISS")
+    assert follower == ({"ok": True}, "COALESCED")
+
+
+def test_result_cache_renews_lock_during_long_run(state):
+    cache = ResultCache(10, shared=state, lock_ttl=0.15)
+    key = make_key("ns", {"q": 1})
+    held = []
+
+    async def run():
+        # Dura varias veces lock_ttl: otra réplica no debe poder tomar el candado
+        for _ in range(4):
+            await asyncio.sleep(0.1)
+            held.append(state.acquire_lock(key, "otra", ttl=1))
+        return 1
+
+    assert asyncio.run(cache.get_or_run("ns", {"q": 1}, 60, run)) == (1, "MISS")
+    assert held == [False] * 4
+    # Al terminar se suelta el candado
+    assert state.acquire_lock(key, "otra", ttl=1)
+
+
+class BrokenState:
+    kind = "broken"
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("sin conexión")
+        return fail
+
+
+def test_result_cache_falls_back_to_memory_when_shared_fails():
+    cache = ResultCache(10, shared=BrokenState())
+
+    async def run():
+        return "valor"
+
+    assert asyncio.run(cache.get_or_run("ns", {"q": 1}, 60, run)) == ("valor", "MISS")
+    assert asyncio.run(cache.get_or_run("ns", {"q": 1}, 60, run)) == ("valor", "HIT")
+    cache.set("ns:b", 1, ttl=60)
+    assert cache.get("ns:b") == (True, 1)
+    assert cache.get("ns:c") == (False, None)
+
+
+def test_job_leases(state):
+    store = state.job_store()
+    job_id = store.create("kind", {})
+    row = store.claim("w1", lease=60)
+    assert row["id"] == job_id and row["status"] == RUNNING and row["attempts"] == 1
+    assert store.claim("w2", lease=60) is None
+    assert store.heartbeat(job_id, "w1", lease=60)
+    assert not store.heartbeat(job_id, "w2", lease=60)
+    # Solo el dueño del lease escribe el resultado
+    assert not store.update(job_id, owner="w2", status=DONE)
+    assert store.update(job_id, owner="w1", progress_done=1)
+    # El apagado ordenado devuelve el trabajo sin gastar el intento
+    assert store.release("w1") == 1
+    row = store.get(job_id)
+    assert row["status"] == QUEUED and row["attempts"] == 0 and row["progress_done"] == 0
+    store.close()
+
+
+def test_expired_leases_requeue_until_max_attempts(state):
+    store = state.job_store()
+    job_id = store.create("kind", {})
+    store.claim("w1", lease=-1)
+    assert store.requeue_expired(max_attempts=2) == {"requeued": 1, "failed": 0}
+    assert store.get(job_id)["status"] == QUEUED
+    store.claim("w2", lease=-1)
+    assert store.requeue_expired(max_attempts=2) == {"requeued": 0, "failed": 1}
+    row = store.get(job_id)
+    assert row["status"] == FAILED and row["finished_at"] <= time.time()
+    store.close()
@@ -0,0 +1,78 @@
+import pytest
+
+import throttle
+from throttle import AdaptiveLimit, HostLimiter, Throttled, TokenBucket, page_block_reason
+
+
+@pytest.fixture(autouse=True)
+def reset_throttle():
+    yield
+    throttle.configure(enabled=False, rules={})
+
+
+def test_token_bucket_queues_reservations():
+    bucket = TokenBucket(rate=1.0, burst=2)
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(10) == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve(0.5) is None
+
+
+def test_adaptive_limit_increases_and_decreases_once_per_cooldown():
+    limit = AdaptiveLimit(initial=4, min_limit=1, max_limit=8, decrease=0.5, cooldown=60)
+    assert limit.acquire(0)
+    limit.release(True)
+    assert limit.limit == pytest.approx(4.25)
+    for _ in range(2):
+        assert limit.acquire(0)
+        limit.release(False)
+    assert limit.limit == pytest.approx(2.125)
+    assert limit.acquire(0) and limit.acquire(0)
+    assert not limit.acquire(0)
+
+
+def test_block_pauses_host_and_throttles():
+    limiter = HostLimiter("example.com", rate=0, burst=1, initial=2, min_limit=1, max_limit=4, slow_after=10,
+                          block_backoff=30)
+    with limiter.slot(1) as outcome:
+        outcome.blocked("captcha")
+    assert limiter.stats()["paused_seconds"] > 0
+    with pytest.raises(Throttled) as error:
+        with limiter.slot(1):
+            pass
+    assert error.value.retry_after >= 29
+
+
+def test_slot_matches_subdomains_and_skips_unlisted_hosts():
+    throttle.configure(enabled=True, rules={"google.com": (100.0, 5)})
+    with throttle.slot("https://www.google.com/search?q=x"):
+        pass
+    with throttle.slot("https://example.org/"):
+        pass
+    assert list(throttle.stats()) == ["google.com"]
+
+
+class PageDriver:
+    def __init__(self, url="https://www.target.com/p/1", title="Silla", captcha=False, status=200, text=""):
+        self.page = (url, title, captcha, status, text)
+
+    def execute_script(self, script, read_text):
+        url, title, captcha, status, text = self.page
+        return [url, title, captcha, status, text if read_text else ""]
+
+
+def test_block_phrases_only_count_on_captcha_hosts():
+    throttle.configure(enabled=True, rules={}, captcha_hosts=("google.com",))
+    robot = "Reseñas: not a robot vacuum, too many requests to list"
+    assert page_block_reason(PageDriver(text=robot), "https://www.target.com/p/1") is None
+    assert page_block_reason(
+        PageDriver(url="https://www.google.com/search", text="Our systems have detected unusual traffic"),
+        "https://www.google.com/search?q=x",
+    ) == "block_page"
+
+
+def test_structural_signals_count_on_any_host():
+    url = "https://www.target.com/p/1"
+    assert page_block_reason(PageDriver(captcha=True), url) == "captcha"
+    assert page_block_reason(PageDriver(url="https://www.google.com/sorry/index"), url) == "captcha"
+    assert page_block_reason(PageDriver(status=429), url) == "http_429"
@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+from verify_http import VerifyHttpEngine, _TextMatcher, normalize_text
+
+
+@pytest.fixture
+def engine():
+    # Trozos pequeños: la palabra queda partida entre lecturas
+    return VerifyHttpEngine(timeout=5, chunk_size=7)
+
+
+def test_normalize_text():
+    assert normalize_text("Silla\n  ROJA") == "silla roja"
+
+
+def test_matcher_ignores_hidden_text():
+    matcher = _TextMatcher("silla roja")
+    matcher.feed("<title>Silla roja</title><script>var s = 'silla roja';</script><p>Mesa</p>")
+    assert not matcher.found
+    matcher.feed("<p>una SILLA</p><p>roja de madera</p>")
+    assert matcher.found
+
+
+def test_contains_on_product_page(site_url, engine):
+    url = f"{site_url}/amazon/dp?id=1&q=silla%20roja%20plegable"
+    assert engine.contains(url, "Roja Plegable")
+    assert not engine.contains(url, "mesa de noche")
+
+
+def test_contains_skips_non_html(site_url, engine):
+    assert not engine.contains(f"{site_url}/img?store=amazon&id=1&w=1&h=1", "svg")
+
+
+def test_contains_stops_when_asked(site_url, engine):
+    stop = threading.Event()
+    stop.set()
+    assert not engine.contains(f"{site_url}/amazon/dp?id=1&q=silla", "descripción del producto", stop)
@@ -0,0 +1,43 @@
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from waits import wait_for_network_idle, wait_for_value
+
+
+class FakeDriver:
+    """Devuelve ``(readyState, recursos)`` de una secuencia; el último valor se repite."""
+
+    def __init__(self, states):
+        self.states = list(states)
+        self.scripts = []
+
+    def execute_script(self, script, *args):
+        self.scripts.append(script)
+        return self.states.pop(0) if len(self.states) > 1 else self.states[0]
+
+
+def test_network_idle_after_resources_stop():
+    driver = FakeDriver([("loading", 10), ("interactive", 250), ("complete", 251), ("complete", 251)])
+    assert wait_for_network_idle(driver, idle_ms=100, timeout=2)
+    # El conteo viene del PerformanceObserver, no del búfer limitado de resource timing
+    assert "PerformanceObserver" in driver.scripts[0]
+
+
+def test_network_idle_times_out_while_resources_keep_arriving():
+    counter = iter(range(10 ** 6))
+
+    class Busy(FakeDriver):
+        def execute_script(self, script):
+            return "complete", next(counter)
+
+    assert not wait_for_network_idle(Busy([]), idle_ms=100, timeout=0.3)
+
+
+def test_wait_for_value_returns_first_non_empty_value():
+    driver = FakeDriver([None, "", "0501230004"])
+    assert wait_for_value(driver, "strCbml", timeout=2, poll=0.01) == "0501230004"
+
+
+def test_wait_for_value_times_out():
+    with pytest.raises(TimeoutException):
+        wait_for_value(FakeDriver([""]), "strCbml", timeout=0.1, poll=0.01)
@@ -0,0 +1,356 @@
+"""Límite de tasa y concurrencia adaptativa por host de destino.
+
+Cada host configurado tiene un token bucket (``rate`` solicitudes por segundo
+con ráfagas de hasta ``burst``) y un límite de concurrencia AIMD: cada visita
+rápida y sin bloqueo suma ``1 / límite`` (un turno más por ventana), y un
+bloqueo (CAPTCHA, 429/503), un timeout o una visita más lenta que
+``slow_after`` lo multiplica por ``decrease``, a lo sumo una vez por
+``cooldown``. Un bloqueo además pausa el host ``block_backoff`` segundos, el
+doble en cada bloqueo seguido.
+
+Todo pasa por ``slot(url)``, compartido por los navegadores y las sesiones
+HTTP. Los hosts sin regla no se limitan. Con estado compartido (ver
+``shared_state.py``) el token bucket de cada host es uno solo para todas las
+réplicas; el límite de concurrencia y las pausas siguen siendo por proceso.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from selenium.common.exceptions import TimeoutException
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_ERRORS = (TimeoutException, TimeoutError, requests.Timeout)
+
+# Indicios de página de bloqueo: URL de Google /sorry/, reCAPTCHA, el código HTTP
+# de la navegación y texto típico. El texto solo se lee si hace falta (ver abajo).
+_BLOCK_CHECK_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0];
+return [
+    location.href,
+    document.title || '',
+    !!document.querySelector('iframe[src*="recaptcha"], #captcha-form, form[action*="sorry"], #px-captcha'),
+    (nav && nav.responseStatus) || 0,
+    arguments[0] && document.body ? document.body.innerText.slice(0, 2000) : ''
+];
+"""
+_BLOCK_STATUSES = (429, 503)
+# Frases genéricas: una ficha normal puede mencionarlas, por eso solo cuentan en
+# los hosts propensos a CAPTCHA (``captcha_hosts``)
+_BLOCK_PHRASES = (
+    "unusual traffic", "tráfico inusual", "not a robot", "no soy un robot", "too many requests",
+)
+
+
+class Throttled(Exception):
+    """No hubo turno para el host dentro del tiempo máximo de espera."""
+
+    def __init__(self, host: str, retry_after: int):
+        super().__init__(f"límite de solicitudes para {host}")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Reserva un token; devuelve los segundos a esperar o ``None`` si superan ``max_wait``.
+
+        El saldo puede quedar negativo: las reservas hacen fila en orden de llegada.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+class SharedTokenBucket:
+    """Token bucket con el saldo en el estado compartido: todas las réplicas gastan del mismo.
+
+    Si el backend no responde se usa un bucket local para no frenar los scrapes.
+    """
+
+    def __init__(self, state, host: str, rate: float, burst: int):
+        self.state = state
+        self.name = f"throttle:{host}"
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._local = TokenBucket(rate, burst)
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        try:
+            return self.state.reserve_token(self.name, self.rate, self.burst, max_wait)
+        except Exception as e:
+            logger.warning("Estado compartido no disponible para %s, límite local: %s", self.name, e)
+            return self._local.reserve(max_wait)
+
+
+class AdaptiveLimit:
+    """Límite de concurrencia AIMD (aumento aditivo, disminución multiplicativa)."""
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int,
+                 decrease: float = 0.5, cooldown: float = 5.0):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float) -> bool:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_flight < int(self.limit), timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, healthy: Optional[bool]):
+        """``True`` suma, ``False`` reduce y ``None`` (error ajeno al host) deja el límite igual."""
+        with self._cond:
+            self.in_flight -= 1
+            if healthy:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif healthy is False:
+                now = time.monotonic()
+                # Una racha de fallos de la misma ventana solo reduce una vez
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._last_decrease = now
+            self._cond.notify_all()
+
+
+class Outcome:
+    """Resultado de una visita; quien la hace marca ``blocked`` si detecta un bloqueo."""
+
+    __slots__ = ("reason",)
+
+    def __init__(self):
+        self.reason: Optional[str] = None
+
+    def blocked(self, reason: str = "blocked"):
+        self.reason = reason
+
+
+class HostLimiter:
+    def __init__(self, host: str, rate: float, burst: int, initial: int, min_limit: int, max_limit: int,
+                 slow_after: float, decrease: float = 0.5, cooldown: float = 5.0,
+                 block_backoff: float = 30.0, max_block_backoff: float = 600.0, shared=None):
+        self.host = host
+        if rate <= 0:
+            self.bucket = None
+        elif shared is not None:
+            self.bucket = SharedTokenBucket(shared, host, rate, burst)
+        else:
+            self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveLimit(initial, min_limit, max_limit, decrease, cooldown)
+        self.slow_after = slow_after
+        self.block_backoff = block_backoff
+        self.max_block_backoff = max_block_backoff
+        self._paused_until = 0.0
+        self._blocks_in_row = 0
+        self._lock = threading.Lock()
+        self._report()
+
+    def _report(self):
+        metrics.set_host_limits(self.host, int(self.concurrency.limit), self.concurrency.in_flight)
+
+    def _throttled(self, reason: str, retry_after: float):
+        metrics.count_throttle(self.host, reason)
+        raise Throttled(self.host, max(1, int(retry_after + 0.999)))
+
+    def acquire(self, max_wait: float):
+        started = time.monotonic()
+        with self._lock:
+            paused = self._paused_until - started
+        if paused > max_wait:
+            self._throttled("paused", paused)
+        if paused > 0:
+            time.sleep(paused)
+        if not self.concurrency.acquire(max(0.0, max_wait - (time.monotonic() - started))):
+            self._throttled("concurrency", self.slow_after)
+        wait = self.bucket.reserve(max(0.0, max_wait - (time.monotonic() - started))) if self.bucket else 0.0
+        if wait is None:
+            self.concurrency.release(None)
+            self._throttled("rate", 1 / self.bucket.rate)
+        if wait:
+            time.sleep(wait)
+        metrics.observe_throttle_wait(self.host, time.monotonic() - started)
+        self._report()
+
+    def release(self, outcome: Outcome, elapsed: float, timed_out: bool, failed: bool):
+        if outcome.reason:
+            healthy = False
+            self._block(outcome.reason)
+        elif timed_out:
+            healthy = False
+            metrics.count_throttle(self.host, "timeout")
+        elif failed:
+            healthy = None
+        elif elapsed > self.slow_after:
+            healthy = False
+            metrics.count_throttle(self.host, "slow")
+        else:
+            healthy = True
+            self._blocks_in_row = 0
+        self.concurrency.release(healthy)
+        self._report()
+
+    def _block(self, reason: str):
+        with self._lock:
+            pause = min(self.max_block_backoff, self.block_backoff * 2 ** self._blocks_in_row)
+            self._blocks_in_row += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        metrics.count_throttle(self.host, "blocked")
+        logger.warning("Bloqueo de %s (%s): pausa de %.0f s", self.host, reason, pause)
+
+    @contextmanager
+    def slot(self, max_wait: float):
+        self.acquire(max_wait)
+        outcome = Outcome()
+        started = time.monotonic()
+        timed_out = failed = False
+        try:
+            yield outcome
+        except TIMEOUT_ERRORS:
+            timed_out = True
+            raise
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.release(outcome, time.monotonic() - started, timed_out, failed)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            paused = max(0.0, self._paused_until - time.monotonic())
+        return {
+            "rate": self.bucket.rate if self.bucket else None,
+            "burst": self.bucket.burst if self.bucket else None,
+            "shared": isinstance(self.bucket, SharedTokenBucket),
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "paused_seconds": round(paused, 1),
+        }
+
+
+_enabled = False
+_rules: Dict[str, Tuple[float, int]] = {}
+_settings: Dict[str, float] = {}
+_max_wait = 30.0
+_captcha_hosts: Tuple[str, ...] = ()
+_limiters: Dict[str, HostLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def configure(enabled: bool, rules: Dict[str, Tuple[float, int]], initial: int = 4, min_limit: int = 1,
+              max_limit: int = 16, slow_after: float = 15.0, decrease: float = 0.5, cooldown: float = 5.0,
+              block_backoff: float = 30.0, max_wait: float = 30.0, shared=None,
+              captcha_hosts: Tuple[str, ...] = ()):
+    """``rules`` asocia un host (y sus subdominios) a ``(solicitudes por segundo, ráfaga)``.
+
+    ``shared`` es el estado compartido entre réplicas para los token buckets.
+    En ``captcha_hosts`` (y sus subdominios) el texto típico de bloqueo basta
+    para marcar la página como bloqueo.
+    """
+    global _enabled, _rules, _settings, _max_wait, _captcha_hosts
+    with _registry_lock:
+        _enabled = enabled
+        _rules = {host.lower().lstrip("."): rule for host, rule in rules.items()}
+        _settings = {
+            "initial": initial, "min_limit": min_limit, "max_limit": max_limit, "slow_after": slow_after,
+            "decrease": decrease, "cooldown": cooldown, "block_backoff": block_backoff, "shared": shared,
+        }
+        _max_wait = max_wait
+        _captcha_hosts = tuple(host.lower().lstrip(".") for host in captcha_hosts)
+        _limiters.clear()
+
+
+def _rule_for(hostname: str) -> Optional[str]:
+    # La regla más específica gana: www.google.com usa la de google.com si no tiene una propia
+    best = None
+    for host in _rules:
+        if hostname == host or hostname.endswith("." + host):
+            if best is None or len(host) > len(best):
+                best = host
+    return best
+
+
+def limiter_for(url: str) -> Optional[HostLimiter]:
+    if not _enabled:
+        return None
+    hostname = (urlsplit(url).hostname or "").lower()
+    host = _rule_for(hostname)
+    if host is None:
+        return None
+    limiter = _limiters.get(host)
+    if limiter is None:
+        with _registry_lock:
+            limiter = _limiters.get(host)
+            if limiter is None:
+                rate, burst = _rules[host]
+                limiter = _limiters[host] = HostLimiter(host, rate, burst, **_settings)
+    return limiter
+
+
+@contextmanager
+def slot(url: str, max_wait: Optional[float] = None):
+    """Turno para visitar ``url``; lanza ``Throttled`` si no llega en ``max_wait`` segundos."""
+    limiter = limiter_for(url)
+    if limiter is None:
+        yield Outcome()
+        return
+    with limiter.slot(_max_wait if max_wait is None else max_wait) as outcome:
+        yield outcome
+
+
+def _matches(hostname: str, hosts: Tuple[str, ...]) -> bool:
+    return any(hostname == host or hostname.endswith("." + host) for host in hosts)
+
+
+def page_block_reason(driver, url: Optional[str] = None) -> Optional[str]:
+    """Motivo si la página actual del navegador es un CAPTCHA o aviso de bloqueo.
+
+    Las señales estructurales (formulario o iframe de CAPTCHA, ``/sorry/``, un
+    429/503) bastan por sí solas. El texto de bloqueo solo se lee y solo cuenta
+    en ``captcha_hosts``; en los demás hosts se ignora.
+    """
+    hostname = (urlsplit(url).hostname or "").lower() if url else ""
+    read_text = not url or _matches(hostname, _captcha_hosts)
+    try:
+        page_url, title, captcha, status, text = driver.execute_script(_BLOCK_CHECK_SCRIPT, read_text)
+    except Exception:
+        return None
+    if "/sorry/" in (page_url or "") or captcha:
+        return "captcha"
+    if status in _BLOCK_STATUSES:
+        return f"http_{status}"
+    if not read_text:
+        return None
+    content = f"{title}\n{text}".lower()
+    if "captcha" in (title or "").lower() or any(phrase in content for phrase in _BLOCK_PHRASES):
+        return "block_page"
+    return None
+
+
+def stats() -> Dict[str, Dict[str, object]]:
+    return {host: limiter.stats() for host, limiter in sorted(_limiters.items())}
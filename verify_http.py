@@ -0,0 +1,85 @@
+"""Búsqueda de la palabra de verificación en una página por HTTP, sin navegador.
+
+El cuerpo se lee por partes con la sesión HTTP compartida y pasa por
+``html.parser``; solo cuenta el texto visible (se ignoran ``script``,
+``style``, ``noscript``, ``template`` y ``title``), igual que el
+``body.text`` que leía Selenium. La lectura se corta en cuanto aparece la
+palabra o cuando otra verificación ya encontró la suya (``stop``). Si la
+página se pinta con JavaScript la palabra no aparece y el llamador la revisa
+en el navegador.
+"""
+import re
+import threading
+from html.parser import HTMLParser
+from typing import Optional
+
+import requests
+
+from http_client import build_http_session
+
+_SPACES = re.compile(r"\s+")
+_HIDDEN_TAGS = {"script", "style", "noscript", "template", "title"}
+# Como en body.text: el texto de dos bloques seguidos queda separado
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption", "footer",
+    "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre",
+    "section", "table", "td", "th", "tr", "ul",
+}
+
+
+def normalize_text(text: str) -> str:
+    return _SPACES.sub(" ", text).lower()
+
+
+class _TextMatcher(HTMLParser):
+    """Busca ``word`` en el texto visible a medida que llega, sin acumular la página."""
+
+    def __init__(self, word: str):
+        super().__init__(convert_charrefs=True)
+        self.word = normalize_text(word).strip()
+        self.found = False
+        self._tail = ""
+        self._hidden = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _HIDDEN_TAGS:
+            self._hidden += 1
+        elif tag in _BLOCK_TAGS:
+            self._tail += " "
+
+    def handle_endtag(self, tag):
+        if tag in _HIDDEN_TAGS and self._hidden:
+            self._hidden -= 1
+        elif tag in _BLOCK_TAGS:
+            self._tail += " "
+
+    def handle_data(self, data):
+        if self.found or self._hidden or not self.word:
+            return
+        # Se conserva la cola del texto anterior por si la palabra quedó partida
+        text = normalize_text(self._tail + data)
+        if self.word in text:
+            self.found = True
+        self._tail = text[-(len(self.word) - 1):] if len(self.word) > 1 else ""
+
+
+class VerifyHttpEngine:
+    def __init__(self, timeout: float = 10, session: Optional[requests.Session] = None,
+                 chunk_size: int = 16 * 1024):
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.session = session or build_http_session()
+
+    def contains(self, url: str, word: str, stop: Optional[threading.Event] = None) -> bool:
+        """Si el texto de ``url`` contiene ``word``; ``False`` también si ``stop`` cortó la lectura."""
+        matcher = _TextMatcher(word)
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            if "html" not in response.headers.get("Content-Type", "text/html"):
+                return False
+            response.encoding = response.encoding or "utf-8"
+            for chunk in response.iter_content(self.chunk_size, decode_unicode=True):
+                matcher.feed(chunk)
+                if matcher.found or (stop is not None and stop.is_set()):
+                    break
+        return matcher.found
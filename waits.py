@@ -0,0 +1,140 @@
+"""Esperas basadas en condiciones para reemplazar los ``time.sleep`` fijos.
+
+Todas las comprobaciones se hacen con ``execute_script`` para que no les
+afecte el ``implicitly_wait`` que pueda tener configurado el navegador.
+"""
+import time
+
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+import metrics
+
+
+_INSTALL_MUTATION_OBSERVER = """
+if (!window.__scraperLastMutation) {
+    window.__scraperLastMutation = performance.now();
+    new MutationObserver(function () {
+        window.__scraperLastMutation = performance.now();
+    }).observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+}
+return performance.now() - window.__scraperLastMutation;
+"""
+
+# El búfer de resource timing deja de crecer a las 250 entradas; el observador
+# recibe cada recurso aunque el búfer esté lleno
+_NETWORK_STATE = """
+if (window.__scraperResources === undefined) {
+    window.__scraperResources = performance.getEntriesByType('resource').length;
+    new PerformanceObserver(function (list) {
+        window.__scraperResources += list.getEntries().length;
+    }).observe({type: 'resource'});
+}
+return [document.readyState, window.__scraperResources];
+"""
+
+_INPUT_VALUE = """
+var el = document.getElementById(arguments[0]);
+return el ? el.value : null;
+"""
+
+
+def _poll(driver, condition, timeout: float, poll: float, message: str):
+    return WebDriverWait(driver, timeout, poll_frequency=poll).until(condition, message)
+
+
+@metrics.timed()
+def wait_for_document_ready(driver, timeout: float = 10):
+    return _poll(
+        driver,
+        lambda d: d.execute_script("return document.readyState;") != "loading",
+        timeout, 0.05, "El documento no terminó de cargar",
+    )
+
+
+@metrics.timed()
+def wait_for_value(driver, element_id: str, timeout: float = 10, poll: float = 0.1) -> str:
+    """Espera a que el campo ``element_id`` tenga un valor no vacío y lo devuelve."""
+    return _poll(
+        driver,
+        lambda d: d.execute_script(_INPUT_VALUE, element_id) or False,
+        timeout, poll, f"El campo {element_id} sigue vacío",
+    )
+
+
+@metrics.timed()
+def wait_for_dom_quiet(driver, quiet_ms: int = 300, timeout: float = 10, raise_on_timeout: bool = False):
+    """Espera hasta que el DOM pase ``quiet_ms`` sin mutaciones (render terminado)."""
+    driver.execute_script(_INSTALL_MUTATION_OBSERVER)
+    try:
+        return _poll(
+            driver,
+            lambda d: d.execute_script(_INSTALL_MUTATION_OBSERVER) >= quiet_ms,
+            timeout, 0.05, f"El DOM siguió cambiando durante {timeout} s",
+        )
+    except TimeoutException:
+        if raise_on_timeout:
+            raise
+        return False
+
+
+@metrics.timed()
+def wait_for_network_idle(driver, idle_ms: int = 500, timeout: float = 15, raise_on_timeout: bool = False):
+    """Espera a que no se pidan recursos nuevos durante ``idle_ms`` (XHR, imágenes, scripts)."""
+    deadline = time.monotonic() + timeout
+    last_count = None
+    last_change = time.monotonic()
+    while time.monotonic() < deadline:
+        ready_state, count = driver.execute_script(_NETWORK_STATE)
+        now = time.monotonic()
+        if count != last_count:
+            last_count = count
+            last_change = now
+        elif ready_state == "complete" and (now - last_change) * 1000 >= idle_ms:
+            return True
+        time.sleep(0.05)
+    if raise_on_timeout:
+        raise TimeoutException(f"La red no quedó inactiva en {timeout} s")
+    return False
+
+
+@metrics.timed()
+def wait_for_staleness(driver, element, timeout: float = 10, raise_on_timeout: bool = False):
+    """Espera a que ``element`` desaparezca del DOM (p. ej. la tabla anterior)."""
+    def is_stale(_):
+        try:
+            element.is_enabled()
+            return False
+        except StaleElementReferenceException:
+            return True
+
+    try:
+        return _poll(driver, is_stale, timeout, 0.05, "El elemento anterior sigue en el DOM")
+    except TimeoutException:
+        if raise_on_timeout:
+            raise
+        return False
+
+
+@metrics.timed()
+def wait_for_gone(driver, element, timeout: float = 10):
+    """Espera a que ``element`` quede oculto o fuera del DOM; no lanza si no ocurre."""
+    def is_gone(_):
+        try:
+            return not element.is_displayed()
+        except StaleElementReferenceException:
+            return True
+
+    try:
+        return _poll(driver, is_gone, timeout, 0.05, "El elemento sigue visible")
+    except TimeoutException:
+        return False
+
+
+@metrics.timed()
+def click_and_wait_for_navigation(driver, element, timeout: float = 10):
+    """Hace clic en un enlace y espera a que el documento anterior sea reemplazado."""
+    old_root = driver.execute_script("return document.documentElement;")
+    element.click()
+    wait_for_staleness(driver, old_root, timeout)
+    wait_for_document_ready(driver, timeout)